@@ -0,0 +1,97 @@
+# benchmarks/harness.py
+"""基准测试注册、计时与基线比较"""
+import gc
+import json
+import statistics
+import time
+
+# 已注册的基准测试: name -> (setup, repeat)
+BENCHMARKS = {}
+
+
+def benchmark(name, repeat=5):
+    """
+    注册一个基准测试
+
+    被装饰的函数负责准备工作负载，并返回一个无参可调用对象，
+    只有该可调用对象的执行时间会被计入
+    """
+
+    def decorator(setup):
+        BENCHMARKS[name] = (setup, repeat)
+        return setup
+
+    return decorator
+
+
+def measure(fn, repeat):
+    """运行 repeat 次，返回每次耗时（秒）"""
+    timings = []
+    gc_enabled = gc.isenabled()
+    try:
+        for _ in range(repeat):
+            gc.collect()
+            gc.disable()
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+            if gc_enabled:
+                gc.enable()
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return timings
+
+
+def run_benchmarks(selected=None, repeat=None):
+    """运行基准测试，返回 {name: {min, median, max, repeat}}"""
+    results = {}
+    for name, (setup, default_repeat) in BENCHMARKS.items():
+        if selected and not any(pattern in name for pattern in selected):
+            continue
+        fn = setup()
+        timings = measure(fn, repeat or default_repeat)
+        results[name] = {
+            "min": min(timings),
+            "median": statistics.median(timings),
+            "max": max(timings),
+            "repeat": len(timings),
+        }
+        print(
+            f"{name:<40} median {results[name]['median'] * 1000:10.3f} ms"
+            f"   min {results[name]['min'] * 1000:10.3f} ms"
+        )
+    return results
+
+
+def load_baseline(path):
+    """读取基线文件，不存在时返回 None"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(path, results):
+    """保存基线文件"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False, sort_keys=True)
+
+
+def compare(results, baseline, threshold):
+    """
+    与基线比较中位数，返回超过阈值的回归列表
+    [(name, baseline_median, current_median, ratio), ...]
+    """
+    regressions = []
+    for name, current in results.items():
+        if name not in baseline:
+            continue
+        base = baseline[name]["median"]
+        if base <= 0:
+            continue
+        ratio = current["median"] / base
+        if ratio > 1 + threshold:
+            regressions.append((name, base, current["median"], ratio))
+    return regressions
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+ag-cli 基准测试入口
+
+用法:
+    pdm run bench                       # 运行并与基线比较
+    pdm run bench --save-baseline       # 运行并更新基线
+    pdm run bench -k history --threshold 0.3
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR))
+sys.path.insert(0, str(BENCH_DIR.parent / "src"))
+
+from harness import compare, load_baseline, run_benchmarks, save_baseline  # noqa: E402
+import suite  # noqa: E402,F401  注册基准测试
+
+DEFAULT_BASELINE = BENCH_DIR / "baselines.json"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ag-cli 热点路径基准测试")
+    parser.add_argument(
+        "-k", dest="selected", action="append", help="只运行名称包含该字符串的测试"
+    )
+    parser.add_argument("--repeat", type=int, default=None, help="覆盖重复次数")
+    parser.add_argument(
+        "--baseline", type=Path, default=DEFAULT_BASELINE, help="基线JSON文件路径"
+    )
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="将本次结果写入基线文件"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=float(os.getenv("AG_BENCH_THRESHOLD", "0.2")),
+        help="允许的回归比例（默认0.2，即慢20%%以内不报错）",
+    )
+    parser.add_argument("--output", type=Path, default=None, help="结果输出JSON路径")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.selected, args.repeat)
+
+    if args.output:
+        save_baseline(args.output, results)
+
+    if args.save_baseline:
+        baseline = load_baseline(args.baseline) or {}
+        baseline.update(results)
+        save_baseline(args.baseline, baseline)
+        print(f"\n✅ 基线已保存: {args.baseline}")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        # 没有基线就无法检测回归，不能当作通过
+        print(f"\n❌ 未找到基线文件 {args.baseline}，使用 --save-baseline 生成")
+        return 1
+
+    failed = False
+    missing = [name for name in results if name not in baseline]
+    if missing:
+        failed = True
+        print("\n❌ 以下测试没有基线，使用 --save-baseline 补充:")
+        for name in missing:
+            print(f"   {name}")
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        failed = True
+        print(f"\n❌ 以下测试超过 {args.threshold:.0%} 回归阈值:")
+        for name, base, current, ratio in regressions:
+            print(
+                f"   {name}: {base * 1000:.3f} ms -> {current * 1000:.3f} ms ({ratio:.2f}x)"
+            )
+    if failed:
+        return 1
+
+    print(f"\n✅ 无超过 {args.threshold:.0%} 的性能回归")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
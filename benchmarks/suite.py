@@ -0,0 +1,116 @@
+# benchmarks/suite.py
+"""CLI 热点路径的基准测试"""
+import io
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from rich.console import Console
+
+from ag_cli.chat.history_manager import HistoryManager, manage_context
+from ag_cli.chat.interface import ChatInterface
+from harness import benchmark
+import workloads
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+
+
+def _console():
+    """输出到内存的固定宽度控制台"""
+    return Console(file=io.StringIO(), width=100, force_terminal=True)
+
+
+def _interface(use_pretty=True):
+    return ChatInterface(client=None, console=_console(), use_pretty=use_pretty)
+
+
+def _history(turns):
+    manager = HistoryManager("system")
+    for user, assistant in workloads.conversation(turns):
+        manager.add_user_message(user)
+        manager.add_assistant_message(assistant)
+    return manager
+
+
+@benchmark("preprocess_response/long", repeat=20)
+def bench_preprocess_long():
+    interface = _interface()
+    text = workloads.long_response()
+    return lambda: interface._preprocess_response(text)
+
+
+@benchmark("preprocess_response/code_blocks", repeat=20)
+def bench_preprocess_code():
+    interface = _interface()
+    text = workloads.code_heavy_response()
+    return lambda: interface._preprocess_response(text)
+
+
+@benchmark("manage_context/list_1000_turns", repeat=50)
+def bench_manage_context_list():
+    history = [{"role": "system", "content": "system"}]
+    for user, assistant in workloads.conversation(1000):
+        history.append({"role": "user", "content": user})
+        history.append({"role": "assistant", "content": assistant})
+    return lambda: manage_context(history)
+
+
+@benchmark("history/managed_1000_turns", repeat=50)
+def bench_managed_history():
+    manager = _history(1000)
+    return lambda: list(manager.get_managed_history())
+
+
+@benchmark("history/big_paste", repeat=5)
+def bench_big_paste():
+    paste = workloads.big_paste()
+
+    def run():
+        manager = HistoryManager("system")
+        for _ in range(3):
+            manager.add_user_message(paste)
+            manager.add_assistant_message("ok")
+        list(manager.get_managed_history())
+
+    return run
+
+
+@benchmark("history/display_1000_turns", repeat=3)
+def bench_display_history():
+    manager = _history(1000)
+    return lambda: manager.display_history(_console(), use_pretty=True)
+
+
+@benchmark("stream/markdown_recorded", repeat=5)
+def bench_stream_recorded():
+    chunks = workloads.fake_stream(workloads.recorded_response())
+    return lambda: _interface().display_streaming_response(iter(chunks))
+
+
+@benchmark("stream/markdown_code_blocks", repeat=3)
+def bench_stream_code():
+    chunks = workloads.fake_stream(workloads.code_heavy_response(blocks=30))
+    return lambda: _interface().display_streaming_response(iter(chunks))
+
+
+@benchmark("stream/plain_long", repeat=5)
+def bench_stream_plain():
+    chunks = workloads.fake_stream(workloads.long_response(50_000))
+
+    def run():
+        stdout = sys.stdout
+        sys.stdout = io.StringIO()
+        try:
+            _interface(use_pretty=False).display_streaming_response(iter(chunks))
+        finally:
+            sys.stdout = stdout
+
+    return run
+
+
+@benchmark("startup/import_main", repeat=5)
+def bench_startup_import():
+    env = dict(os.environ, PYTHONPATH=str(SRC_DIR))
+    command = [sys.executable, "-c", "import ag_cli.main"]
+    return lambda: subprocess.run(command, env=env, check=True)
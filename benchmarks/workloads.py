@@ -0,0 +1,78 @@
+# benchmarks/workloads.py
+"""基准测试使用的合成与录制工作负载"""
+import random
+from pathlib import Path
+from types import SimpleNamespace
+
+DATA_DIR = Path(__file__).parent / "data"
+
+_WORDS = (
+    "上下文 模型 请求 响应 缓存 token latency stream render markdown "
+    "history config client python rich openai deepseek qwen"
+).split()
+
+
+def _paragraph(rng, words=60):
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+
+def long_response(size=200_000, seed=0):
+    """生成约 size 字符的长篇 Markdown 回复（少量代码块）"""
+    rng = random.Random(seed)
+    parts = []
+    total = 0
+    while total < size:
+        block = f"## 小节 {len(parts)}\n\n{_paragraph(rng)}\n\n- {_paragraph(rng, 12)}\n"
+        parts.append(block)
+        total += len(block)
+    return "".join(parts)
+
+
+def code_heavy_response(blocks=500, seed=0):
+    """生成包含大量围栏代码块的回复"""
+    rng = random.Random(seed)
+    languages = ["python", "bash", "json", "", "rust"]
+    parts = []
+    for i in range(blocks):
+        lang = languages[i % len(languages)]
+        body = "\n".join(f"value_{j} = {rng.randint(0, 999)}" for j in range(8))
+        parts.append(f"{_paragraph(rng, 20)}\n```{lang}\n{body}\n```\n")
+    return "".join(parts)
+
+
+def recorded_response():
+    """读取录制的真实回复样本"""
+    return (DATA_DIR / "recorded_response.md").read_text(encoding="utf-8")
+
+
+def conversation(turns=1000, seed=0):
+    """生成 turns 轮对话 [(user, assistant), ...]"""
+    rng = random.Random(seed)
+    return [
+        (_paragraph(rng, 30), _paragraph(rng, 120) + "\n```python\nprint(1)\n```\n")
+        for _ in range(turns)
+    ]
+
+
+def big_paste(size=5_000_000, seed=0):
+    """生成约 size 字节的日志粘贴"""
+    rng = random.Random(seed)
+    lines = []
+    total = 0
+    while total < size:
+        line = (
+            f"2025-01-01T00:00:{total % 60:02d} INFO worker-{rng.randint(1, 8)} "
+            f"processed request id={rng.getrandbits(32):08x} in {rng.randint(1, 900)}ms"
+        )
+        lines.append(line)
+        total += len(line) + 1
+    return "\n".join(lines)
+
+
+def fake_stream(text, chunk_size=8):
+    """把文本切分为 OpenAI 风格的流式 chunk 对象"""
+    chunks = []
+    for i in range(0, len(text), chunk_size):
+        delta = SimpleNamespace(content=text[i : i + chunk_size])
+        chunks.append(SimpleNamespace(choices=[SimpleNamespace(delta=delta)]))
+    return chunks
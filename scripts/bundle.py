@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+ag-cli 单文件打包脚本
+把 ag_cli 及其依赖打包为 zipapp（.dist/ag.pyz）：
+- 依赖安装到临时目录后预编译为 .pyc（unchecked-hash，解压后不会因 mtime 失效）
+- 删除运行时用不到的模块：体积减少主要来自 openai 未使用的 resources 和 CLI、
+  测试目录和类型存根；rich/pygments 只删除命令行入口（__main__、diagnose、cmdline），
+  其余模块可能被按需导入，保留不动
+- 首次运行时解压到缓存目录（~/.cache/ag-cli/<构建ID>），之后直接从缓存启动
+- 构建完成后对比 zipapp 与 venv 安装的启动时间
+
+启动加速来自预编译字节码和解压后的缓存目录（按普通目录导入，不经过 zipimport），
+与裁剪无关；裁剪只减小包的体积和首次解压时间
+"""
+
+import compileall
+import hashlib
+import os
+import platform
+import py_compile
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+import zipapp
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+BUILD_DIR = PROJECT_ROOT / "build" / "zipapp"
+# 冒烟测试与启动时间对比使用的解压缓存（不打入包内）
+TEST_CACHE_DIR = PROJECT_ROOT / "build" / "zipapp-cache"
+DIST_DIR = PROJECT_ROOT / ".dist"
+
+# openai.resources 中保留的子模块（其余资源在客户端中按需导入，本项目用不到）
+OPENAI_KEEP_RESOURCES = {"__init__.py", "chat", "models.py"}
+
+# 相对 site-packages 删除的路径
+STRIP_PATHS = [
+    "bin",
+    "openai/cli",
+    "openai/helpers",
+    "rich/__main__.py",
+    "rich/diagnose.py",
+    "pygments/__main__.py",
+    "pygments/cmdline.py",
+]
+
+# 任意位置删除的目录名与文件后缀
+STRIP_DIR_NAMES = {"__pycache__", "tests", "test"}
+STRIP_SUFFIXES = {".pyi", ".pyc"}
+
+BOOTSTRAP_TEMPLATE = '''\
+# ag-cli zipapp 启动器（由 scripts/bundle.py 生成）
+import os
+import shutil
+import sys
+import zipfile
+from pathlib import Path
+
+BUNDLE_ID = "{bundle_id}"
+BUILD_PYTHON = {build_python!r}
+
+
+def _cache_dir():
+    root = os.environ.get("AG_CLI_CACHE") or Path.home() / ".cache" / "ag-cli"
+    return Path(root) / BUNDLE_ID
+
+
+def _unpack(archive, target):
+    """首次运行时解压 site-packages 到缓存目录"""
+    tmp = target.with_name(f"{{target.name}}.tmp{{os.getpid()}}")
+    with zipfile.ZipFile(archive) as zf:
+        members = [name for name in zf.namelist() if name.startswith("site-packages/")]
+        zf.extractall(tmp, members)
+    (tmp / ".complete").touch()
+    try:
+        tmp.rename(target)
+    except OSError:
+        # 其他进程已完成解压
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main():
+    target = _cache_dir()
+    if not (target / ".complete").exists():
+        if sys.version_info[:2] != BUILD_PYTHON:
+            print(
+                f"⚠️ 此包为 Python {{BUILD_PYTHON[0]}}.{{BUILD_PYTHON[1]}} 构建，"
+                "预编译字节码将不会生效",
+                file=sys.stderr,
+            )
+        _unpack(os.path.dirname(os.path.abspath(__file__)), target)
+    sys.path.insert(0, str(target / "site-packages"))
+
+    if os.environ.get("AG_CLI_BUNDLE_SELFTEST"):
+        # 构建脚本的冒烟测试：确认被裁剪后的依赖仍可正常使用
+        from openai import OpenAI
+        from ag_cli.main import main as ag_main  # noqa: F401
+        from ag_cli.chat.interface import ChatInterface  # noqa: F401
+
+        OpenAI(api_key="selftest").chat.completions
+        print("selftest ok")
+        return
+
+    from ag_cli.main import main as ag_main
+
+    sys.exit(ag_main())
+
+
+main()
+'''
+
+
+def install_into(target):
+    """把项目及依赖安装到 target/site-packages"""
+    site_packages = target / "site-packages"
+    print(f"📦 安装依赖到 {site_packages} ...")
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "pip",
+            "install",
+            "--quiet",
+            "--no-compile",
+            "--target",
+            str(site_packages),
+            str(PROJECT_ROOT),
+        ],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        print(f"❌ 依赖安装失败: {result.stderr}")
+        return None
+    return site_packages
+
+
+def _remove(path):
+    if path.is_dir():
+        shutil.rmtree(path, ignore_errors=True)
+    elif path.exists():
+        path.unlink()
+
+
+def strip_site_packages(site_packages):
+    """删除运行时用不到的文件，返回节省的字节数"""
+    before = _tree_size(site_packages)
+
+    for relative in STRIP_PATHS:
+        _remove(site_packages / relative)
+
+    resources = site_packages / "openai" / "resources"
+    if resources.is_dir():
+        for child in resources.iterdir():
+            if child.name not in OPENAI_KEEP_RESOURCES:
+                _remove(child)
+
+    for path in sorted(site_packages.rglob("*"), reverse=True):
+        if path.is_dir() and path.name in STRIP_DIR_NAMES:
+            _remove(path)
+        elif path.is_file() and path.suffix in STRIP_SUFFIXES:
+            _remove(path)
+
+    return before - _tree_size(site_packages)
+
+
+def precompile(site_packages):
+    """预编译为 .pyc，使用 unchecked-hash 避免解压后因 mtime 变化重新编译"""
+    print("⚙️  预编译字节码...")
+    return compileall.compile_dir(
+        str(site_packages),
+        quiet=1,
+        workers=0,
+        invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH,
+    )
+
+
+def _tree_size(root):
+    return sum(path.stat().st_size for path in root.rglob("*") if path.is_file())
+
+
+def _bundle_id(site_packages):
+    """按文件内容计算构建ID，内容不变时复用同一缓存目录"""
+    digest = hashlib.sha256()
+    digest.update(sys.version.encode("utf-8"))
+    for path in sorted(site_packages.rglob("*")):
+        if path.is_file() and path.suffix != ".pyc":
+            digest.update(str(path.relative_to(site_packages)).encode("utf-8"))
+            digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def build_zipapp(
+    output=None, strip=True, build_dir=BUILD_DIR, cache_dir=TEST_CACHE_DIR
+):
+    """构建 zipapp，返回输出路径，失败时返回 None"""
+    output = Path(output) if output else DIST_DIR / "ag.pyz"
+    build_dir = Path(build_dir)
+    shutil.rmtree(build_dir, ignore_errors=True)
+    build_dir.mkdir(parents=True)
+
+    site_packages = install_into(build_dir)
+    if site_packages is None:
+        return None
+
+    if strip:
+        saved = strip_site_packages(site_packages)
+        print(f"✂️  裁剪未使用的模块，减少 {saved / 1024 / 1024:.1f} MB")
+
+    bundle_id = _bundle_id(site_packages)
+    if not precompile(site_packages):
+        print("❌ 预编译失败")
+        return None
+
+    (build_dir / "__main__.py").write_text(
+        BOOTSTRAP_TEMPLATE.format(
+            bundle_id=bundle_id, build_python=tuple(sys.version_info[:2])
+        ),
+        encoding="utf-8",
+    )
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    zipapp.create_archive(
+        build_dir,
+        target=output,
+        interpreter="/usr/bin/env python3",
+        compressed=True,
+    )
+    print(f"✅ 已生成: {output} ({output.stat().st_size / 1024 / 1024:.1f} MB)")
+
+    if not selftest(output, cache_dir):
+        print("❌ 冒烟测试失败，可能裁剪了需要的模块（使用 --no-strip 重新构建）")
+        return None
+    return output
+
+
+def selftest(bundle, cache_dir=TEST_CACHE_DIR):
+    """用独立缓存目录运行一次冒烟测试"""
+    env = dict(os.environ, AG_CLI_BUNDLE_SELFTEST="1")
+    env["AG_CLI_CACHE"] = str(Path(cache_dir) / "selftest")
+    result = subprocess.run(
+        [sys.executable, str(bundle)], capture_output=True, text=True, env=env
+    )
+    if result.returncode != 0:
+        print(result.stderr)
+    return result.returncode == 0
+
+
+def _time_command(command, env=None, runs=5):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, capture_output=True, env=env, check=False)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def compare_startup(bundle, venv_executable=None, runs=5):
+    """对比 zipapp（首次解压/缓存命中）与 venv 安装的 ag --help 启动时间"""
+    print("\n⏱️  启动时间对比（ag --help）")
+    print("=" * 60)
+
+    cache = TEST_CACHE_DIR / "startup"
+    shutil.rmtree(cache, ignore_errors=True)
+    env = dict(os.environ, AG_CLI_CACHE=str(cache))
+    command = [sys.executable, str(bundle), "--help"]
+
+    cold = _time_command(command, env, runs=1)[0]
+    warm = _time_command(command, env, runs)
+    print(f"   zipapp 首次运行（含解压）: {cold * 1000:8.1f} ms")
+    print(f"   zipapp 缓存命中（中位数）: {statistics.median(warm) * 1000:8.1f} ms")
+
+    if venv_executable and os.path.exists(venv_executable):
+        venv = _time_command([venv_executable, "--help"], runs=runs)
+        print(f"   venv 安装（中位数）:       {statistics.median(venv) * 1000:8.1f} ms")
+        ratio = statistics.median(venv) / statistics.median(warm)
+        print(f"   zipapp 相对 venv: {ratio:.2f}x")
+    else:
+        print("   未找到 venv 中的 ag 可执行文件，跳过对比")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="构建 ag-cli 单文件 zipapp")
+    parser.add_argument("--output", type=str, default=None, help="输出文件路径")
+    parser.add_argument("--no-strip", action="store_true", help="不裁剪依赖")
+    parser.add_argument(
+        "--runs", type=int, default=5, help="启动时间对比的运行次数"
+    )
+    args = parser.parse_args()
+
+    print(f"🚀 ag-cli zipapp 打包 ({platform.system()}, Python {platform.python_version()})")
+    bundle = build_zipapp(args.output, strip=not args.no_strip)
+    if bundle is None:
+        sys.exit(1)
+
+    venv_bin = PROJECT_ROOT / ".venv" / ("Scripts" if os.name == "nt" else "bin")
+    compare_startup(bundle, venv_bin / ("ag.exe" if os.name == "nt" else "ag"), args.runs)
+
+
+if __name__ == "__main__":
+    main()
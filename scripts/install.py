@@ -3,6 +3,8 @@
 ag-cli 构建脚本
 构建可执行文件并输出到.dist目录
 用户需要手动复制到PATH目录
+
+使用 --zipapp 生成单文件 zipapp（见 scripts/bundle.py）
 """
 
 import os
@@ -147,14 +149,50 @@ def get_recommended_path_dirs():
     return existing_dirs
 
 
+def build_zipapp_bundle(args):
+    """构建单文件 zipapp 并对比启动时间"""
+    from bundle import build_zipapp, compare_startup
+
+    bundle = build_zipapp(strip=not args.no_strip)
+    if bundle is None:
+        sys.exit(1)
+
+    # 与 venv 中的 ag 对比启动时间
+    compare_startup(bundle, get_venv_executable_path())
+
+    print("\n📖 使用说明:")
+    print("=" * 40)
+    print(f"   python {bundle} --help")
+    if platform.system() != "Windows":
+        print(f'   或复制到PATH目录: cp "{bundle}" /usr/local/bin/ag')
+    print("   首次运行会解压到 ~/.cache/ag-cli（可通过 AG_CLI_CACHE 修改）")
+
+
 def main():
     """主函数 - 构建可执行文件"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="ag-cli 构建脚本")
+    parser.add_argument(
+        "--zipapp",
+        action="store_true",
+        help="生成单文件 zipapp（预编译字节码、裁剪依赖、解压缓存）",
+    )
+    parser.add_argument(
+        "--no-strip", action="store_true", help="zipapp 不裁剪未使用的依赖模块"
+    )
+    args = parser.parse_args()
+
     print("🚀 ag-cli 构建脚本")
     print("=" * 60)
     print(f"📋 操作系统: {platform.system()} {platform.release()}")
     print(f"🐍 Python版本: {platform.python_version()}")
     print()
 
+    if args.zipapp:
+        build_zipapp_bundle(args)
+        return
+
     # 检查PDM
     if not check_pdm():
         sys.exit(1)
@@ -1,5 +1,7 @@
 # 包的主入口点
+import sys
+
 from .main import main
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
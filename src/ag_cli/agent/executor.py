@@ -0,0 +1,153 @@
+# agent/executor.py
+"""
+工具并行执行引擎
+
+同一轮回复中的多个工具调用彼此独立，放入有界线程池并发执行，结果按调用顺序返回。
+一组调用共享一个截止时间，工具在内部检查截止时间并自行结束（线程无法从外部终止）。
+没有隔离环境时，shell 命令在提交之前逐条交给 confirm 回调确认，确认时间不计入截止时间
+"""
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from ag_cli.agent.tools import TOOL_FUNCTIONS, ToolError, truncate_output
+from ag_cli.utils.tracing import span
+
+# 默认并发数
+DEFAULT_WORKERS = 4
+# 单个工具调用的默认超时（秒）
+DEFAULT_TIMEOUT = 30
+# 截止时间之后等待工具自行结束的时间（秒）
+GRACE_SECONDS = 2
+
+
+class ToolResult:
+    """单个工具调用的结果"""
+
+    __slots__ = ("call_id", "name", "output", "seconds", "ok")
+
+    def __init__(self, call_id, name, output, seconds, ok):
+        self.call_id = call_id
+        self.name = name
+        self.output = output
+        self.seconds = seconds
+        self.ok = ok
+
+    def to_message(self):
+        """转换为发送给模型的 tool 消息"""
+        return {"role": "tool", "tool_call_id": self.call_id, "content": self.output}
+
+
+class ToolExecutor:
+    """有界线程池工具执行器"""
+
+    def __init__(
+        self,
+        workspace,
+        max_workers=DEFAULT_WORKERS,
+        timeout=DEFAULT_TIMEOUT,
+        allow_shell=False,
+        sandbox=None,
+        confirm=None,
+    ):
+        """
+        sandbox: detect_sandbox() 返回的隔离方式，为 None 时 shell 直接运行
+        confirm: confirm(command) -> bool，未隔离的 shell 命令执行前调用；
+                 为 None 时拒绝所有未隔离的 shell 命令
+        """
+        self.workspace = workspace
+        self.timeout = timeout
+        self.allow_shell = allow_shell
+        self.sandbox = sandbox
+        self.confirm = confirm
+        self.pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="ag-tool"
+        )
+
+    def _run_one(self, name, arguments, deadline):
+        if name == "shell" and not self.allow_shell:
+            raise ToolError("shell 工具未启用（使用 --allow-shell 启用）")
+        func = TOOL_FUNCTIONS.get(name)
+        if func is None:
+            raise ToolError(f"未知工具: {name}")
+        try:
+            kwargs = json.loads(arguments) if arguments else {}
+        except json.JSONDecodeError as e:
+            raise ToolError(f"参数不是有效的JSON: {e}")
+        if name == "shell":
+            kwargs["timeout"] = self.timeout
+            kwargs["sandbox"] = self.sandbox
+        kwargs["deadline"] = deadline
+        with span(f"tool.{name}", cat="tool"):
+            return func(self.workspace, **kwargs)
+
+    def _timed(self, name, arguments, deadline):
+        start = time.perf_counter()
+        try:
+            if time.monotonic() >= deadline:
+                raise ToolError(f"工具超时（{self.timeout}s）: 排队期间已到达截止时间")
+            output, ok = self._run_one(name, arguments, deadline), True
+        except ToolError as e:
+            output, ok = f"错误: {e}", False
+        except TypeError as e:
+            output, ok = f"错误: 参数不匹配: {e}", False
+        except Exception as e:
+            output, ok = f"错误: {type(e).__name__}: {e}", False
+        return truncate_output(output), ok, time.perf_counter() - start
+
+    def _refused(self, name, arguments):
+        """未隔离的 shell 命令是否被拒绝执行"""
+        if name != "shell" or not self.allow_shell or self.sandbox is not None:
+            return False
+        if self.confirm is None:
+            return True
+        try:
+            command = json.loads(arguments).get("command", "") if arguments else ""
+        except (json.JSONDecodeError, AttributeError):
+            # 参数错误交给 _run_one 报告
+            return False
+        return not self.confirm(command)
+
+    def run(self, tool_calls):
+        """
+        并发执行一组工具调用
+
+        tool_calls: [{"id", "function": {"name", "arguments"}}, ...]
+        返回与输入顺序一致的 ToolResult 列表
+        """
+        refused = [
+            self._refused(call["function"]["name"], call["function"]["arguments"])
+            for call in tool_calls
+        ]
+        deadline = time.monotonic() + self.timeout
+        futures = []
+        for call, skip in zip(tool_calls, refused):
+            function = call["function"]
+            future = (
+                None
+                if skip
+                else self.pool.submit(
+                    self._timed, function["name"], function["arguments"], deadline
+                )
+            )
+            futures.append((call, future))
+
+        results = []
+        for call, future in futures:
+            name = call["function"]["name"]
+            if future is None:
+                output = "错误: 用户拒绝执行该命令（没有可用的隔离环境）"
+                results.append(ToolResult(call["id"], name, output, 0.0, False))
+                continue
+            remaining = max(0.0, deadline + GRACE_SECONDS - time.monotonic())
+            try:
+                output, ok, seconds = future.result(timeout=remaining)
+            except FutureTimeout:
+                # 只能取消尚未开始的调用；已开始的调用会在截止时间后自行结束
+                future.cancel()
+                output, ok, seconds = f"错误: 工具超时（{self.timeout}s）", False, self.timeout
+            results.append(ToolResult(call["id"], name, output, seconds, ok))
+        return results
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
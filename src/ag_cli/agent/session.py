@@ -0,0 +1,321 @@
+# agent/session.py
+"""
+Agent 会话：模型回复 -> 并发执行工具调用 -> 回传结果，直到模型给出最终回答
+"""
+import sys
+import time
+
+from rich.live import Live
+from rich.markdown import Markdown
+from rich.markup import escape
+from rich.table import Table
+
+from ag_cli.agent.executor import ToolExecutor
+from ag_cli.agent.tools import (
+    SANDBOX_BACKENDS,
+    Workspace,
+    detect_sandbox,
+    get_tool_schemas,
+)
+from ag_cli.utils.tracing import span
+
+# 单个任务允许的最大模型轮数
+DEFAULT_MAX_STEPS = 12
+
+AGENT_SYSTEM_PROMPT = (
+    "你是一个命令行编程助手，可以调用工具读取文件、搜索代码"
+    "{shell_hint}。互不依赖的工具调用请在同一轮中一起发出，它们会被并行执行。"
+    "工具输出可能被截断，需要时使用 offset 分段读取。"
+    "(如果未指定语言，回复答案时请使用中文语言)"
+)
+
+
+def _accumulate_tool_calls(pending, deltas):
+    """把流式 tool_calls 增量按 index 合并"""
+    for delta in deltas:
+        entry = pending.setdefault(
+            delta.index,
+            {"id": "", "type": "function", "function": {"name": "", "arguments": ""}},
+        )
+        if delta.id:
+            entry["id"] = delta.id
+        function = delta.function
+        if function is not None:
+            if function.name:
+                entry["function"]["name"] += function.name
+            if function.arguments:
+                entry["function"]["arguments"] += function.arguments
+
+
+class AgentStep:
+    """一轮 模型调用 + 工具执行 的耗时记录"""
+
+    __slots__ = ("model_seconds", "tool_seconds", "tool_results")
+
+    def __init__(self, model_seconds):
+        self.model_seconds = model_seconds
+        self.tool_seconds = 0.0
+        self.tool_results = []
+
+
+class AgentSession:
+    """Agent 模式会话"""
+
+    def __init__(
+        self,
+        client,
+        console,
+        model=None,
+        use_pretty=True,
+        allow_shell=False,
+        max_workers=4,
+        tool_timeout=30,
+        max_steps=DEFAULT_MAX_STEPS,
+        sandbox=None,
+    ):
+        self.client = client
+        self.console = console
+        self.model = model
+        self.use_pretty = use_pretty
+        self.max_steps = max_steps
+        self.tools = get_tool_schemas(allow_shell)
+        self.executor = ToolExecutor(
+            Workspace(),
+            max_workers,
+            tool_timeout,
+            allow_shell=allow_shell,
+            sandbox=sandbox,
+            confirm=self._confirm_shell,
+        )
+        shell_hint = "、执行 shell 命令" if allow_shell else ""
+        self.system_prompt = AGENT_SYSTEM_PROMPT.format(shell_hint=shell_hint)
+        self.messages = []
+        self.steps = []
+        self.reset_history()
+
+    def _confirm_shell(self, command):
+        """没有隔离环境时，每条 shell 命令执行前请用户确认"""
+        self.console.print(
+            f"[yellow]⚠️ 执行未隔离的命令: [bold]{escape(command)}[/bold] [y/N][/yellow] ",
+            end="",
+        )
+        try:
+            return input().strip().lower() in ("y", "yes")
+        except (EOFError, KeyboardInterrupt):
+            return False
+
+    def reset_history(self):
+        """重置会话消息（供 .clear 命令使用）"""
+        self.messages = [{"role": "system", "content": self.system_prompt}]
+
+    def display_history(self, console, use_pretty=True, command=None):
+        """显示会话中的用户任务和模型回答（供 .history 命令使用，不支持分页参数）"""
+        console.print("\n[bold yellow]📜 对话历史:[/bold yellow]")
+        for msg in self.messages[1:]:
+            if msg["role"] == "user":
+                console.print(f"[bold cyan]😎 {msg['content']}[/bold cyan]")
+            elif msg["role"] == "assistant" and msg.get("content"):
+                console.print(Markdown(msg["content"]) if use_pretty else msg["content"])
+            elif msg["role"] == "assistant":
+                names = ", ".join(
+                    call["function"]["name"] for call in msg.get("tool_calls", [])
+                )
+                console.print(f"[dim]🔧 {names}[/dim]")
+
+    def _stream_step(self):
+        """调用模型并显示文本，返回 (content, tool_calls)"""
+        stream = self.client.get_agent_stream(self.messages, self.tools, self.model)
+        content = ""
+        pending = {}
+
+        if not self.use_pretty:
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.content:
+                    content += delta.content
+                    print(delta.content, end="", flush=True)
+                if delta.tool_calls:
+                    _accumulate_tool_calls(pending, delta.tool_calls)
+            if content:
+                print()
+            return content, [pending[i] for i in sorted(pending)]
+
+        with Live(console=self.console, refresh_per_second=5) as live:
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.content:
+                    content += delta.content
+                    live.update(Markdown(content))
+                if delta.tool_calls:
+                    _accumulate_tool_calls(pending, delta.tool_calls)
+        return content, [pending[i] for i in sorted(pending)]
+
+    def _show_tool_calls(self, tool_calls):
+        for call in tool_calls:
+            arguments = call["function"]["arguments"]
+            if len(arguments) > 120:
+                arguments = arguments[:117] + "..."
+            if self.use_pretty:
+                self.console.print(
+                    f"[magenta]🔧 {call['function']['name']}[/magenta] [dim]{arguments}[/dim]"
+                )
+            else:
+                print(f"[tool] {call['function']['name']} {arguments}")
+
+    def _show_tool_results(self, results):
+        for result in results:
+            status = "✅" if result.ok else "✖️"
+            lines = result.output.count("\n") + 1
+            if self.use_pretty:
+                self.console.print(
+                    f"[dim]   {status} {result.name} {result.seconds:.2f}s · {lines} 行[/dim]"
+                )
+            else:
+                print(f"[tool] {result.name} {'ok' if result.ok else 'error'} {result.seconds:.2f}s")
+
+    def run(self, task):
+        """执行一个任务，返回模型的最终回答"""
+        self.messages.append({"role": "user", "content": task})
+        self.steps = []
+
+        for _ in range(self.max_steps):
+            start = time.perf_counter()
+            with span("agent.model", step=len(self.steps) + 1):
+                content, tool_calls = self._stream_step()
+            step = AgentStep(time.perf_counter() - start)
+            self.steps.append(step)
+
+            message = {"role": "assistant", "content": content or None}
+            if tool_calls:
+                message["tool_calls"] = tool_calls
+            self.messages.append(message)
+
+            if not tool_calls:
+                return content
+
+            self._show_tool_calls(tool_calls)
+            start = time.perf_counter()
+            with span("agent.tools", step=len(self.steps), calls=len(tool_calls)):
+                results = self.executor.run(tool_calls)
+            step.tool_seconds = time.perf_counter() - start
+            step.tool_results = results
+            self._show_tool_results(results)
+            self.messages.extend(result.to_message() for result in results)
+
+        self.console.print(f"[yellow]⚠️ 已达到最大步数 {self.max_steps}，停止执行[/yellow]")
+        return None
+
+    def display_timeline(self):
+        """显示每一步模型耗时与工具耗时"""
+        if not self.steps:
+            return
+        total_model = sum(step.model_seconds for step in self.steps)
+        total_tools = sum(step.tool_seconds for step in self.steps)
+
+        if not self.use_pretty:
+            for i, step in enumerate(self.steps, 1):
+                print(
+                    f"[step {i}] model {step.model_seconds:.2f}s tools {step.tool_seconds:.2f}s"
+                )
+            print(f"[total] model {total_model:.2f}s tools {total_tools:.2f}s")
+            return
+
+        table = Table(title="⏱️ 执行时间线", show_header=True, header_style="bold magenta")
+        table.add_column("步骤", style="cyan", justify="right")
+        table.add_column("模型", justify="right")
+        table.add_column("工具(墙钟)", justify="right")
+        table.add_column("工具调用")
+        for i, step in enumerate(self.steps, 1):
+            calls = ", ".join(
+                f"{result.name} {result.seconds:.2f}s" for result in step.tool_results
+            )
+            table.add_row(
+                str(i),
+                f"{step.model_seconds:.2f}s",
+                f"{step.tool_seconds:.2f}s" if step.tool_results else "-",
+                calls or "-",
+            )
+        table.add_row(
+            "合计", f"{total_model:.2f}s", f"{total_tools:.2f}s", "", style="bold"
+        )
+        self.console.print(table)
+
+    def close(self):
+        self.executor.shutdown()
+
+
+def agent_chat(
+    client,
+    console,
+    task=None,
+    model=None,
+    use_pretty=True,
+    allow_shell=False,
+    max_workers=4,
+    tool_timeout=30,
+):
+    """Agent 模式入口：有任务时执行一次，否则进入连续输入"""
+    from ag_cli.chat.input_handler import get_user_input
+
+    sandbox = None
+    if allow_shell:
+        sandbox = detect_sandbox()
+        if sandbox:
+            console.print(
+                f"[green]🔒 shell 工具在 {sandbox} 隔离环境中运行："
+                f"{SANDBOX_BACKENDS[sandbox]}[/green]"
+            )
+        elif not sys.stdin.isatty():
+            console.print(
+                "[red]✖️ 未找到可用的 bwrap/unshare，且标准输入不是终端、无法逐条确认命令，"
+                "拒绝启用 shell 工具[/red]"
+            )
+            return
+        else:
+            console.print(
+                "[yellow]⚠️ 未找到可用的 bwrap/unshare：shell 命令以当前用户权限执行，"
+                "每条命令执行前需要确认[/yellow]"
+            )
+
+    session = AgentSession(
+        client,
+        console,
+        model=model,
+        use_pretty=use_pretty,
+        allow_shell=allow_shell,
+        max_workers=max_workers,
+        tool_timeout=tool_timeout,
+        sandbox=sandbox,
+    )
+    try:
+        if task:
+            _run_task(session, console, task)
+            return
+
+        console.print("[bold]🤖 Agent 模式，输入 '.exit' 结束[/bold]")
+        while True:
+            try:
+                # 会话对象提供 reset_history / display_history，可直接处理特殊命令
+                user_input, should_exit = get_user_input(console, session, use_pretty)
+            except KeyboardInterrupt:
+                console.print("\n[yellow]🛑 结束对话。[/yellow]")
+                break
+            if should_exit:
+                break
+            if user_input and user_input.strip():
+                _run_task(session, console, user_input)
+    finally:
+        session.close()
+
+
+def _run_task(session, console, task):
+    try:
+        session.run(task)
+    except Exception as e:
+        console.print(f"[red]✖️ API调用错误: {str(e)}[/red]")
+    session.display_timeline()
+
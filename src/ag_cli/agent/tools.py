@@ -0,0 +1,330 @@
+# agent/tools.py
+"""
+Agent 可调用的工具：读取文件、grep 搜索、shell
+
+- read_file / grep 的路径限制在工作目录内
+- grep 跳过指向工作目录之外的符号链接
+- shell 优先在隔离环境中运行（bwrap：整个文件系统只读、无网络；unshare：工作目录只读、
+  无网络），都不可用时由调用方逐条确认命令；CPU 时间和写入文件大小通过 ulimit 限制
+- 每个工具调用都有截止时间，到期后工具自行结束（返回部分结果或报错）
+- 输出统一经过 truncate_output 截断以节省 token
+"""
+import fnmatch
+import functools
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 单个工具输出的最大字符数
+MAX_OUTPUT_CHARS = 8000
+# read_file 默认读取的最大行数
+DEFAULT_READ_LINES = 400
+# grep 返回的最大匹配数
+MAX_GREP_MATCHES = 200
+# grep 跳过的目录
+SKIP_DIRS = {".git", ".venv", "venv", "node_modules", "__pycache__", ".mypy_cache"}
+# 每读取多少行检查一次截止时间
+DEADLINE_CHECK_LINES = 4096
+# shell 子进程的 CPU 时间（秒）和写入文件大小（512 字节块，即 50MB）上限
+SHELL_CPU_SECONDS = 30
+SHELL_FSIZE_BLOCKS = 50 * 1024 * 1024 // 512
+# 先用 ulimit 设置资源限制再 exec 目标命令；
+# 不使用 preexec_fn，它在多线程进程 fork 之后执行 Python 代码，可能死锁
+LIMIT_SCRIPT = (
+    f"ulimit -t {SHELL_CPU_SECONDS} && ulimit -f {SHELL_FSIZE_BLOCKS} "
+    '&& exec /bin/sh -c "$1"'
+)
+# unshare 的新挂载命名空间中把工作目录重新挂载为只读，再 exec 后续命令
+UNSHARE_SCRIPT = (
+    'mount --bind "$1" "$1" && mount -o remount,bind,ro "$1" '
+    '&& cd "$1" && shift && exec "$@"'
+)
+# 按优先级排列的隔离方式及其说明
+SANDBOX_BACKENDS = {
+    "bwrap": "整个文件系统只读（/tmp 为临时目录）、无网络",
+    "unshare": "工作目录只读、无网络（工作目录之外的文件仍可写）",
+}
+
+
+class ToolError(Exception):
+    """工具执行失败（错误信息会返回给模型）"""
+
+
+def truncate_output(text, limit=MAX_OUTPUT_CHARS):
+    """保留开头和结尾，截断中间部分"""
+    if len(text) <= limit:
+        return text
+    head = limit * 2 // 3
+    tail = limit - head
+    omitted = len(text) - head - tail
+    return f"{text[:head]}\n...[已截断 {omitted} 个字符]...\n{text[-tail:]}"
+
+
+class Workspace:
+    """工具可访问的工作目录"""
+
+    def __init__(self, root=None):
+        self.root = Path(root or os.getcwd()).resolve()
+
+    def resolve(self, path):
+        """解析路径并确保其位于工作目录内"""
+        target = (self.root / path).resolve()
+        if target != self.root and self.root not in target.parents:
+            raise ToolError(f"路径超出工作目录: {path}")
+        return target
+
+
+def _expired(deadline):
+    return deadline is not None and time.monotonic() >= deadline
+
+
+def read_file(workspace, path, offset=1, limit=DEFAULT_READ_LINES, deadline=None):
+    """读取文件的部分行，带行号；deadline 为 time.monotonic() 截止时间"""
+    target = workspace.resolve(path)
+    if not target.is_file():
+        raise ToolError(f"文件不存在: {path}")
+    offset = max(1, int(offset))
+    limit = max(1, int(limit))
+    lines = []
+    total = 0
+    # 截止时间到达时停止读取，不再统计总行数
+    counted = True
+    with open(target, "r", encoding="utf-8", errors="replace") as f:
+        for number, line in enumerate(f, 1):
+            total = number
+            if offset <= number < offset + limit:
+                lines.append(f"{number:6d}\t{line.rstrip()}")
+            if number % DEADLINE_CHECK_LINES == 0 and _expired(deadline):
+                if not lines:
+                    raise ToolError(f"读取超时: 读到第 {number} 行仍未到达 offset")
+                counted = False
+                break
+    if not lines:
+        return f"(文件共 {total} 行，offset 超出范围)"
+    footer = ""
+    if not counted:
+        footer = f"\n(读取超时，已读到第 {total} 行，使用 offset={offset + len(lines)} 继续读取)"
+    elif offset + limit <= total:
+        footer = f"\n(共 {total} 行，使用 offset={offset + limit} 继续读取)"
+    return "\n".join(lines) + footer
+
+
+def grep(workspace, pattern, path=".", glob=None, deadline=None):
+    """在文件中搜索正则表达式，截止时间到达时返回已找到的部分结果"""
+    try:
+        regex = re.compile(pattern)
+    except re.error as e:
+        raise ToolError(f"无效的正则表达式: {e}")
+    base = workspace.resolve(path)
+    files = [base] if base.is_file() else _walk(base, glob)
+
+    matches = []
+    for file in files:
+        if _expired(deadline):
+            matches.append("...(搜索超时，结果不完整)")
+            return "\n".join(matches)
+        if file.is_symlink():
+            # 符号链接可能指向工作目录之外
+            try:
+                workspace.resolve(file)
+            except ToolError:
+                continue
+        try:
+            with open(file, "r", encoding="utf-8", errors="strict") as f:
+                for number, line in enumerate(f, 1):
+                    if number % DEADLINE_CHECK_LINES == 0 and _expired(deadline):
+                        break
+                    if regex.search(line):
+                        relative = file.relative_to(workspace.root)
+                        matches.append(f"{relative}:{number}: {line.rstrip()}")
+                        if len(matches) >= MAX_GREP_MATCHES:
+                            matches.append(f"...(已达到 {MAX_GREP_MATCHES} 条上限)")
+                            return "\n".join(matches)
+        except (UnicodeDecodeError, OSError):
+            # 跳过二进制或不可读文件
+            continue
+    return "\n".join(matches) if matches else "(无匹配)"
+
+
+def _walk(base, glob):
+    for root, dirs, files in os.walk(base):
+        dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS)
+        for name in sorted(files):
+            if glob and not fnmatch.fnmatch(name, glob):
+                continue
+            yield Path(root) / name
+
+
+def _sandbox_prefix(backend, root):
+    """隔离环境的启动参数，后接要执行的命令"""
+    if backend == "bwrap":
+        return [
+            "bwrap",
+            "--ro-bind",
+            "/",
+            "/",
+            "--dev",
+            "/dev",
+            "--proc",
+            "/proc",
+            "--tmpfs",
+            "/tmp",
+            "--unshare-all",
+            "--die-with-parent",
+            "--chdir",
+            str(root),
+            "--",
+        ]
+    return [
+        "unshare",
+        "--user",
+        "--map-root-user",
+        "--net",
+        "--mount",
+        "--",
+        "/bin/sh",
+        "-c",
+        UNSHARE_SCRIPT,
+        "ag-sandbox",
+        str(root),
+    ]
+
+
+@functools.lru_cache(maxsize=None)
+def detect_sandbox():
+    """
+    探测可用的隔离方式，返回 SANDBOX_BACKENDS 中的名称，都不可用时返回 None
+
+    unshare 需要系统允许非特权用户命名空间，因此实际运行一次确认
+    """
+    if os.name != "posix":
+        return None
+    probe_root = Path(tempfile.gettempdir()).resolve()
+    for backend in SANDBOX_BACKENDS:
+        if not shutil.which(backend):
+            continue
+        try:
+            result = subprocess.run(
+                [*_sandbox_prefix(backend, probe_root), "true"],
+                stdin=subprocess.DEVNULL,
+                capture_output=True,
+                timeout=5,
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            continue
+        if result.returncode == 0:
+            return backend
+    return None
+
+
+def shell(workspace, command, timeout=30, deadline=None, sandbox=None):
+    """
+    在工作目录中执行 shell 命令
+
+    sandbox 为 detect_sandbox() 返回的隔离方式；为 None 时以当前用户权限直接运行，
+    调用方应在执行前让用户确认命令
+    """
+    if deadline is not None:
+        timeout = max(0.1, min(timeout, deadline - time.monotonic()))
+    env = {
+        "PATH": os.environ.get("PATH", ""),
+        "HOME": str(workspace.root),
+        "LANG": os.environ.get("LANG", "C.UTF-8"),
+    }
+    if sys.platform == "win32":
+        env["SYSTEMROOT"] = os.environ.get("SYSTEMROOT", "")
+    if os.name == "posix":
+        args = ["/bin/sh", "-c", LIMIT_SCRIPT, "ag-shell", command]
+        if sandbox:
+            args = _sandbox_prefix(sandbox, workspace.root) + args
+    else:
+        args = command
+    try:
+        result = subprocess.run(
+            args,
+            shell=os.name != "posix",
+            cwd=workspace.root,
+            env=env,
+            stdin=subprocess.DEVNULL,
+            capture_output=True,
+            text=True,
+            errors="replace",
+            timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        raise ToolError(f"命令超时（{timeout:.0f}s）: {command}")
+    output = result.stdout
+    if result.stderr:
+        output += f"\n[stderr]\n{result.stderr}"
+    return f"[exit {result.returncode}]\n{output}"
+
+
+# 工具定义（OpenAI tools 格式）
+TOOL_SCHEMAS = {
+    "read_file": {
+        "type": "function",
+        "function": {
+            "name": "read_file",
+            "description": "读取工作目录中文本文件的若干行（带行号）",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "path": {"type": "string", "description": "相对工作目录的路径"},
+                    "offset": {"type": "integer", "description": "起始行号，从1开始"},
+                    "limit": {"type": "integer", "description": "读取的最大行数"},
+                },
+                "required": ["path"],
+            },
+        },
+    },
+    "grep": {
+        "type": "function",
+        "function": {
+            "name": "grep",
+            "description": "在工作目录的文件中按正则表达式搜索，返回 文件:行号: 内容",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "pattern": {"type": "string", "description": "Python 正则表达式"},
+                    "path": {"type": "string", "description": "搜索的文件或目录"},
+                    "glob": {"type": "string", "description": "文件名过滤，如 *.py"},
+                },
+                "required": ["pattern"],
+            },
+        },
+    },
+    "shell": {
+        "type": "function",
+        "function": {
+            "name": "shell",
+            "description": "在工作目录中执行 shell 命令（有超时）",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "command": {"type": "string", "description": "要执行的命令"},
+                },
+                "required": ["command"],
+            },
+        },
+    },
+}
+
+TOOL_FUNCTIONS = {
+    "read_file": read_file,
+    "grep": grep,
+    "shell": shell,
+}
+
+
+def get_tool_schemas(allow_shell=False):
+    """返回启用的工具定义列表"""
+    return [
+        schema
+        for name, schema in TOOL_SCHEMAS.items()
+        if allow_shell or name != "shell"
+    ]
@@ -0,0 +1,380 @@
+# analytics.py
+"""
+对话统计归档
+
+每轮对话记录一行元数据（模型、消息大小、token 用量、首 token 时间、总耗时、
+重试次数、缓存命中等），按月写入 ~/.ag-cli/analytics/YYYY-MM.agc：
+- 文件由若干段组成，每段按列存储（array 列 + zlib 压缩），进程退出或缓冲满时追加一段
+- 字符串列（模型、模式）按段做字典编码
+- 可选保存消息正文（配置 analytics_bodies: true），单独压缩，统计时不读取
+- 读取时只解压需要的列
+- 每次退出都会追加一个小段，ag stats 会把小段数量较多的文件合并为大段
+  （先写临时文件再替换，期间持有独占锁；不支持 flock 的平台不合并）
+设置环境变量 AG_ANALYTICS=0 或配置 analytics: false 可关闭记录
+"""
+import atexit
+import json
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from contextlib import contextmanager
+from datetime import datetime
+
+from .config import CONFIG_DIR, ensure_config_dir, read_config_file
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+ANALYTICS_DIR = CONFIG_DIR / "analytics"
+SEGMENT_MAGIC = b"AGS1"
+FILE_SUFFIX = ".agc"
+
+# 缓冲多少行后写出一段
+FLUSH_ROWS = 64
+# 行数少于 COMPACT_ROWS 的段达到多少个时合并
+COMPACT_SEGMENTS = 16
+# 合并后每段的最大行数
+COMPACT_ROWS = 4096
+# 追加写入与合并之间的进程间锁
+LOCK_FILE = ".lock"
+
+# (列名, array 类型码)；类型码为 None 的列按字典编码为 H
+COLUMNS = (
+    ("ts", "d"),
+    ("model", None),
+    ("mode", None),
+    ("prompt_chars", "I"),
+    ("context_chars", "I"),
+    ("response_chars", "I"),
+    ("prompt_tokens", "i"),
+    ("completion_tokens", "i"),
+    ("reasoning_tokens", "i"),
+    ("cached_tokens", "i"),
+    ("ttft", "f"),
+    ("total", "f"),
+    ("retries", "B"),
+    ("status", "B"),
+)
+COLUMN_TYPES = dict(COLUMNS)
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+
+def _encode_segment(rows, bodies=None):
+    """把若干行编码为一段"""
+    header = {
+        "rows": len(rows),
+        "byteorder": sys.byteorder,
+        "columns": [],
+        "dictionaries": {},
+    }
+    blobs = []
+    for name, typecode in COLUMNS:
+        values = [row.get(name) for row in rows]
+        if typecode is None:
+            dictionary = sorted({value or "" for value in values})
+            codes = {value: i for i, value in enumerate(dictionary)}
+            header["dictionaries"][name] = dictionary
+            column = array("H", (codes[value or ""] for value in values))
+            typecode = "H"
+        else:
+            # 缺失的数值记为 -1
+            default = -1 if typecode in ("i", "f", "d") else 0
+            column = array(
+                typecode, (default if value is None else value for value in values)
+            )
+        blob = zlib.compress(column.tobytes(), 6)
+        header["columns"].append([name, typecode, len(blob)])
+        blobs.append(blob)
+
+    if bodies is not None:
+        blob = zlib.compress(json.dumps(bodies, ensure_ascii=False).encode("utf-8"), 6)
+        header["bodies"] = len(blob)
+        blobs.append(blob)
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    return b"".join(
+        [SEGMENT_MAGIC, struct.pack("<I", len(header_bytes)), header_bytes, *blobs]
+    )
+
+
+def iter_segments(data):
+    """遍历文件中的段，产出 (header, 数据起始偏移)"""
+    view = memoryview(data)
+    offset = 0
+    while offset + 8 <= len(data):
+        if bytes(view[offset : offset + 4]) != SEGMENT_MAGIC:
+            # 写入中断留下的残段，之后的内容无法解析
+            break
+        (header_length,) = struct.unpack_from("<I", data, offset + 4)
+        start = offset + 8 + header_length
+        if start > len(data):
+            break
+        header = json.loads(bytes(view[offset + 8 : start]))
+        size = sum(length for _, _, length in header["columns"])
+        size += header.get("bodies", 0)
+        if start + size > len(data):
+            break
+        yield header, start
+        offset = start + size
+
+
+def _decode_column(data, header, start, name):
+    """解压段中的一列，字典列返回字符串列表"""
+    offset = start
+    for column_name, typecode, length in header["columns"]:
+        if column_name == name:
+            column = array(typecode)
+            column.frombytes(zlib.decompress(data[offset : offset + length]))
+            if header["byteorder"] != sys.byteorder:
+                column.byteswap()
+            dictionary = header["dictionaries"].get(name)
+            if dictionary is not None:
+                return [dictionary[code] for code in column]
+            return column
+        offset += length
+    # 旧版本文件中没有的列：字典列为空字符串，数值列按缺失值处理
+    typecode = COLUMN_TYPES.get(name)
+    if typecode is None:
+        return [""] * header["rows"]
+    default = -1 if typecode in ("i", "f", "d") else 0
+    return array(typecode, [default]) * header["rows"]
+
+
+def _decode_bodies(data, header, start):
+    """解压段中保存的正文 [[问题, 回答], ...]，未保存时返回 None"""
+    if not header.get("bodies"):
+        return None
+    offset = start + sum(length for _, _, length in header["columns"])
+    return json.loads(zlib.decompress(data[offset : offset + header["bodies"]]))
+
+
+def _decode_rows(data, header, start):
+    """把一段解码为行字典列表"""
+    columns = [(name, _decode_column(data, header, start, name)) for name, _ in COLUMNS]
+    return [
+        {name: column[i] for name, column in columns} for i in range(header["rows"])
+    ]
+
+
+def month_files(since=None):
+    """按时间顺序列出归档文件，since 为时间戳时跳过更早的月份"""
+    if not ANALYTICS_DIR.exists():
+        return []
+    first = datetime.fromtimestamp(since).strftime("%Y-%m") if since else ""
+    return sorted(
+        path for path in ANALYTICS_DIR.glob(f"*{FILE_SUFFIX}") if path.stem >= first
+    )
+
+
+def scan(columns, since=None):
+    """
+    读取指定列，返回 ({列名: array 或 list}, 行数)
+
+    since 为时间戳时只返回之后的行
+    """
+    names = list(dict.fromkeys(["ts", *columns]))
+    result = {
+        name: [] if COLUMN_TYPES.get(name) is None else array(COLUMN_TYPES[name])
+        for name in names
+    }
+    for path in month_files(since):
+        data = path.read_bytes()
+        for header, start in iter_segments(data):
+            for name in names:
+                result[name].extend(_decode_column(data, header, start, name))
+
+    rows = len(result["ts"])
+    if since and rows:
+        keep = [ts >= since for ts in result["ts"]]
+        if not all(keep):
+            from itertools import compress
+
+            for name, column in result.items():
+                values = list(compress(column, keep))
+                result[name] = (
+                    values
+                    if isinstance(column, list)
+                    else array(column.typecode, values)
+                )
+            rows = len(result["ts"])
+    return result, rows
+
+
+def read_bodies(since=None):
+    """读取保存的消息正文 [(时间戳, 问题, 回答), ...]"""
+    bodies = []
+    for path in month_files(since):
+        data = path.read_bytes()
+        for header, start in iter_segments(data):
+            entries = _decode_bodies(data, header, start)
+            if entries is None:
+                continue
+            timestamps = _decode_column(data, header, start, "ts")
+            for ts, (prompt, response) in zip(timestamps, entries):
+                if not since or ts >= since:
+                    bodies.append((ts, prompt, response))
+    return bodies
+
+
+@contextmanager
+def _locked(directory, exclusive=False):
+    """归档目录的进程间锁：追加写入共享，合并独占；不支持 flock 时不加锁"""
+    if fcntl is None:
+        yield
+        return
+    fd = os.open(directory / LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+    finally:
+        # 关闭文件描述符即释放锁
+        os.close(fd)
+
+
+def compact_file(path, min_segments=COMPACT_SEGMENTS):
+    """
+    把文件中的小段合并为每段最多 COMPACT_ROWS 行，返回合并前的段数（未合并时返回 0）
+
+    保存了正文和未保存正文的相邻段分别合并；文件末尾写入中断留下的残段会被丢弃
+    """
+    if fcntl is None:
+        # 无法阻止其他进程在替换文件期间追加写入
+        return 0
+    with _locked(path.parent, exclusive=True):
+        data = path.read_bytes()
+        segments = list(iter_segments(data))
+        small = sum(1 for header, _ in segments if header["rows"] < COMPACT_ROWS)
+        if small < min_segments:
+            return 0
+
+        # [(是否保存正文, 行列表, 正文列表)]
+        groups = []
+        for header, start in segments:
+            bodies = _decode_bodies(data, header, start)
+            if not groups or groups[-1][0] != (bodies is not None):
+                groups.append((bodies is not None, [], []))
+            groups[-1][1].extend(_decode_rows(data, header, start))
+            if bodies is not None:
+                groups[-1][2].extend(bodies)
+
+        parts = []
+        for has_bodies, rows, bodies in groups:
+            for i in range(0, len(rows), COMPACT_ROWS):
+                parts.append(
+                    _encode_segment(
+                        rows[i : i + COMPACT_ROWS],
+                        bodies[i : i + COMPACT_ROWS] if has_bodies else None,
+                    )
+                )
+
+        tmp = path.with_suffix(".tmp")
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.write(fd, b"".join(parts))
+        finally:
+            os.close(fd)
+        os.replace(tmp, path)
+    return len(segments)
+
+
+def compact_archives(min_segments=COMPACT_SEGMENTS):
+    """合并所有归档文件中的小段，返回合并的文件数"""
+    compacted = 0
+    for path in month_files():
+        try:
+            if compact_file(path, min_segments):
+                compacted += 1
+        except OSError:
+            # 合并失败时保留原文件
+            pass
+    return compacted
+
+
+class Archive:
+    """按月追加写入的统计归档"""
+
+    def __init__(self, directory=None, keep_bodies=False):
+        self.directory = directory or ANALYTICS_DIR
+        self.keep_bodies = keep_bodies
+        self._rows = []
+        self._bodies = []
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def record(self, prompt=None, response=None, **fields):
+        """记录一轮对话，字段见 COLUMNS"""
+        fields.setdefault("ts", time.time())
+        with self._lock:
+            self._rows.append(fields)
+            if self.keep_bodies:
+                self._bodies.append([prompt or "", response or ""])
+            full = len(self._rows) >= FLUSH_ROWS
+        if full:
+            self.flush()
+
+    def flush(self):
+        """把缓冲的行作为一段追加到当月文件"""
+        with self._lock:
+            rows, self._rows = self._rows, []
+            bodies, self._bodies = self._bodies, []
+        if not rows:
+            return
+        # 跨月时按行所属的月份分别写入
+        by_month = {}
+        for i, row in enumerate(rows):
+            month = datetime.fromtimestamp(row["ts"]).strftime("%Y-%m")
+            by_month.setdefault(month, []).append(i)
+        try:
+            ensure_config_dir()
+            self.directory.mkdir(exist_ok=True)
+            for month, indices in by_month.items():
+                segment = _encode_segment(
+                    [rows[i] for i in indices],
+                    [bodies[i] for i in indices] if self.keep_bodies else None,
+                )
+                # 单次追加写入，多个进程同时写时各段保持完整；
+                # 共享锁保证不会写入正在被合并替换的旧文件
+                with _locked(self.directory):
+                    fd = os.open(
+                        self.directory / f"{month}{FILE_SUFFIX}",
+                        os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+                        0o600,
+                    )
+                    try:
+                        os.write(fd, segment)
+                    finally:
+                        os.close(fd)
+        except OSError:
+            # 统计写入失败不影响对话
+            pass
+
+
+_archive = None
+
+
+def analytics_enabled():
+    if os.environ.get("AG_ANALYTICS") == "0":
+        return False
+    return read_config_file().get("analytics", True) is not False
+
+
+def get_archive():
+    """返回进程内共享的归档对象，关闭记录时返回 None"""
+    global _archive
+    if _archive is None:
+        if not analytics_enabled():
+            return None
+        keep_bodies = (
+            os.environ.get("AG_ANALYTICS_BODIES") == "1"
+            or read_config_file().get("analytics_bodies", False) is True
+        )
+        _archive = Archive(keep_bodies=keep_bodies)
+    return _archive
@@ -1,7 +1,10 @@
 import httpx
-from openai import OpenAI
+from openai import OpenAI, APIStatusError
 from .config import load_config
+from .key_pool import KEY_STATS_FILE, KeyPool
+from .utils.tracing import span
 from tenacity import retry, stop_after_attempt, wait_exponential
+import socket
 import time
 from functools import wraps
 
@@ -27,14 +30,84 @@ def timing_decorator(use_pretty=True):
     return decorator
 
 
+def split_delta(chunk):
+    """从流式 chunk 中取出 (reasoning_content, content)，缺失的部分为 None"""
+    if not chunk.choices:
+        return None, None
+    delta = chunk.choices[0].delta
+    return getattr(delta, "reasoning_content", None), delta.content
+
+
+def abort_stream(stream):
+    """
+    从其他线程中止流式响应
+
+    关闭底层 socket 的读写，阻塞在读取下一个分块上的线程会立即返回；
+    取不到 socket 时退回为关闭响应对象
+    """
+    if stream is None:
+        return
+    response = getattr(stream, "response", None)
+    extensions = getattr(response, "extensions", None) or {}
+    network_stream = extensions.get("network_stream")
+    sock = network_stream.get_extra_info("socket") if network_stream else None
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+            return
+        except OSError:
+            pass
+    close = getattr(stream, "close", None)
+    if close:
+        try:
+            close()
+        except Exception:
+            pass
+
+
 class DeepSeekClient:
-    def __init__(self, use_pretty=True):
-        self.config = load_config()
+    def __init__(self, use_pretty=True, config=None):
+        # config 默认从配置文件/环境变量加载，压测等场景可传入覆盖后的配置
+        self.config = config or load_config()
+        # SDK 自身不重试：重试由 tenacity 经 _create 发出，才能换用密钥池中的其他密钥，
+        # 并被 attempts 计数
         self.client = OpenAI(
             api_key=self.config["api_key"],
             base_url=self.config["base_url"],
+            max_retries=0,
+        )
+        self.key_pool = KeyPool(
+            self.config["api_keys"],
+            self.config["key_strategy"],
+            self.config.get("key_stats_file", KEY_STATS_FILE),
         )
         self.use_pretty = use_pretty
+        # 实际发出的请求次数（含重试），用于统计重试次数
+        self.attempts = 0
+
+    def _create(self, **kwargs):
+        """从密钥池选择密钥发送请求，并记录该密钥的健康状态"""
+        self.attempts += 1
+        key_state = self.key_pool.select()
+        client = self.client
+        if key_state.key != self.config["api_key"]:
+            client = self.client.with_options(api_key=key_state.key)
+
+        try:
+            raw = client.chat.completions.with_raw_response.create(**kwargs)
+        except APIStatusError as e:
+            if e.status_code == 401:
+                self.key_pool.report_unauthorized(key_state)
+                raise ValueError(f"DASHSCOPE_API_KEY is invalid: {key_state.masked}")
+            elif e.status_code == 429:
+                self.key_pool.report_throttle(
+                    key_state, e.response.headers.get("retry-after")
+                )
+                raise ValueError(f"Rate limit exceeded: {key_state.masked}")
+            raise
+
+        self.key_pool.report_success(key_state, raw.headers)
+        return raw.parse()
 
     def resolve_model_name(self, model_alias):
         """将模型代称解析为实际模型名称"""
@@ -63,11 +136,13 @@ class DeepSeekClient:
                     else self.config["default_model"]
                 )
 
-                return self.client.chat.completions.create(
-                    model=actual_model,
-                    messages=[{"role": "user", "content": message}],
-                    stream=True,
-                )
+                with span("request.send", model=actual_model):
+                    return self._create(
+                        model=actual_model,
+                        messages=[{"role": "user", "content": message}],
+                        stream=True,
+                        stream_options={"include_usage": True},
+                    )
 
             except httpx.HTTPStatusError as e:
                 if e.response.status_code == 401:
@@ -98,11 +173,15 @@ class DeepSeekClient:
                     else self.config["default_model"]
                 )
 
-                return self.client.chat.completions.create(
-                    model=actual_model,
-                    messages=messages,
-                    stream=True,
-                )
+                with span(
+                    "request.send", model=actual_model, messages=len(messages)
+                ):
+                    return self._create(
+                        model=actual_model,
+                        messages=messages,
+                        stream=True,
+                        stream_options={"include_usage": True},
+                    )
 
             except httpx.HTTPStatusError as e:
                 if e.response.status_code == 401:
@@ -116,14 +195,87 @@ class DeepSeekClient:
 
         return _get_chat_completion_stream()
 
+    @retry(
+        stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10)
+    )
+    def get_agent_stream(self, messages, tools, model=None):
+        """获取带工具定义的流式响应对象（Agent模式）"""
+        try:
+            actual_model = (
+                self.resolve_model_name(model) if model else self.config["default_model"]
+            )
+
+            with span("request.send", model=actual_model, messages=len(messages)):
+                return self._create(
+                    model=actual_model,
+                    messages=messages,
+                    tools=tools,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                )
+
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 401:
+                raise ValueError("DASHSCOPE_API_KEY is invalid")
+            elif e.response.status_code == 429:
+                raise ValueError("Rate limit exceeded")
+            else:
+                raise e
+        except Exception as e:
+            raise Exception(f"API request failed: {str(e)}")
+
+    @retry(
+        stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10)
+    )
+    def get_sampling_stream(self, messages, model=None, n=1):
+        """获取采样用的流式响应对象，n>1 时一次请求返回多个候选（需接口支持）"""
+        try:
+            actual_model = (
+                self.resolve_model_name(model) if model else self.config["default_model"]
+            )
+
+            options = {"n": n} if n > 1 else {}
+            with span("request.send", model=actual_model, n=n):
+                return self._create(
+                    model=actual_model,
+                    messages=messages,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    **options,
+                )
+
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 401:
+                raise ValueError("DASHSCOPE_API_KEY is invalid")
+            elif e.response.status_code == 429:
+                raise ValueError("Rate limit exceeded")
+            else:
+                raise e
+        except Exception as e:
+            raise Exception(f"API request failed: {str(e)}")
+
+    def get_raw_stream(self, messages, model=None):
+        """不重试、不包装异常的流式请求（压测使用，保留原始状态码）"""
+        actual_model = (
+            self.resolve_model_name(model) if model else self.config["default_model"]
+        )
+        with span("request.send", model=actual_model, messages=len(messages)):
+            return self._create(
+                model=actual_model,
+                messages=messages,
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+
     # 保留原有的非流式方法（向后兼容）
     def chat(self, message, model=None):
         """流式聊天接口 - 单次对话（收集完整响应）"""
         stream = self.get_chat_stream(message, model)
         full_response = ""
         for chunk in stream:
-            if chunk.choices[0].delta.content:
-                content = chunk.choices[0].delta.content
+            # 推理内容（reasoning_content）不计入回答
+            _, content = split_delta(chunk)
+            if content:
                 full_response += content
         return full_response
 
@@ -132,7 +284,8 @@ class DeepSeekClient:
         stream = self.get_chat_completion_stream(messages, model)
         full_response = ""
         for chunk in stream:
-            if chunk.choices[0].delta.content:
-                content = chunk.choices[0].delta.content
+            # 推理内容（reasoning_content）不计入回答
+            _, content = split_delta(chunk)
+            if content:
                 full_response += content
         return full_response
@@ -0,0 +1,186 @@
+# chat/compaction.py
+"""
+发送前的提示词压缩
+
+逐行流式处理，时间复杂度与输入长度成线性，用于多 MB 的粘贴内容：
+- 去除 ANSI 转义序列、行尾空白和多余空行
+- 只折叠日志行（以时间戳或日志级别开头）：连续相同的日志行合并为一行并标注次数，
+  连续的近似日志行（只有数字/十六进制/UUID 不同）只保留首尾两行
+- 其他内容（包括未放在代码块中的代码）即使连续重复也原样保留
+- ``` / ~~~ 代码块、Markdown 表格和 CSV/TSV 数据行原样保留，不做任何合并
+原文保存在本地历史中用于显示，发送给模型的是压缩后的内容
+"""
+import io
+import re
+
+ANSI_RE = re.compile(r"\x1b\[[0-?]*[ -/]*[@-~]|\x1b\][^\x07\x1b]*(?:\x07|\x1b\\)|\x1b[@-Z\\-_]")
+# 近似行比较时替换为占位符的可变部分
+VARIABLE_RE = re.compile(
+    r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"
+    r"|0x[0-9a-fA-F]+|\b[0-9a-fA-F]{8,}\b|\d+"
+)
+CJK_RE = re.compile(r"[⺀-鿿가-힯＀-￯]")
+
+# 日志行：以时间戳（日期+时间或时间）或日志级别开头
+LOG_LINE_RE = re.compile(
+    r"\s*[\[(]?(?:"
+    r"\d{4}[-/]\d{2}[-/]\d{2}[T ]\d{2}:\d{2}"
+    r"|\d{2}:\d{2}:\d{2}"
+    r"|[A-Z][a-z]{2} [ \d]\d \d{2}:\d{2}:\d{2}"
+    r"|(?:TRACE|DEBUG|INFO|NOTICE|WARN|WARNING|ERROR|FATAL|CRITICAL)\b"
+    r")"
+)
+FENCE_MARKERS = ("```", "~~~")
+
+# 近似行至少连续出现多少行才折叠
+MIN_SIMILAR_RUN = 3
+# 参与近似比较的最短行长度（避免把短的数据行当成日志折叠）
+MIN_SIMILAR_LENGTH = 16
+
+
+def estimate_tokens(text):
+    """粗略估算 token 数：中日韩字符按 1 个，其余按每 4 个字符 1 个"""
+    cjk = len(CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _normalize(line):
+    """日志行的比较键，非日志行返回 None（只合并完全相同的行）"""
+    if len(line) < MIN_SIMILAR_LENGTH or not LOG_LINE_RE.match(line):
+        return None
+    return VARIABLE_RE.sub("#", line)
+
+
+def _fence_marker(line):
+    stripped = line.lstrip()
+    return stripped[:3] if stripped.startswith(FENCE_MARKERS) else None
+
+
+def _is_table_row(line):
+    """Markdown 表格行或 CSV/TSV 数据行（日志行除外）"""
+    if LOG_LINE_RE.match(line):
+        return False
+    return line.lstrip().startswith("|") or "\t" in line or line.count(",") >= 2
+
+
+def _emit_run(first, last, count, identical):
+    """输出一组连续的相同/近似行"""
+    if count == 1:
+        yield first
+    elif identical:
+        yield f"{first} [×{count}]"
+    elif count < MIN_SIMILAR_RUN:
+        yield first
+        yield last
+    else:
+        yield first
+        yield f"[… 省略 {count - 2} 行相似内容 …]"
+        yield last
+
+
+def compact_lines(lines):
+    """
+    流式压缩：输入可迭代的行（可带换行符），逐行产出压缩后的行
+
+    只保留当前这一组连续行的首尾，内存占用与输入大小无关
+    """
+    first = last = key = None
+    count = 0
+    identical = True
+    # 当前这组行是否为日志行（只有日志行参与折叠）
+    is_log = False
+    blank_pending = False
+    emitted = False
+    # 当前所在代码块的结束标记
+    fence = None
+
+    for raw in lines:
+        if "\x1b" in raw:
+            raw = ANSI_RE.sub("", raw)
+        line = raw.rstrip()
+
+        if fence is not None:
+            # 代码块内原样保留（包括空行）
+            yield line
+            if line.lstrip().startswith(fence):
+                fence = None
+            continue
+
+        if not line:
+            # 连续空行只保留一个，开头的空行直接丢弃
+            blank_pending = emitted or first is not None
+            continue
+
+        marker = _fence_marker(line)
+        verbatim = marker is not None or _is_table_row(line)
+
+        if first is not None and is_log and not blank_pending and not verbatim:
+            if line == last:
+                count += 1
+                continue
+            if key is not None:
+                line_key = _normalize(line)
+                if line_key == key:
+                    count += 1
+                    identical = False
+                    last = line
+                    continue
+
+        if first is not None:
+            yield from _emit_run(first, last, count, identical)
+            emitted = True
+        if blank_pending:
+            yield ""
+            blank_pending = False
+
+        if verbatim:
+            yield line
+            emitted = True
+            first = None
+            fence = marker
+            continue
+
+        first = last = line
+        key = _normalize(line)
+        is_log = LOG_LINE_RE.match(line) is not None
+        count = 1
+        identical = True
+
+    if first is not None:
+        yield from _emit_run(first, last, count, identical)
+
+
+class CompactResult:
+    """压缩结果与节省的 token 估算"""
+
+    __slots__ = ("text", "original_tokens", "compact_tokens")
+
+    def __init__(self, text, original_tokens, compact_tokens):
+        self.text = text
+        self.original_tokens = original_tokens
+        self.compact_tokens = compact_tokens
+
+    @property
+    def saved_tokens(self):
+        return self.original_tokens - self.compact_tokens
+
+    @property
+    def ratio(self):
+        if not self.original_tokens:
+            return 0.0
+        return self.saved_tokens / self.original_tokens
+
+    def summary(self):
+        return (
+            f"约 {self.original_tokens:,} → {self.compact_tokens:,} tokens"
+            f"（节省 {self.ratio:.0%}）"
+        )
+
+
+def compact_text(text):
+    """压缩一段文本，没有可压缩内容时返回原文"""
+    compacted = "\n".join(compact_lines(io.StringIO(text)))
+    original_tokens = estimate_tokens(text)
+    if compacted == text:
+        return CompactResult(text, original_tokens, original_tokens)
+    return CompactResult(compacted, original_tokens, estimate_tokens(compacted))
@@ -1,7 +1,19 @@
 # chat/history_manager.py
-import math
-from rich.panel import Panel
-from rich.markdown import Markdown
+from ag_cli.utils.tracing import span
+from ag_cli.chat.history_store import MAX_STORED_MESSAGES, HistoryStore, HistoryView
+from ag_cli.chat.history_viewer import HistoryViewer
+
+# 超过该消息数时截断上下文
+MAX_CONTEXT_MESSAGES = 20
+# 截断后保留的最近消息数（不含系统消息）
+RECENT_MESSAGES = 18
+
+
+def context_window_start(length):
+    """返回截断后保留的第一条非系统消息的下标"""
+    if length > MAX_CONTEXT_MESSAGES:
+        return length - RECENT_MESSAGES
+    return 1
 
 
 def manage_context(conversation_history, max_tokens=120000):
@@ -9,58 +21,51 @@ def manage_context(conversation_history, max_tokens=120000):
     管理对话上下文，防止超过模型限制
     简单的实现：保留最近N轮对话
     """
-    # 如果对话历史太长，保留最近的对话
-    if len(conversation_history) > 20:  # 保留最近10轮对话（20条消息）
-        # 保留系统消息和最近的对话
-        system_msg = conversation_history[0]  # 系统消息
-        recent_history = conversation_history[-18:]  # 最近9轮对话
-        return [system_msg] + recent_history
+    # 如果对话历史太长，保留系统消息和最近9轮对话（18条消息）
+    start = context_window_start(len(conversation_history))
+    if start > 1:
+        return [conversation_history[0]] + list(conversation_history[start:])
     return conversation_history
 
 
 class HistoryManager:
     """对话历史管理类"""
 
-    def __init__(self, system_prompt):
-        self.conversation_history = []
+    def __init__(self, system_prompt, max_records=MAX_STORED_MESSAGES):
+        # 保存的消息数不少于上下文窗口，否则发送给模型的上下文会被提前截断
+        self.store = HistoryStore(max_records=max(max_records, MAX_CONTEXT_MESSAGES))
         self.system_prompt = system_prompt
         self.reset_history()
 
+    @property
+    def conversation_history(self):
+        """完整对话历史的只读视图"""
+        return HistoryView(self.store)
+
     def reset_history(self):
         """重置对话历史"""
-        self.conversation_history = [{"role": "system", "content": self.system_prompt}]
+        self.store.clear()
+        self.store.append("system", self.system_prompt)
 
-    def add_user_message(self, message):
-        """添加用户消息"""
-        self.conversation_history.append({"role": "user", "content": message})
+    def add_user_message(self, message, original=None):
+        """添加用户消息，original 为压缩前的原文（查看历史时显示）"""
+        self.store.append("user", message, original)
 
     def add_assistant_message(self, message):
         """添加AI回复"""
-        self.conversation_history.append({"role": "assistant", "content": message})
+        self.store.append("assistant", message)
+
+    def pop_last_user_message(self):
+        """移除最后一条用户消息（API调用失败时使用）"""
+        records = self.store.records
+        if len(records) > 1 and records[-1].role == "user":
+            self.store.pop()
 
     def get_managed_history(self):
-        """获取管理后的对话历史（防止过长）"""
-        return manage_context(self.conversation_history)
+        """获取管理后的对话历史（防止过长），返回惰性视图（耗时在迭代视图时记录）"""
+        return HistoryView(self.store, context_window_start(len(self.store)))
 
-    def display_history(self, console, use_pretty=True):
-        """显示对话历史"""
-        console.print("\n[bold yellow]📜 对话历史:[/bold yellow]")
-        for i, msg in enumerate(self.conversation_history[1:], 1):
-            if msg["role"] == "user":
-                console.print(
-                    Panel.fit(
-                        f"[bold cyan]{msg['content']}[/bold cyan]",
-                        title=f"[bold blue]😎 第{math.ceil(i / 2)}轮 - 用户问题[/bold blue]",
-                        border_style="blue",
-                    )
-                )
-            else:
-                console.print(
-                    f"[bold green]🤖 第{math.ceil(i / 2)}轮回复:[/bold green]"
-                )
-                if use_pretty:
-                    markdown = Markdown(msg["content"])
-                    console.print(markdown)
-                else:
-                    console.print(msg["content"])
-            console.print()
+    def display_history(self, console, use_pretty=True, command=None):
+        """分页显示对话历史，command 可为轮次编号或 '/搜索词'"""
+        with span("history.display", messages=len(self.store)):
+            HistoryViewer(self.store, console, use_pretty).show(command)
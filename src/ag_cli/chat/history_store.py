@@ -0,0 +1,236 @@
+# chat/history_store.py
+"""
+紧凑的对话历史存储
+
+- 每条消息是一个带 __slots__ 的记录，不再保存完整的 dict
+- 超过阈值的大消息正文按内容哈希写入磁盘上的 blob 目录，只保存一次，
+  重复粘贴同一内容时直接复用
+- HistoryView 以只读序列的形式按需生成消息 dict，发送给客户端时无需每轮复制
+- 经过压缩的消息另存原文（blob），查看历史时显示原文
+
+记录数超过 max_records 时按轮（用户消息 + 回复）丢弃最早的记录并释放其 blob，
+dropped 记录已丢弃的条数，.history 据此保持轮次编号不变。发送给模型的上下文
+由 HistoryView 截断。内存中每条消息最多 INLINE_LIMIT 字节，更大的正文只占磁盘；
+.clear 会释放全部记录和 blob
+"""
+import hashlib
+import shutil
+import tempfile
+import weakref
+from collections.abc import Sequence
+from pathlib import Path
+
+from ag_cli.utils.tracing import span
+
+# 超过该字节数的消息正文写入 blob 存储
+INLINE_LIMIT = 64 * 1024
+# 默认最多保存的消息数（不含系统消息）
+MAX_STORED_MESSAGES = 1000
+
+
+class BlobStore:
+    """基于内容寻址的磁盘 blob 存储（会话级，进程退出时清理）"""
+
+    def __init__(self, root=None):
+        if root is None:
+            root = tempfile.mkdtemp(prefix="ag-cli-blobs-")
+            # 临时目录随对象一起清理
+            self._finalizer = weakref.finalize(
+                self, shutil.rmtree, root, ignore_errors=True
+            )
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._refcounts = {}
+
+    def _path(self, digest):
+        return self.root / digest[:2] / digest[2:]
+
+    def put(self, data: bytes) -> str:
+        """写入数据并返回其 sha256 摘要，已存在时只增加引用计数"""
+        digest = hashlib.sha256(data).hexdigest()
+        if digest not in self._refcounts:
+            path = self._path(digest)
+            if not path.exists():
+                path.parent.mkdir(exist_ok=True)
+                tmp = path.with_suffix(".tmp")
+                tmp.write_bytes(data)
+                tmp.replace(path)
+            self._refcounts[digest] = 0
+        self._refcounts[digest] += 1
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        """读取 blob 内容"""
+        return self._path(digest).read_bytes()
+
+    def release(self, digest: str):
+        """释放一次引用，引用归零时删除文件"""
+        count = self._refcounts.get(digest, 0) - 1
+        if count > 0:
+            self._refcounts[digest] = count
+            return
+        self._refcounts.pop(digest, None)
+        self._path(digest).unlink(missing_ok=True)
+
+    def __contains__(self, digest):
+        return digest in self._refcounts
+
+    def __len__(self):
+        return len(self._refcounts)
+
+
+class MessageRecord:
+    """单条消息记录：小消息内联保存，大消息只保存摘要"""
+
+    __slots__ = ("role", "text", "digest", "size", "chars", "original")
+
+    def __init__(self, role, text=None, digest=None, size=0, chars=0, original=None):
+        self.role = role
+        self.text = text
+        self.digest = digest
+        # 正文的字节数和字符数
+        self.size = size
+        self.chars = chars
+        # 压缩前原文的 blob 摘要（未压缩时为 None）
+        self.original = original
+
+    @property
+    def is_blob(self):
+        return self.digest is not None
+
+
+class HistoryStore:
+    """消息记录列表 + blob 存储（超过 max_records 条时丢弃最早的轮次，见模块说明）"""
+
+    def __init__(
+        self,
+        blob_store=None,
+        inline_limit=INLINE_LIMIT,
+        max_records=MAX_STORED_MESSAGES,
+    ):
+        self.blobs = blob_store if blob_store is not None else BlobStore()
+        self.inline_limit = inline_limit
+        self.max_records = max_records
+        self.records = []
+        # 因超过上限而丢弃的记录数（总为偶数，轮次编号据此偏移）
+        self.dropped = 0
+
+    def append(self, role, content, original=None):
+        """追加一条消息，original 为压缩前的原文（仅用于显示）"""
+        data = content.encode("utf-8")
+        if len(data) > self.inline_limit:
+            record = MessageRecord(
+                role, digest=self.blobs.put(data), size=len(data), chars=len(content)
+            )
+        else:
+            record = MessageRecord(
+                role, text=content, size=len(data), chars=len(content)
+            )
+        if original is not None and original != content:
+            record.original = self.blobs.put(original.encode("utf-8"))
+        self.records.append(record)
+        self._evict()
+        return record
+
+    def _evict(self):
+        """超过上限时丢弃系统消息之后最早的一轮（两条记录）"""
+        while len(self.records) - 1 > self.max_records:
+            for record in self.records[1:3]:
+                self._release(record)
+            del self.records[1:3]
+            self.dropped += 2
+
+    def _release(self, record):
+        if record.is_blob:
+            self.blobs.release(record.digest)
+        if record.original is not None:
+            self.blobs.release(record.original)
+
+    def pop(self):
+        """移除并返回最后一条记录"""
+        record = self.records.pop()
+        self._release(record)
+        return record
+
+    def clear(self):
+        """清空所有记录"""
+        while self.records:
+            self.pop()
+        self.dropped = 0
+
+    def content(self, record):
+        """取出消息正文"""
+        if record.is_blob:
+            return self.blobs.get(record.digest).decode("utf-8")
+        return record.text
+
+    def display_content(self, record):
+        """取出用于显示的正文（压缩过的消息返回原文）"""
+        if record.original is not None:
+            return self.blobs.get(record.original).decode("utf-8")
+        return self.content(record)
+
+    def materialize(self, record):
+        """生成发送给 API 的消息 dict"""
+        return {"role": record.role, "content": self.content(record)}
+
+    def total_size(self):
+        """所有消息正文的字节数"""
+        return sum(record.size for record in self.records)
+
+    def inline_size(self):
+        """内联保存在内存中的正文字节数"""
+        return sum(record.size for record in self.records if not record.is_blob)
+
+    def __len__(self):
+        return len(self.records)
+
+
+class HistoryView(Sequence):
+    """
+    对话历史的只读视图：保留第一条（系统消息）和 start 之后的消息，
+    访问时才生成 dict，不复制底层记录列表
+
+    迭代和切片时一次性生成全部 dict（SDK 发送请求时会完整遍历），
+    读取 blob 的耗时记录在 history.materialize 区间中
+    """
+
+    def __init__(self, store, start=1):
+        self.store = store
+        self.start = max(1, start)
+
+    def _indices(self):
+        records = self.store.records
+        if not records:
+            return range(0)
+        return [0, *range(self.start, len(records))]
+
+    def __len__(self):
+        n = len(self.store.records)
+        if n == 0:
+            return 0
+        return 1 + max(0, n - self.start)
+
+    def char_count(self):
+        """视图内消息正文的字符数（不读取 blob）"""
+        records = self.store.records
+        return sum(records[i].chars for i in self._indices())
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            indices = self._indices()[index]
+            with span("history.materialize", messages=len(indices)):
+                return [self.store.materialize(self.store.records[i]) for i in indices]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("history index out of range")
+        real = 0 if index == 0 else self.start + index - 1
+        return self.store.materialize(self.store.records[real])
+
+    def __iter__(self):
+        records = self.store.records
+        indices = self._indices()
+        with span("history.materialize", messages=len(indices)):
+            messages = [self.store.materialize(records[i]) for i in indices]
+        return iter(messages)
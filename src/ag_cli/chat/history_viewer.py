@@ -0,0 +1,248 @@
+# chat/history_viewer.py
+"""
+分页对话历史查看器
+
+只渲染当前页的轮次，每条消息的渲染结果按 (内容哈希, 终端宽度) 缓存，
+打开历史的开销与会话长度无关。支持翻页、跳转到指定轮次和会话内搜索。
+"""
+import hashlib
+import math
+import sys
+from collections import OrderedDict
+
+from rich.markdown import Markdown
+from rich.panel import Panel
+from rich.segment import Segment, Segments
+from rich.text import Text
+
+# 每页显示的轮数
+PAGE_TURNS = 3
+# 单条消息最多显示的行数（超出部分折叠）
+MAX_MESSAGE_LINES = 80
+# 渲染缓存的最大条目数
+RENDER_CACHE_SIZE = 256
+# 搜索结果最多显示的条数
+MAX_SEARCH_HITS = 20
+
+# (内容哈希, 角色, 轮次, 宽度, 美化模式, 是否全文) -> 渲染后的 Segment 列表
+_render_cache = OrderedDict()
+
+
+def _content_hash(record):
+    if record.original is not None:
+        return record.original
+    if record.is_blob:
+        return record.digest
+    return hashlib.blake2b(record.text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _fold(content, full):
+    """超长消息只保留前若干行"""
+    if full:
+        return content, 0
+    lines = content.splitlines()
+    if len(lines) <= MAX_MESSAGE_LINES:
+        return content, 0
+    return "\n".join(lines[:MAX_MESSAGE_LINES]), len(lines) - MAX_MESSAGE_LINES
+
+
+class HistoryViewer:
+    """分页历史查看器"""
+
+    def __init__(self, store, console, use_pretty=True, page_turns=PAGE_TURNS):
+        self.store = store
+        self.console = console
+        self.use_pretty = use_pretty
+        self.page_turns = page_turns
+        self.full = False
+
+    @property
+    def turn_count(self):
+        """轮数（不含系统消息，包括已丢弃的轮次）"""
+        return math.ceil((len(self.store.records) - 1 + self.store.dropped) / 2)
+
+    @property
+    def first_turn(self):
+        """仍保存在历史中的第一轮"""
+        return self.store.dropped // 2 + 1
+
+    def _turn_of(self, index):
+        return math.ceil((index + self.store.dropped) / 2)
+
+    @property
+    def page_count(self):
+        return max(1, math.ceil(self.turn_count / self.page_turns))
+
+    def _turn_records(self, turn):
+        """第 turn 轮的 (下标, 记录) 列表"""
+        records = self.store.records
+        first = 2 * turn - 1 - self.store.dropped
+        if first < 1:
+            return []
+        return [(i, records[i]) for i in (first, first + 1) if i < len(records)]
+
+    def _render_record(self, index, record):
+        """渲染单条消息，命中缓存时不再解析 Markdown"""
+        width = self.console.width
+        turn = self._turn_of(index)
+        # 渲染结果包含轮次标题，相同内容在不同轮次需要分别缓存
+        key = (
+            _content_hash(record),
+            record.role,
+            turn,
+            width,
+            self.use_pretty,
+            self.full,
+        )
+        segments = _render_cache.get(key)
+        if segments is not None:
+            _render_cache.move_to_end(key)
+            return segments
+
+        content, folded = _fold(self.store.display_content(record), self.full)
+        if record.role == "user":
+            renderable = Panel.fit(
+                Text.from_ansi(content, style="bold cyan"),
+                title=f"[bold blue]😎 第{turn}轮 - 用户问题[/bold blue]",
+                border_style="blue",
+            )
+            header = None
+        else:
+            header = Text(f"🤖 第{turn}轮回复:", style="bold green")
+            renderable = Markdown(content) if self.use_pretty else Text(content)
+
+        segments = []
+        for item in (header, renderable):
+            if item is None:
+                continue
+            for line in self.console.render_lines(item, pad=False):
+                segments.extend(line)
+                segments.append(Segment.line())
+        if folded:
+            note = Text(
+                f"… 已折叠 {folded} 行（在查看器中输入 f 显示全文）", style="dim"
+            )
+            for line in self.console.render_lines(note, pad=False):
+                segments.extend(line)
+                segments.append(Segment.line())
+
+        _render_cache[key] = segments
+        if len(_render_cache) > RENDER_CACHE_SIZE:
+            _render_cache.popitem(last=False)
+        return segments
+
+    def show_turns(self, first, last):
+        """显示第 first 到 last 轮"""
+        for turn in range(first, last + 1):
+            for index, record in self._turn_records(turn):
+                self.console.print(Segments(self._render_record(index, record)))
+            self.console.print()
+
+    def show_page(self, page):
+        """显示第 page 页（从1开始）"""
+        page = min(max(self.page_of_turn(self.first_turn), page), self.page_count)
+        first = max(self.first_turn, (page - 1) * self.page_turns + 1)
+        last = min(self.turn_count, page * self.page_turns)
+        self.console.print(
+            f"\n[bold yellow]📜 对话历史 第{first}-{last}轮 / 共{self.turn_count}轮"
+            f"（第{page}/{self.page_count}页）[/bold yellow]"
+        )
+        if self.store.dropped:
+            self.console.print(
+                f"[dim]前 {self.first_turn - 1} 轮已超出历史保存上限，已丢弃[/dim]"
+            )
+        self.show_turns(first, last)
+        return page
+
+    def page_of_turn(self, turn):
+        return math.ceil(turn / self.page_turns)
+
+    def search(self, query):
+        """在会话中搜索，返回 [(轮次, 角色, 片段), ...]"""
+        needle = query.lower()
+        hits = []
+        for index, record in enumerate(self.store.records[1:], 1):
+            content = self.store.display_content(record)
+            position = content.lower().find(needle)
+            if position < 0:
+                continue
+            start = max(0, position - 30)
+            snippet = content[start : position + len(query) + 30].replace("\n", " ")
+            hits.append((self._turn_of(index), record.role, snippet))
+            if len(hits) >= MAX_SEARCH_HITS:
+                break
+        return hits
+
+    def show_search(self, query):
+        """显示搜索结果，返回第一个匹配的轮次"""
+        hits = self.search(query)
+        if not hits:
+            self.console.print(f"[yellow]🔍 未找到: {query}[/yellow]")
+            return None
+        self.console.print(f"[bold yellow]🔍 搜索 '{query}'：[/bold yellow]")
+        for turn, role, snippet in hits:
+            who = "😎" if role == "user" else "🤖"
+            text = Text(f"  第{turn}轮 {who} …{snippet}…")
+            text.highlight_words([query], style="bold reverse", case_sensitive=False)
+            self.console.print(text)
+        return hits[0][0]
+
+    def _interactive(self):
+        return self.console.is_terminal and sys.stdin.isatty()
+
+    def show(self, command=None):
+        """
+        打开历史查看器
+
+        command: None 显示最后一页（交互终端中进入翻页模式）;
+                 数字 跳转到该轮; '/文本' 搜索
+        """
+        if self.turn_count == 0:
+            self.console.print("\n[yellow]📜 对话历史为空[/yellow]")
+            return
+
+        page = self.page_count
+        if command:
+            command = command.strip()
+            if command.startswith("/"):
+                turn = self.show_search(command[1:])
+                if turn is None or not self._interactive():
+                    return
+                page = self.page_of_turn(turn)
+            elif command.isdigit():
+                turn = min(max(self.first_turn, int(command)), self.turn_count)
+                if not self._interactive():
+                    self.show_turns(turn, turn)
+                    return
+                page = self.page_of_turn(turn)
+
+        page = self.show_page(page)
+        if self._interactive():
+            self._pager(page)
+
+    def _pager(self, page):
+        while True:
+            self.console.print(
+                "[dim]n 下一页 · p 上一页 · <数字> 跳转到轮次 · /文本 搜索 · "
+                "f 切换全文 · q 退出[/dim] ",
+                end="",
+            )
+            try:
+                command = input().strip()
+            except (EOFError, KeyboardInterrupt):
+                return
+            if command in ("q", ".exit", ""):
+                return
+            if command == "n":
+                page = self.show_page(page + 1)
+            elif command == "p":
+                page = self.show_page(page - 1)
+            elif command == "f":
+                self.full = not self.full
+                page = self.show_page(page)
+            elif command.isdigit():
+                page = self.show_page(self.page_of_turn(int(command)))
+            elif command.startswith("/"):
+                turn = self.show_search(command[1:])
+                if turn is not None:
+                    page = self.show_page(self.page_of_turn(turn))
@@ -1,41 +1,357 @@
 # chat/input_handler.py
+"""
+连续对话的用户输入
+
+- 终端中整个输入过程都关闭规范模式和回显（cbreak），由 InputReader 自行处理
+  行编辑（退格、Ctrl+U、Ctrl+D），输入不受终端 4095 字节的行长度限制
+- 启用 bracketed paste，粘贴内容整块读取且不回显，
+  粘贴块中的 '.'、'.exit' 等行不会被当作命令
+- 读取期间输入写入 SpooledTemporaryFile，超大粘贴不会在读取过程中占用内存；
+  发送前仍需把完整消息转成字符串（请求体需要），之后超过 64 KB 的消息
+  由 HistoryStore 转存到磁盘
+- '.edit' 使用 $VISUAL / $EDITOR 编辑较长的提示词
+- '.search 关键词' 搜索以往所有对话的全文索引
+- 非终端输入（管道）按行批量读取
+"""
+import os
+import re
+import shlex
+import subprocess
+import sys
+import tempfile
+import unicodedata
+
+try:
+    import termios
+except ImportError:  # Windows
+    termios = None
+
+PASTE_START = b"\x1b[200~"
+PASTE_END = b"\x1b[201~"
+ENABLE_BRACKETED_PASTE = "\x1b[?2004h"
+DISABLE_BRACKETED_PASTE = "\x1b[?2004l"
+# 行编辑时忽略的转义序列（方向键等）
+ESCAPE_RE = re.compile(rb"\x1b(?:\[[0-?]*[ -/]*[@-~]|O.|[^\[O])", re.S)
+
+READ_SIZE = 64 * 1024
+# 输入超过该字节数时转存到临时文件
+SPOOL_LIMIT = 1024 * 1024
+
+CTRL_D = 0x04
+CTRL_U = 0x15
+BACKSPACE = (0x7F, 0x08)
+NEWLINE = (0x0A, 0x0D)
+
+
+class InputBuffer:
+    """
+    累积一条消息的输入，超过 SPOOL_LIMIT 后写入临时文件
+
+    text() 会把完整内容读回内存（发送给模型需要字符串）
+    """
+
+    def __init__(self, spool_limit=SPOOL_LIMIT):
+        self.spool_limit = spool_limit
+        self.file = tempfile.SpooledTemporaryFile(max_size=spool_limit, mode="w+b")
+        self.size = 0
+        self.lines = 0
+        self.ends_with_newline = True
+
+    def write(self, data):
+        if data:
+            self.file.write(data)
+            self.size += len(data)
+            self.lines += data.count(b"\n")
+            self.ends_with_newline = data.endswith(b"\n")
+
+    @property
+    def spooled(self):
+        """是否已转存到磁盘"""
+        return self.size > self.spool_limit
+
+    def text(self):
+        self.file.seek(0)
+        return self.file.read().decode("utf-8", errors="replace").rstrip("\n")
+
+    def close(self):
+        self.file.close()
+
+
+def _char_width(char):
+    return 2 if unicodedata.east_asian_width(char) in ("W", "F") else 1
+
+
+class InputReader:
+    """
+    从 sys.stdin.buffer 读取输入
+
+    终端中在进入时切换到 cbreak 模式（关闭规范模式和回显，保留 Ctrl+C 信号），
+    退出时恢复；粘贴在任何字节到达之前就已按非规范模式接收
+    """
+
+    def __init__(self, stream=None, output=None):
+        self.stream = stream or sys.stdin.buffer
+        self.output = output or sys.stdout
+        try:
+            self.fd = self.stream.fileno()
+            # 粘贴模式的开关序列和回显需要写到终端上
+            self.tty = (
+                termios is not None and os.isatty(self.fd) and self.output.isatty()
+            )
+        except (AttributeError, OSError, ValueError):
+            self.fd = None
+            self.tty = False
+        self._pending = b""
+        self._saved_attrs = None
+
+    def __enter__(self):
+        if self.tty:
+            self._saved_attrs = termios.tcgetattr(self.fd)
+            attrs = list(self._saved_attrs)
+            attrs[3] = attrs[3] & ~(termios.ICANON | termios.ECHO)
+            attrs[6] = list(attrs[6])
+            attrs[6][termios.VMIN] = 1
+            attrs[6][termios.VTIME] = 0
+            termios.tcsetattr(self.fd, termios.TCSANOW, attrs)
+            self._echo(ENABLE_BRACKETED_PASTE.encode())
+        return self
+
+    def __exit__(self, *exc):
+        if self.tty:
+            self._echo(DISABLE_BRACKETED_PASTE.encode())
+            termios.tcsetattr(self.fd, termios.TCSANOW, self._saved_attrs)
+
+    def _echo(self, data):
+        if data:
+            self.output.flush()
+            os.write(self.output.fileno(), data)
+
+    def _fill(self):
+        """读取更多输入到 _pending，EOF 时返回 False"""
+        more = os.read(self.fd, READ_SIZE)
+        self._pending += more
+        return bool(more)
+
+    def read(self):
+        """非终端输入：读取一行，EOF 时返回 b''"""
+        return self.stream.readline()
+
+    def read_line(self):
+        """
+        终端输入：读取一行并自行处理回显和行编辑
+
+        返回 (类型, 数据)：("line", 行内容含换行符)、
+        ("paste", 粘贴开始前已输入的内容) 或 ("eof", 已输入的内容)
+        """
+        line = bytearray()
+        while True:
+            if not self._pending and not self._fill():
+                return "eof", bytes(line)
+            data = self._pending
+            echo = bytearray()
+            i = 0
+            while i < len(data):
+                byte = data[i]
+                if byte == 0x1B:
+                    if data.startswith(PASTE_START, i):
+                        self._echo(bytes(echo))
+                        self._pending = data[i + len(PASTE_START) :]
+                        return "paste", bytes(line)
+                    match = ESCAPE_RE.match(data, i)
+                    if match is None:
+                        # 转义序列被拆分到下一次读取
+                        break
+                    i = match.end()
+                    continue
+                if byte in NEWLINE:
+                    echo += b"\n"
+                    self._echo(bytes(echo))
+                    self._pending = data[i + 1 :]
+                    return "line", bytes(line) + b"\n"
+                if byte in BACKSPACE:
+                    echo += self._erase(line, 1)
+                elif byte == CTRL_U:
+                    echo += self._erase(line, len(line))
+                elif byte == CTRL_D:
+                    if not line:
+                        self._echo(bytes(echo))
+                        self._pending = data[i + 1 :]
+                        return "eof", b""
+                elif byte >= 0x20 or byte == 0x09:
+                    line.append(byte)
+                    echo.append(byte)
+                i += 1
+            self._echo(bytes(echo))
+            self._pending = data[i:]
+            if i == 0 and not self._fill():
+                return "eof", bytes(line)
+
+    @staticmethod
+    def _erase(line, count):
+        """删除行尾 count 个字符，返回对应的终端回显"""
+        echo = b""
+        for _ in range(count):
+            if not line:
+                break
+            # 回退到 UTF-8 字符的起始字节
+            start = len(line) - 1
+            while start > 0 and line[start] & 0xC0 == 0x80:
+                start -= 1
+            char = bytes(line[start:]).decode("utf-8", errors="replace")
+            del line[start:]
+            width = sum(_char_width(c) for c in char)
+            echo += b"\b" * width + b" " * width + b"\b" * width
+        return echo
+
+    def read_paste(self, sink):
+        """读取粘贴块直到结束标记，写入 sink（不回显），返回粘贴的字节数"""
+        keep = len(PASTE_END) - 1
+        total = 0
+        buf, self._pending = self._pending, b""
+        while True:
+            end = buf.find(PASTE_END)
+            if end >= 0:
+                sink.write(buf[:end])
+                self._pending = buf[end + len(PASTE_END) :]
+                return total + end
+            # 结束标记可能跨越两次读取，保留末尾几个字节
+            cut = max(0, len(buf) - keep)
+            sink.write(buf[:cut])
+            total += cut
+            buf = buf[cut:]
+            more = os.read(self.fd, READ_SIZE)
+            if not more:
+                sink.write(buf)
+                return total + len(buf)
+            buf += more
+
+
+def edit_in_editor(initial=""):
+    """用 $VISUAL / $EDITOR 编辑提示词，返回编辑后的内容"""
+    editor = (
+        os.environ.get("VISUAL")
+        or os.environ.get("EDITOR")
+        or ("notepad" if os.name == "nt" else "vi")
+    )
+    fd, path = tempfile.mkstemp(prefix="ag-prompt-", suffix=".md")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(initial)
+        subprocess.call([*shlex.split(editor, posix=os.name != "nt"), path])
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return f.read()
+    finally:
+        os.unlink(path)
+
+
+def _paste_note(size, lines, spooled):
+    note = f"📋 已粘贴 {lines:,} 行（{size / 1024:.1f} KB）"
+    if spooled:
+        note += "，内容较大，已暂存到临时文件"
+    return f"[dim]{note}[/dim]"
+
+
+# 只在粘贴块之外识别的命令
+COMMANDS = (".exit", ".clear", ".history", ".search", ".edit", ".")
+
+
+def _is_command(command):
+    return command in COMMANDS or command.startswith((".history ", ".search "))
+
+
+def read_message(reader, buffer, console):
+    """
+    读取一条消息写入 buffer，遇到命令行或 EOF 时返回
+
+    返回命令字符串（'.' 表示输入结束），EOF 时返回 None
+    """
+    while True:
+        if reader.tty:
+            kind, data = reader.read_line()
+            if kind == "eof":
+                buffer.write(data)
+                return None
+            if kind == "paste":
+                # 粘贴前已输入的内容与粘贴块作为完整的行
+                buffer.write(data)
+                before = buffer.size
+                lines = buffer.lines
+                reader.read_paste(buffer)
+                if not buffer.ends_with_newline:
+                    buffer.write(b"\n")
+                console.print(
+                    _paste_note(
+                        buffer.size - before, buffer.lines - lines, buffer.spooled
+                    ),
+                    highlight=False,
+                )
+                continue
+        else:
+            data = reader.read()
+            if not data:
+                return None
+
+        command = data.decode("utf-8", errors="replace").strip()
+        if _is_command(command):
+            return command
+        buffer.write(data if data.endswith(b"\n") else data + b"\n")
+
+
 def get_user_input(console, history_manager, use_pretty=True):
-    """获取用户输入，处理特殊命令"""
+    """获取用户输入，处理特殊命令（粘贴块中的内容不会被当作命令）"""
     console.print(
-        "\n[dim ][blue ]Tips[/blue ]: '.' in a line to end multi-line input.[/dim ]"
+        "\n[dim ][blue ]Tips[/blue ]: '.' in a line to end multi-line input, "
+        "'.edit' to open $EDITOR.[/dim ]"
     )
     console.print("[bold cyan]😎:[/bold cyan] ", end="")
 
-    lines = []
+    buffer = InputBuffer()
+    try:
+        with InputReader() as reader:
+            command = read_message(reader, buffer, console)
+        user_input = buffer.text()
+    finally:
+        buffer.close()
 
-    while True:
-        try:
-            line = input()
-            command = line.strip()
-
-            # 处理特殊命令
-            if command == ".exit":
-                console.print("\n[yellow]🛑 结束对话。[/yellow]\n")
-                return None, True
-
-            elif command == ".clear":
-                history_manager.reset_history()
-                console.print("\n[green]✅ 对话历史已清空。[/green]\n")
-                return None, False
-
-            elif command == ".history":
-                history_manager.display_history(console, use_pretty)
-                if use_pretty:
-                    console.print("\n")
-                return None, False
-
-            elif command == ".":
-                break
+    # 处理特殊命令
+    if command is None:
+        # EOF：没有任何输入时结束对话
+        if not user_input:
+            return None, True
+
+    elif command == ".exit":
+        console.print("\n[yellow]🛑 结束对话。[/yellow]\n")
+        return None, True
+
+    elif command == ".clear":
+        history_manager.reset_history()
+        console.print("\n[green]✅ 对话历史已清空。[/green]\n")
+        return None, False
+
+    elif command.startswith(".history"):
+        # .history [轮次 | /搜索词]
+        argument = command[len(".history") :].strip() or None
+        history_manager.display_history(console, use_pretty, argument)
+        if use_pretty:
+            console.print("\n")
+        return None, False
+
+    elif command.startswith(".search"):
+        # .search 关键词：搜索以往所有对话
+        query = command[len(".search") :].strip()
+        if query:
+            from ag_cli.search import show_search
 
-            lines.append(line)
+            show_search(console, query, use_pretty=use_pretty)
+        else:
+            console.print("[yellow]⚠️ 用法: .search 关键词[/yellow]")
+        return None, False
 
-        except EOFError:
-            break
+    elif command == ".edit":
+        # 在编辑器中继续编辑已输入的内容，保存后直接发送
+        user_input = edit_in_editor(user_input).rstrip("\n")
+        if not user_input.strip():
+            console.print("[yellow]⚠️ 内容为空，已取消[/yellow]")
+            return None, False
 
-    user_input = "\n".join(lines)
     return user_input, False
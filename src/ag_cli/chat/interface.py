@@ -2,18 +2,43 @@
 from rich.panel import Panel
 from rich.markdown import Markdown
 from rich.live import Live
+from rich.console import Group
 import re
+import sys
 import time
+from ag_cli.analytics import STATUS_ERROR, STATUS_OK, get_archive
+from ag_cli.api_client import split_delta
+from ag_cli.chat.reasoning import StreamStats, reasoning_renderable
+from ag_cli.search import get_index
+from ag_cli.utils.tracing import span, instant
+
+
+def _context_chars(messages):
+    """上下文字符数；历史视图直接累加记录中的字符数，不重新读取 blob"""
+    char_count = getattr(messages, "char_count", None)
+    if char_count is not None:
+        return char_count()
+    return sum(len(message["content"]) for message in messages)
 
 
 class ChatInterface:
     """聊天界面管理类"""
 
-    def __init__(self, client, console, use_pretty=True):
+    system_prompt = "(如果未指定语言，回复答案时请使用中文语言)"
+
+    def __init__(self, client, console, use_pretty=True, reasoning_mode="show"):
         self.client = client
         self.console = console
         self.use_pretty = use_pretty
-        self.system_prompt = "(如果未指定语言，回复答案时请使用中文语言)"
+        # 推理内容显示模式: show / summary / hide
+        self.reasoning_mode = reasoning_mode
+        # 最近一次流式响应的统计信息
+        self.last_stats = None
+        self._request_start = None
+        # 对话统计归档（关闭时为 None）
+        self.archive = get_archive()
+        # 历史对话全文索引（关闭时为 None）
+        self.index = get_index()
 
     def display_question(self, question):
         """显示问题"""
@@ -30,7 +55,10 @@ class ChatInterface:
             self.console.print(f"问题: {question}")
 
     def display_streaming_response(self, response_stream):
-        """动态显示流式AI回复"""
+        """动态显示流式AI回复，返回回答正文（不含推理内容）"""
+        self.last_stats = StreamStats(self._request_start)
+        self._request_start = None
+
         if not self.use_pretty:
             # 纯文本模式 - 直接输出
             return self._display_plain_text_response(response_stream)
@@ -38,56 +66,110 @@ class ChatInterface:
         # 美化模式 - 使用Markdown实时渲染
         self.console.print("\n[bold green]🤖:[/bold green]")
 
+        stats = self.last_stats
         full_response = ""
+        reasoning = ""
         last_update_time = time.time()
         update_interval = 0.3
         chunk_buffer = ""
 
-        with Live(refresh_per_second=5, auto_refresh=False) as live:
+        first_chunk = True
+
+        with span("stream"), Live(
+            console=self.console, refresh_per_second=5, auto_refresh=False
+        ) as live:
             try:
                 for chunk in response_stream:
-                    if chunk.choices and chunk.choices[0].delta.content:
-                        content = chunk.choices[0].delta.content
+                    if first_chunk:
+                        instant("first_byte")
+                        first_chunk = False
+                    stats.on_usage(getattr(chunk, "usage", None))
+                    reasoning_delta, content = split_delta(chunk)
+                    if reasoning_delta:
+                        if not reasoning:
+                            instant("first_reasoning_token")
+                        stats.on_reasoning(reasoning_delta)
+                        reasoning += reasoning_delta
+                        chunk_buffer += reasoning_delta
+                    if content:
+                        if not full_response:
+                            instant("first_answer_token")
+                        stats.on_answer(content)
                         full_response += content
                         chunk_buffer += content
 
+                    if chunk_buffer:
                         current_time = time.time()
                         if (
                             current_time - last_update_time >= update_interval
                             or len(chunk_buffer) >= 100
                         ):
-                            processed_response = self._preprocess_response(
-                                full_response
-                            )
-                            markdown = Markdown(processed_response)
-                            live.update(markdown, refresh=True)
+                            with span("render.tick", chars=len(full_response)):
+                                live.update(
+                                    self._render_stream(reasoning, full_response),
+                                    refresh=True,
+                                )
                             last_update_time = current_time
                             chunk_buffer = ""
 
-                processed_response = self._preprocess_response(full_response)
-                markdown = Markdown(processed_response)
-                live.update(markdown, refresh=True)
+                stats.finish()
+                with span("render.final", chars=len(full_response)):
+                    live.update(
+                        self._render_stream(reasoning, full_response), refresh=True
+                    )
 
             except Exception as e:
+                stats.finish()
+                stats.error = e
                 self.console.print(f"[yellow]⚠️ 流式响应中断: {str(e)}[/yellow]")
-                if full_response:
-                    processed_response = self._preprocess_response(full_response)
-                    markdown = Markdown(processed_response)
-                    live.update(markdown, refresh=True)
+                if full_response or reasoning:
+                    live.update(
+                        self._render_stream(reasoning, full_response), refresh=True
+                    )
+
+        if reasoning and self.reasoning_mode != "hide":
+            self.console.print(f"[dim]📊 {stats.summary()}[/dim]")
 
         return full_response
 
+    def _render_stream(self, reasoning, full_response):
+        """生成推理面板 + Markdown 回答的组合渲染对象"""
+        markdown = Markdown(self._preprocess_response(full_response))
+        panel = reasoning_renderable(
+            self.reasoning_mode, reasoning, self.last_stats, bool(full_response)
+        )
+        if panel is None:
+            return markdown
+        return Group(panel, markdown)
+
     def _display_plain_text_response(self, response_stream):
-        """纯文本模式显示响应"""
+        """纯文本模式显示响应，推理内容输出到标准错误，不影响重定向"""
+        stats = self.last_stats
         full_response = ""
+        first_chunk = True
         for chunk in response_stream:
-            if chunk.choices and chunk.choices[0].delta.content:
-                content = chunk.choices[0].delta.content
+            if first_chunk:
+                instant("first_byte")
+                first_chunk = False
+            stats.on_usage(getattr(chunk, "usage", None))
+            reasoning_delta, content = split_delta(chunk)
+            if reasoning_delta:
+                stats.on_reasoning(reasoning_delta)
+                if self.reasoning_mode == "show":
+                    print(reasoning_delta, end="", file=sys.stderr, flush=True)
+            if content:
+                if stats.first_answer is None and stats.first_reasoning is not None:
+                    if self.reasoning_mode == "show":
+                        print(file=sys.stderr)
+                stats.on_answer(content)
                 full_response += content
                 # 实时输出到控制台
                 print(content, end="", flush=True)
 
+        stats.finish()
         print()  # 换行
+        if stats.first_reasoning is not None and self.reasoning_mode != "hide":
+            print(f"[{stats.summary()}]", file=sys.stderr)
         return full_response
 
     def display_response(self, response):
@@ -112,13 +194,114 @@ class ChatInterface:
         response = re.sub(r"```\n", r"\n```\n", response)
         return response
 
-    def call_api_single(self, question, model=None):
-        """单次API调用"""
+    def record_turn(
+        self,
+        mode,
+        model,
+        messages,
+        response=None,
+        attempts=1,
+        error=False,
+        prompt=None,
+    ):
+        """
+        把本轮的用量与耗时写入统计归档，成功的回答同时写入搜索索引
+
+        prompt 为用户原始问题（默认取最后一条消息，注入了历史片段时需单独传入）；
+        流式响应中途中断时记为错误，保留已有的耗时，不写入搜索索引
+        """
+        if prompt is None:
+            prompt = messages[-1]["content"] if messages else ""
+        stats = self.last_stats if not error else None
+        if stats is not None and stats.error is not None:
+            error = True
+        config = getattr(self.client, "config", {})
+        model_name = (
+            self.client.resolve_model_name(model)
+            if model
+            else config.get("default_model")
+        )
+        if self.index is not None and response and not error:
+            try:
+                self.index.add(
+                    prompt.removesuffix(self.system_prompt), response, model_name, mode
+                )
+            except Exception:
+                # 索引写入失败不影响对话
+                pass
+        if self.archive is None:
+            return
+        first_token = None
+        if stats is not None:
+            first = [t for t in (stats.ttfr, stats.ttfa) if t is not None]
+            first_token = min(first) if first else None
+        self.archive.record(
+            prompt=prompt,
+            response=response,
+            model=model_name,
+            mode=mode,
+            prompt_chars=len(prompt),
+            context_chars=_context_chars(messages),
+            response_chars=len(response or ""),
+            prompt_tokens=stats and stats.prompt_tokens,
+            completion_tokens=stats and stats.completion_tokens,
+            reasoning_tokens=stats and stats.reasoning_tokens,
+            cached_tokens=stats and stats.cached_tokens,
+            ttft=first_token,
+            total=(
+                stats.end - stats.start if stats is not None and stats.end else None
+            ),
+            retries=max(0, attempts - 1),
+            status=STATUS_ERROR if error else STATUS_OK,
+        )
+
+    def _call_api(self, mode, get_stream, messages, model, prompt=None):
+        """发送请求并显示结果，同时记录统计"""
+        self._request_start = time.perf_counter()
+        attempts = getattr(self.client, "attempts", 0)
+        try:
+            response_stream = get_stream()
+        except Exception:
+            attempts = getattr(self.client, "attempts", 0) - attempts
+            self.record_turn(
+                mode, model, messages, None, attempts, error=True, prompt=prompt
+            )
+            raise
+        try:
+            response = self.display_streaming_response(response_stream)
+        except Exception as e:
+            # 纯文本模式下流式响应中断的异常直接抛出，这里记为错误
+            self.last_stats.error = e
+            self.record_turn(
+                mode,
+                model,
+                messages,
+                None,
+                getattr(self.client, "attempts", 0) - attempts,
+                prompt=prompt,
+            )
+            raise
+        attempts = getattr(self.client, "attempts", 0) - attempts
+        self.record_turn(mode, model, messages, response, attempts, prompt=prompt)
+        return response
+
+    def call_api_single(self, question, model=None, prompt=None):
+        """单次API调用，prompt 为记录用的原始问题"""
         question_with_lang = question + self.system_prompt
-        response_stream = self.client.get_chat_stream(question_with_lang, model)
-        return self.display_streaming_response(response_stream)
+        return self._call_api(
+            "single",
+            lambda: self.client.get_chat_stream(question_with_lang, model),
+            [{"role": "user", "content": question_with_lang}],
+            model,
+            prompt,
+        )
 
-    def call_api_continuous(self, messages, model=None):
-        """连续对话API调用"""
-        response_stream = self.client.get_chat_completion_stream(messages, model)
-        return self.display_streaming_response(response_stream)
+    def call_api_continuous(self, messages, model=None, prompt=None):
+        """连续对话API调用，prompt 为记录用的原始问题"""
+        return self._call_api(
+            "continuous",
+            lambda: self.client.get_chat_completion_stream(messages, model),
+            messages,
+            model,
+            prompt,
+        )
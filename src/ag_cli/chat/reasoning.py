@@ -0,0 +1,147 @@
+# chat/reasoning.py
+"""
+推理模型（如 deepseek-r1）的 reasoning_content 处理
+
+- StreamStats 统计首个推理 token / 首个回答 token 的时间和推理 token 数
+- reasoning_renderable 根据显示模式生成推理面板
+"""
+import time
+from rich.panel import Panel
+from rich.text import Text
+
+# 推理内容显示模式
+REASONING_MODES = ("show", "summary", "hide")
+
+# 推理阶段实时显示的最多行数
+REASONING_TAIL_LINES = 12
+# 开始输出回答后推理面板折叠为的行数
+REASONING_COLLAPSED_LINES = 3
+
+
+class StreamStats:
+    """单次流式响应的计时与用量统计"""
+
+    __slots__ = (
+        "start",
+        "first_reasoning",
+        "first_answer",
+        "end",
+        "reasoning_chars",
+        "answer_chars",
+        "reasoning_tokens",
+        "completion_tokens",
+        "prompt_tokens",
+        "cached_tokens",
+        "error",
+    )
+
+    def __init__(self, start=None):
+        self.start = start if start is not None else time.perf_counter()
+        self.first_reasoning = None
+        self.first_answer = None
+        self.end = None
+        self.reasoning_chars = 0
+        self.answer_chars = 0
+        self.reasoning_tokens = None
+        self.completion_tokens = None
+        self.prompt_tokens = None
+        self.cached_tokens = None
+        # 流式响应中途中断时的异常
+        self.error = None
+
+    def on_reasoning(self, text):
+        if self.first_reasoning is None:
+            self.first_reasoning = time.perf_counter()
+        self.reasoning_chars += len(text)
+
+    def on_answer(self, text):
+        if self.first_answer is None:
+            self.first_answer = time.perf_counter()
+        self.answer_chars += len(text)
+
+    def on_usage(self, usage):
+        """读取流末尾的 usage 信息（需要 include_usage）"""
+        if usage is None:
+            return
+        self.prompt_tokens = getattr(usage, "prompt_tokens", None)
+        self.completion_tokens = getattr(usage, "completion_tokens", None)
+        details = getattr(usage, "completion_tokens_details", None)
+        if details is not None:
+            self.reasoning_tokens = getattr(details, "reasoning_tokens", None)
+        prompt_details = getattr(usage, "prompt_tokens_details", None)
+        if prompt_details is not None:
+            self.cached_tokens = getattr(prompt_details, "cached_tokens", None)
+
+    def finish(self):
+        self.end = time.perf_counter()
+
+    @property
+    def ttfr(self):
+        """首个推理 token 时间（秒）"""
+        if self.first_reasoning is None:
+            return None
+        return self.first_reasoning - self.start
+
+    @property
+    def ttfa(self):
+        """首个回答 token 时间（秒）"""
+        if self.first_answer is None:
+            return None
+        return self.first_answer - self.start
+
+    @property
+    def reasoning_seconds(self):
+        """推理阶段耗时（秒）"""
+        if self.first_reasoning is None:
+            return None
+        end = self.first_answer or self.end or time.perf_counter()
+        return end - self.first_reasoning
+
+    def summary(self):
+        """一行统计摘要"""
+        parts = []
+        if self.first_reasoning is not None:
+            if self.reasoning_tokens is not None:
+                parts.append(f"推理 {self.reasoning_tokens} tokens")
+            else:
+                parts.append(f"推理 {self.reasoning_chars} 字")
+            parts.append(f"首个推理token {self.ttfr:.2f}s")
+        if self.ttfa is not None:
+            parts.append(f"首个回答token {self.ttfa:.2f}s")
+        if self.completion_tokens is not None:
+            parts.append(f"输出 {self.completion_tokens} tokens")
+        return " · ".join(parts)
+
+
+def _tail(text, lines):
+    """取文本最后若干行，返回 (内容, 是否被截断)"""
+    all_lines = text.rstrip().splitlines()
+    if len(all_lines) <= lines:
+        return "\n".join(all_lines), False
+    return "\n".join(all_lines[-lines:]), True
+
+
+def reasoning_renderable(mode, reasoning, stats, answering):
+    """根据模式生成推理内容的可渲染对象，无需显示时返回 None"""
+    if mode == "hide" or not reasoning:
+        return None
+
+    if mode == "summary":
+        if answering:
+            return Text(
+                f"💭 已思考 {stats.reasoning_seconds:.1f}s（{len(reasoning)} 字）",
+                style="dim",
+            )
+        return Text(f"💭 思考中… {len(reasoning)} 字", style="dim italic")
+
+    lines = REASONING_COLLAPSED_LINES if answering else REASONING_TAIL_LINES
+    body, truncated = _tail(reasoning, lines)
+    title = "💭 思考过程"
+    if truncated:
+        title += f"（仅显示最后 {lines} 行）"
+    return Panel(
+        Text(body, style="dim"),
+        title=f"[dim]{title}[/dim]",
+        border_style="dim",
+        title_align="left",
+    )
@@ -0,0 +1,317 @@
+# chat/sampling.py
+"""
+Best-of-N 并行采样
+
+对同一组消息并发生成 N 个候选（并行请求，或接口支持时一次请求带 n 参数），
+用本地评分器选出一个结果；已完成的候选足以确定结果时（某个候选通过评分，
+或投票已过半数）可提前取消其余候选：立即中止其余候选的响应流，
+仍在建立连接的请求最多再等待 CANCEL_GRACE 秒。
+接口忽略 n 参数时，未返回的候选标记为失败
+"""
+import difflib
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from rich.live import Live
+from rich.markdown import Markdown
+from rich.panel import Panel
+from rich.syntax import Syntax
+from rich.table import Table
+
+from ag_cli.api_client import abort_stream, split_delta
+from ag_cli.utils.tracing import span
+
+SAMPLE_MODES = ("parallel", "n")
+# 取消后等待仍在建立连接的请求的最长时间（秒），超时则不再等待其线程
+CANCEL_GRACE = 1.0
+
+
+class Sample:
+    """单个候选的内容与计时"""
+
+    __slots__ = (
+        "index",
+        "text",
+        "status",
+        "start",
+        "first_token",
+        "finished_at",
+        "score",
+        "error",
+    )
+
+    def __init__(self, index):
+        self.index = index
+        self.text = ""
+        self.status = "等待"
+        self.start = None
+        self.first_token = None
+        self.finished_at = None
+        self.score = 0.0
+        self.error = None
+
+    def on_content(self, content):
+        if self.first_token is None:
+            self.first_token = time.perf_counter()
+        self.text += content
+
+    @property
+    def ttft(self):
+        if self.first_token is None or self.start is None:
+            return None
+        return self.first_token - self.start
+
+    @property
+    def latency(self):
+        if self.finished_at is None or self.start is None:
+            return None
+        return self.finished_at - self.start
+
+
+def _close(stream):
+    close = getattr(stream, "close", None)
+    if close:
+        close()
+
+
+class BestOfN:
+    """Best-of-N 采样器"""
+
+    def __init__(self, client, scorer, n, model=None, mode="parallel", early_exit=False):
+        self.client = client
+        self.scorer = scorer
+        self.n = n
+        self.model = model
+        self.mode = mode
+        self.early_exit = early_exit
+        self.samples = [Sample(i) for i in range(n)]
+        self._cancel = threading.Event()
+        # 并行模式下各候选的响应流，取消时从主线程中止
+        self._streams = {}
+
+    def _finish(self, sample):
+        sample.finished_at = time.perf_counter()
+        sample.score = self.scorer.score(sample.text)
+        sample.status = "完成"
+        if self.early_exit and self._decided():
+            self._cancel.set()
+
+    def _decided(self):
+        completed = [sample for sample in self.samples if sample.status == "完成"]
+        decided = getattr(self.scorer, "decided", None)
+        if decided is None:
+            # 未继承 Scorer 的自定义评分器
+            return any(sample.score >= 1 for sample in completed)
+        return decided(completed, self.n)
+
+    def _run_one(self, sample, messages):
+        sample.start = time.perf_counter()
+        sample.status = "请求中"
+        try:
+            stream = self.client.get_sampling_stream(messages, self.model)
+            self._streams[sample.index] = stream
+            if self._cancel.is_set():
+                # 建立连接期间已被取消，主线程可能没有看到这个流
+                abort_stream(stream)
+            sample.status = "生成中"
+            try:
+                for chunk in stream:
+                    if self._cancel.is_set():
+                        break
+                    _, content = split_delta(chunk)
+                    if content:
+                        sample.on_content(content)
+            finally:
+                _close(stream)
+            if self._cancel.is_set():
+                sample.status = "已取消"
+                return
+            self._finish(sample)
+        except Exception as e:
+            if self._cancel.is_set():
+                # 中止响应流引起的读取错误
+                sample.status = "已取消"
+                return
+            sample.status = "失败"
+            sample.error = str(e)
+
+    def _run_parallel(self, messages, on_update):
+        pool = ThreadPoolExecutor(max_workers=self.n, thread_name_prefix="ag-sample")
+        try:
+            pending = {
+                pool.submit(self._run_one, sample, messages) for sample in self.samples
+            }
+            cancelled_at = None
+            while pending:
+                _, pending = wait(pending, timeout=0.2)
+                on_update()
+                if not self._cancel.is_set():
+                    continue
+                if cancelled_at is None:
+                    cancelled_at = time.monotonic()
+                    for stream in list(self._streams.values()):
+                        abort_stream(stream)
+                elif time.monotonic() - cancelled_at >= CANCEL_GRACE:
+                    # 仍在建立连接的请求无法中止，不再等待（线程结束后自行退出）
+                    break
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+        for sample in self.samples:
+            if sample.status in ("等待", "请求中"):
+                sample.status = "已取消"
+
+    def _run_single_request(self, messages, on_update):
+        """一次请求带 n 参数，按 choice.index 拆分候选"""
+        start = time.perf_counter()
+        for sample in self.samples:
+            sample.start = start
+            sample.status = "生成中"
+        stream = self.client.get_sampling_stream(messages, self.model, n=self.n)
+        last_update = 0.0
+        # 实际返回过的 choice.index
+        arrived = set()
+        try:
+            for chunk in stream:
+                for choice in chunk.choices:
+                    if choice.index >= self.n:
+                        continue
+                    arrived.add(choice.index)
+                    sample = self.samples[choice.index]
+                    if choice.delta.content:
+                        sample.on_content(choice.delta.content)
+                    if choice.finish_reason and sample.status == "生成中":
+                        self._finish(sample)
+                if self._cancel.is_set():
+                    break
+                now = time.perf_counter()
+                if now - last_update >= 0.2:
+                    on_update()
+                    last_update = now
+        finally:
+            _close(stream)
+        for sample in self.samples:
+            if sample.status != "生成中":
+                continue
+            if self._cancel.is_set():
+                sample.status = "已取消"
+            elif sample.index not in arrived:
+                sample.status = "失败"
+                sample.error = (
+                    f"接口忽略了 n 参数，只返回了 {len(arrived)} 个候选"
+                    "（可改用 --sample-mode parallel）"
+                )
+            else:
+                self._finish(sample)
+        on_update()
+
+    def run(self, messages, on_update=lambda: None):
+        """生成候选并返回被选中的 Sample，全部失败时抛出异常"""
+        with span("best_of_n", n=self.n, mode=self.mode):
+            if self.mode == "n":
+                self._run_single_request(messages, on_update)
+            else:
+                self._run_parallel(messages, on_update)
+
+        completed = [sample for sample in self.samples if sample.status == "完成"]
+        if not completed:
+            errors = {sample.error for sample in self.samples if sample.error}
+            raise Exception("所有候选均失败: " + "; ".join(errors or {"未知错误"}))
+        return completed[self.scorer.select(completed)]
+
+    def progress_table(self, selected=None):
+        """候选进度/延迟表"""
+        table = Table(show_header=True, header_style="bold magenta", box=None)
+        table.add_column("#", justify="right", style="cyan")
+        table.add_column("状态")
+        table.add_column("字数", justify="right")
+        table.add_column("首token", justify="right")
+        table.add_column("耗时", justify="right")
+        table.add_column(f"分数({self.scorer.name})", justify="right")
+        for sample in self.samples:
+            marker = " ⭐" if selected is sample else ""
+            status = sample.status if not sample.error else f"失败: {sample.error[:30]}"
+            table.add_row(
+                f"{sample.index + 1}{marker}",
+                status,
+                str(len(sample.text)),
+                f"{sample.ttft:.2f}s" if sample.ttft is not None else "-",
+                f"{sample.latency:.2f}s" if sample.latency is not None else "-",
+                f"{sample.score:.2f}" if sample.status == "完成" else "-",
+            )
+        return table
+
+
+def _diff(selected, other):
+    return "".join(
+        difflib.unified_diff(
+            (selected.text.rstrip("\n") + "\n").splitlines(keepends=True),
+            (other.text.rstrip("\n") + "\n").splitlines(keepends=True),
+            fromfile=f"候选{selected.index + 1}(选中)",
+            tofile=f"候选{other.index + 1}",
+        )
+    )
+
+
+def best_of_n_chat(
+    client,
+    console,
+    question,
+    scorer,
+    n,
+    model=None,
+    use_pretty=True,
+    mode="parallel",
+    early_exit=False,
+    show_diff=False,
+    system_prompt="",
+):
+    """Best-of-N 单次对话"""
+    sampler = BestOfN(client, scorer, n, model, mode, early_exit)
+    messages = [{"role": "user", "content": question + system_prompt}]
+
+    try:
+        if use_pretty:
+            with Live(
+                sampler.progress_table(), console=console, refresh_per_second=5
+            ) as live:
+                selected = sampler.run(
+                    messages, lambda: live.update(sampler.progress_table())
+                )
+                live.update(sampler.progress_table(selected))
+        else:
+            selected = sampler.run(messages)
+    except Exception as e:
+        console.print(f"[red]✖️ 错误: {str(e)}[/red]")
+        return None
+
+    if not use_pretty:
+        print(selected.text)
+        for sample in sampler.samples:
+            latency = f"{sample.latency:.2f}s" if sample.latency is not None else "-"
+            print(
+                f"[sample {sample.index + 1}] {sample.status} {latency} score={sample.score:.2f}",
+                file=sys.stderr,
+            )
+        return selected.text
+
+    console.print(
+        Panel(
+            Markdown(selected.text),
+            title=f"[bold green]🤖 候选{selected.index + 1}（{scorer.name} 评分选中）[/bold green]",
+            border_style="green",
+        )
+    )
+
+    if show_diff:
+        for sample in sampler.samples:
+            if sample is selected or sample.status != "完成":
+                continue
+            diff = _diff(selected, sample)
+            if diff:
+                console.print(Syntax(diff, "diff", word_wrap=True))
+            else:
+                console.print(f"[dim]候选{sample.index + 1} 与选中结果相同[/dim]")
+
+    return selected.text
@@ -0,0 +1,154 @@
+# chat/scorers.py
+"""
+Best-of-N 本地评分器
+
+每个评分器实现:
+- score(text) -> float: 单个候选的分数（0~1），>= 1 视为通过
+- select(samples) -> int: 从全部已完成候选中选出一个的下标
+- decided(samples, n) -> bool: 已完成的候选是否足以确定结果（--early-exit），
+  默认某个候选通过即可；supports_early_exit 为 False 的评分器不能与 --early-exit 一起使用
+
+可通过 --scorer 使用内置名称，或以 "模块:属性" 形式加载自定义评分器
+"""
+import importlib
+import json
+import re
+from collections import Counter
+
+CODE_BLOCK_RE = re.compile(r"```(\w*)\n(.*?)```", re.DOTALL)
+BOXED_RE = re.compile(r"\\boxed\{([^{}]*)\}")
+ANSWER_RE = re.compile(r"(?:最终答案|答案|answer)\s*[:：是为]\s*(.+)", re.IGNORECASE)
+
+SCORERS = {}
+
+
+def register_scorer(name):
+    """注册评分器类"""
+
+    def decorator(cls):
+        cls.name = name
+        SCORERS[name] = cls
+        return cls
+
+    return decorator
+
+
+def get_scorer(spec):
+    """按名称或 '模块:属性' 获取评分器实例"""
+    if spec in SCORERS:
+        return SCORERS[spec]()
+    if ":" in spec:
+        module_name, attr = spec.split(":", 1)
+        target = getattr(importlib.import_module(module_name), attr)
+        return target() if isinstance(target, type) else target
+    raise ValueError(f"未知评分器: {spec}（可选: {', '.join(SCORERS)}）")
+
+
+class Scorer:
+    """评分器基类：按分数选择，分数相同时选最先完成的"""
+
+    name = "base"
+    supports_early_exit = True
+
+    def score(self, text):
+        return 0.0
+
+    def decided(self, samples, n):
+        return any(sample.score >= 1 for sample in samples)
+
+    def select(self, samples):
+        best = max(
+            range(len(samples)),
+            key=lambda i: (samples[i].score, -samples[i].finished_at),
+        )
+        return best
+
+
+def code_blocks(text):
+    """提取 [(语言, 代码), ...]"""
+    return [(lang.lower(), body) for lang, body in CODE_BLOCK_RE.findall(text)]
+
+
+@register_scorer("code")
+class CodeCompilesScorer(Scorer):
+    """最长的 Python 代码块能否编译"""
+
+    def score(self, text):
+        blocks = [body for lang, body in code_blocks(text) if lang in ("", "python", "py")]
+        if not blocks:
+            return 0.0
+        try:
+            compile(max(blocks, key=len), "<sample>", "exec")
+        except SyntaxError:
+            return 0.0
+        return 1.0
+
+
+@register_scorer("json")
+class JsonScorer(Scorer):
+    """回答（或其中的 json 代码块）是否为合法 JSON"""
+
+    def score(self, text):
+        candidates = [body for lang, body in code_blocks(text) if lang in ("json", "")]
+        candidates.append(text)
+        for candidate in candidates:
+            try:
+                json.loads(candidate)
+                return 1.0
+            except ValueError:
+                continue
+        return 0.0
+
+
+def final_answer(text):
+    r"""提取最终答案：\boxed{} > "答案：" > 最后一个非空行"""
+    boxed = BOXED_RE.findall(text)
+    if boxed:
+        return boxed[-1].strip()
+    matches = ANSWER_RE.findall(text)
+    if matches:
+        return matches[-1].strip()
+    lines = [line.strip() for line in text.strip().splitlines() if line.strip()]
+    return lines[-1] if lines else ""
+
+
+def _normalize(answer):
+    return re.sub(r"[\s*`$。.,，]+", "", answer).lower()
+
+
+@register_scorer("vote")
+class MajorityVoteScorer(Scorer):
+    """对最终答案多数投票（某个答案获得过半数票后即可提前结束）"""
+
+    def decided(self, samples, n):
+        """其余候选全部投给其他答案也无法改变结果"""
+        counts = Counter(
+            answer
+            for answer in (_normalize(final_answer(sample.text)) for sample in samples)
+            if answer
+        )
+        return bool(counts) and counts.most_common(1)[0][1] * 2 > n
+
+    def select(self, samples):
+        answers = [_normalize(final_answer(sample.text)) for sample in samples]
+        counts = Counter(answer for answer in answers if answer)
+        if not counts:
+            return super().select(samples)
+        winner, _ = counts.most_common(1)[0]
+        for sample in samples:
+            sample.score = counts[_normalize(final_answer(sample.text))] / len(samples)
+        # 多数答案中选最先完成的
+        return min(
+            (i for i, answer in enumerate(answers) if answer == winner),
+            key=lambda i: samples[i].finished_at,
+        )
+
+
+@register_scorer("longest")
+class LongestScorer(Scorer):
+    """选择最长的回答（要比较全部候选，不支持提前结束）"""
+
+    supports_early_exit = False
+
+    def select(self, samples):
+        return max(range(len(samples)), key=lambda i: len(samples[i].text))
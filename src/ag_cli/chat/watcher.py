@@ -0,0 +1,99 @@
+# chat/watcher.py
+"""
+文件监视与差异消息
+
+FileWatcher 通过 os.stat 轮询 (mtime_ns, size)，只有文件在 debounce 时间内
+不再变化才认为保存完成，避免编辑器连续写入触发多次请求
+"""
+import difflib
+import os
+import time
+
+# 差异超过完整文件的该比例时直接发送完整文件
+DIFF_RATIO_LIMIT = 0.6
+
+
+class FileWatcher:
+    """轮询式文件监视器"""
+
+    def __init__(self, path, poll_interval=0.3, debounce=0.5):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self._signature = self._stat()
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            # 编辑器保存时可能先删除再写入
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def poll(self):
+        """检查一次，文件变化且已稳定时返回 True"""
+        signature = self._stat()
+        if signature == self._signature or signature is None:
+            return False
+
+        # 防抖：等待文件在 debounce 时间内不再变化
+        deadline = time.monotonic() + self.debounce
+        while time.monotonic() < deadline:
+            time.sleep(min(self.poll_interval, self.debounce))
+            latest = self._stat()
+            if latest != signature:
+                signature = latest
+                deadline = time.monotonic() + self.debounce
+        if signature is None:
+            return False
+        self._signature = signature
+        return True
+
+    def wait(self, stop_event=None):
+        """阻塞直到文件变化（或 stop_event 被设置）"""
+        while stop_event is None or not stop_event.is_set():
+            if self.poll():
+                return True
+            time.sleep(self.poll_interval)
+        return False
+
+
+def read_text(path):
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def make_diff(old, new, path):
+    """生成紧凑的 unified diff"""
+    return "".join(
+        difflib.unified_diff(
+            old.splitlines(keepends=True),
+            new.splitlines(keepends=True),
+            fromfile=f"a/{path.lstrip('/')}",
+            tofile=f"b/{path.lstrip('/')}",
+            n=2,
+        )
+    )
+
+
+def full_file_message(path, content, instruction):
+    """首次（或需要重新同步时）发送完整文件"""
+    return f"文件 `{path}` 的完整内容：\n\n```\n{content}\n```\n\n{instruction}"
+
+
+def diff_message(path, old, new, instruction):
+    """
+    生成变更消息，返回 (消息, 是否为差异)
+
+    差异过大时退回发送完整文件
+    """
+    diff = make_diff(old, new, path)
+    if not diff:
+        return None, True
+    if len(diff) > len(new) * DIFF_RATIO_LIMIT:
+        return full_file_message(path, new, instruction), False
+    return (
+        f"文件 `{path}` 已修改，相对上一版本的差异：\n\n```diff\n{diff}```\n\n"
+        f"请基于修改后的文件重新回答：{instruction}",
+        True,
+    )
@@ -0,0 +1,618 @@
+# cli/bench.py
+"""
+ag bench：对 OpenAI 兼容接口进行压测
+
+- closed 模式：固定并发，每个工作线程收到完整响应后再发下一个请求
+- open 模式：按目标速率（可选泊松分布）发出请求，不等待前一个请求完成；
+  延迟从计划发送时间开始计算，排队时间会计入结果（避免协调遗漏）
+
+请求复用 DeepSeekClient（密钥池、模型代称等），但不重试，以便如实统计错误；
+密钥池的冷却/失效状态只在进程内记录，不影响 ~/.ag-cli/key_stats.json。
+输出量优先使用接口返回的 usage（include_usage），接口不返回时按流式分块计数，
+结果中标注为 chunks
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from rich.console import Console
+from rich.live import Live
+from rich.table import Table
+from rich.text import Text
+
+from ag_cli.api_client import DeepSeekClient, split_delta
+from ag_cli.utils.histogram import LogHistogram
+
+BENCH_MODES = ("closed", "open")
+
+# 未指定语料时使用的默认提示词
+DEFAULT_PROMPTS = [
+    "用一句话解释什么是闭包。",
+    "列出三种常见的排序算法及其时间复杂度。",
+    "Write a haiku about latency.",
+    "HTTP 和 HTTPS 的主要区别是什么？",
+    "Explain the difference between a process and a thread in two sentences.",
+]
+
+HISTOGRAM_BAR_WIDTH = 40
+
+
+class RequestResult:
+    """单个请求的计时与状态"""
+
+    __slots__ = (
+        "scheduled",
+        "start",
+        "first_token",
+        "end",
+        "tokens",
+        "usage",
+        "gaps",
+        "status",
+        "error",
+    )
+
+    def __init__(self, scheduled):
+        self.scheduled = scheduled
+        self.start = None
+        self.first_token = None
+        self.end = None
+        self.tokens = 0
+        # tokens 是否来自接口返回的 usage（否则为流式分块数）
+        self.usage = False
+        self.gaps = []
+        self.status = "ok"
+        self.error = None
+
+    @property
+    def ok(self):
+        return self.status == "ok"
+
+
+def load_corpus(path=None):
+    """
+    读取提示词语料，返回消息列表的列表
+
+    .jsonl 每行为 {"prompt": "..."} 或 {"messages": [...]}；其余文件每个非空行一个提示词
+    """
+    if path is None:
+        return [[{"role": "user", "content": prompt}] for prompt in DEFAULT_PROMPTS]
+
+    corpus = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if path.endswith(".jsonl"):
+                entry = json.loads(line)
+                if "messages" in entry:
+                    corpus.append(entry["messages"])
+                else:
+                    corpus.append([{"role": "user", "content": entry["prompt"]}])
+            else:
+                corpus.append([{"role": "user", "content": line}])
+    if not corpus:
+        raise ValueError(f"语料文件为空: {path}")
+    return corpus
+
+
+def status_of(exc):
+    """从异常链中取出 HTTP 状态码，取不到时返回异常类型名"""
+    seen = exc
+    while seen is not None:
+        code = getattr(seen, "status_code", None)
+        if code is not None:
+            return str(code)
+        name = type(seen).__name__
+        if name in ("APITimeoutError", "ReadTimeout", "ConnectTimeout"):
+            return "timeout"
+        if name in ("APIConnectionError", "ConnectError"):
+            return "connection"
+        seen = seen.__cause__ or seen.__context__
+    return type(exc).__name__
+
+
+class BenchRunner:
+    """压测执行器"""
+
+    def __init__(self, client, corpus, model=None):
+        self.client = client
+        self.corpus = corpus
+        self.model = model
+        self.results = []
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._next_prompt = 0
+        self._stop = threading.Event()
+
+    def _prompt(self):
+        with self._lock:
+            messages = self.corpus[self._next_prompt % len(self.corpus)]
+            self._next_prompt += 1
+        return messages
+
+    def request(self, messages, scheduled=None):
+        """发送一个请求并记录每个 token 的到达时间"""
+        result = RequestResult(scheduled)
+        with self._lock:
+            self.in_flight += 1
+        result.start = time.perf_counter()
+        if result.scheduled is None:
+            result.scheduled = result.start
+        usage_tokens = None
+        last = None
+        try:
+            stream = self.client.get_raw_stream(messages, self.model)
+            try:
+                for chunk in stream:
+                    usage = getattr(chunk, "usage", None)
+                    if usage is not None and getattr(usage, "completion_tokens", None):
+                        usage_tokens = usage.completion_tokens
+                    reasoning, content = split_delta(chunk)
+                    if not (reasoning or content):
+                        continue
+                    now = time.perf_counter()
+                    if last is None:
+                        result.first_token = now
+                    else:
+                        result.gaps.append(now - last)
+                    last = now
+                    result.tokens += 1
+            finally:
+                close = getattr(stream, "close", None)
+                if close:
+                    close()
+            if result.first_token is None:
+                result.status = "empty"
+        except Exception as e:
+            result.status = status_of(e)
+            result.error = str(e)
+        result.end = time.perf_counter()
+        if usage_tokens:
+            result.tokens = usage_tokens
+            result.usage = True
+        with self._lock:
+            self.in_flight -= 1
+            self.results.append(result)
+        return result
+
+    def _budget_left(self, requests, deadline):
+        if self._stop.is_set():
+            return False
+        if deadline is not None and time.perf_counter() >= deadline:
+            return False
+        return requests is None or self._next_prompt < requests
+
+    def run_closed(self, concurrency, requests=None, duration=None):
+        """固定并发：每个线程循环发送请求"""
+        deadline = time.perf_counter() + duration if duration else None
+
+        def worker():
+            while True:
+                with self._lock:
+                    if not self._budget_left(requests, deadline):
+                        return
+                    messages = self.corpus[self._next_prompt % len(self.corpus)]
+                    self._next_prompt += 1
+                self.request(messages)
+
+        threads = [
+            threading.Thread(target=worker, name=f"ag-bench-{i}", daemon=True)
+            for i in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def run_open(
+        self, rate, requests=None, duration=None, max_inflight=256, poisson=False
+    ):
+        """固定速率：按计划时间发送，不等待之前的请求完成"""
+        pool = ThreadPoolExecutor(
+            max_workers=max_inflight, thread_name_prefix="ag-bench"
+        )
+
+        def scheduler():
+            start = time.perf_counter()
+            deadline = start + duration if duration else None
+            scheduled = start
+            try:
+                while self._budget_left(requests, deadline):
+                    delay = scheduled - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    pool.submit(self.request, self._prompt(), scheduled)
+                    interval = random.expovariate(rate) if poisson else 1 / rate
+                    scheduled += interval
+            finally:
+                pool.shutdown(wait=True)
+
+        thread = threading.Thread(
+            target=scheduler, name="ag-bench-scheduler", daemon=True
+        )
+        thread.start()
+        return [thread]
+
+    def stop(self):
+        self._stop.set()
+
+
+def summarize(results, wall_seconds):
+    """汇总结果为可序列化的字典"""
+    ttft = LogHistogram()
+    itl = LogHistogram()
+    latency = LogHistogram()
+    queue = LogHistogram()
+    # 单请求解码速率（tokens/s），精度 0.01
+    rate = LogHistogram(scale=100)
+    errors = {}
+    output_tokens = 0
+    from_usage = True
+
+    for result in results:
+        queue.record(result.start - result.scheduled)
+        if not result.ok:
+            errors[result.status] = errors.get(result.status, 0) + 1
+            continue
+        ttft.record(result.first_token - result.scheduled)
+        latency.record(result.end - result.scheduled)
+        for gap in result.gaps:
+            itl.record(gap)
+        output_tokens += result.tokens
+        from_usage = from_usage and result.usage
+        decode = result.end - result.first_token
+        if decode > 0 and result.tokens > 1:
+            rate.record(result.tokens / decode)
+
+    succeeded = len(results) - sum(errors.values())
+    return {
+        "requests": len(results),
+        "succeeded": succeeded,
+        "errors": dict(sorted(errors.items())),
+        "wall_seconds": wall_seconds,
+        "achieved_rps": len(results) / wall_seconds if wall_seconds else 0.0,
+        "output_tokens": output_tokens,
+        # 有请求未返回 usage 时，输出量按流式分块计数
+        "output_unit": "tokens" if from_usage else "chunks",
+        "throughput_tokens_per_sec": (
+            output_tokens / wall_seconds if wall_seconds else 0.0
+        ),
+        "histograms": {
+            "ttft": ttft.to_dict(),
+            "itl": itl.to_dict(),
+            "latency": latency.to_dict(),
+            "queue": queue.to_dict(),
+        },
+        "tokens_per_sec": {f"p{p}": rate.percentile(p) for p in (50, 90, 99)},
+        "_histograms": {"ttft": ttft, "itl": itl, "latency": latency},
+    }
+
+
+def _ms(seconds):
+    return f"{seconds * 1000:.1f}ms"
+
+
+def render_report(console, summary, show_histograms=True):
+    """在终端显示压测结果"""
+    table = Table(title="📊 压测结果", header_style="bold magenta")
+    table.add_column("指标")
+    for column in ("p50", "p90", "p99", "max", "平均"):
+        table.add_column(column, justify="right")
+    labels = {"ttft": "首token延迟", "itl": "token间隔", "latency": "总延迟"}
+    for name, histogram in summary["_histograms"].items():
+        table.add_row(
+            labels[name],
+            *(_ms(histogram.percentile(p)) for p in (50, 90, 99)),
+            _ms(histogram.max),
+            _ms(histogram.mean),
+        )
+    rates = summary["tokens_per_sec"]
+    unit = summary["output_unit"]
+    table.add_row(
+        f"单请求 {unit}/s",
+        *(f"{rates[p]:.1f}" for p in ("p50", "p90", "p99")),
+        "-",
+        "-",
+    )
+    console.print(table)
+
+    console.print(
+        f"✅ 成功 {summary['succeeded']}/{summary['requests']} · "
+        f"实际速率 {summary['achieved_rps']:.2f} req/s · "
+        f"吞吐 {summary['throughput_tokens_per_sec']:.1f} {unit}/s · "
+        f"耗时 {summary['wall_seconds']:.1f}s"
+    )
+    if unit == "chunks":
+        console.print(
+            "[yellow]⚠️ 接口未返回 usage，输出量按流式分块计数（chunks/s），"
+            "与 tokens/s 不可直接比较[/yellow]"
+        )
+    if summary["errors"]:
+        errors = Table(title="✖️ 错误", header_style="bold red")
+        errors.add_column("状态码")
+        errors.add_column("次数", justify="right")
+        for status, count in summary["errors"].items():
+            errors.add_row(status, str(count))
+        console.print(errors)
+
+    if show_histograms:
+        for name in ("ttft", "latency"):
+            render_histogram(console, labels[name], summary["_histograms"][name])
+
+
+def render_histogram(console, title, histogram):
+    """按 2 的幂区间显示直方图"""
+    buckets = histogram.coarse_buckets()
+    if not buckets:
+        return
+    peak = max(count for _, _, count in buckets)
+    console.print(f"\n[bold]{title}[/bold]")
+    for low, high, count in buckets:
+        bar = "█" * max(1, round(count / peak * HISTOGRAM_BAR_WIDTH))
+        console.print(
+            Text(f"  {_ms(low):>10} - {_ms(high):>10} │")
+            + Text(bar, style="cyan")
+            + Text(f" {count}")
+        )
+
+
+def compare_report(console, summary, baseline_path):
+    """与之前保存的 JSON 结果对比"""
+    try:
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["summary"]
+    except (OSError, ValueError, KeyError) as e:
+        console.print(f"[yellow]⚠️ 无法读取对比文件: {str(e)}[/yellow]")
+        return
+
+    table = Table(title=f"🔁 对比 {baseline_path}", header_style="bold magenta")
+    table.add_column("指标")
+    table.add_column("之前", justify="right")
+    table.add_column("现在", justify="right")
+    table.add_column("变化", justify="right")
+    rows = [
+        (
+            f"{name} {p}",
+            baseline["histograms"][name]["percentiles"][p],
+            summary["histograms"][name]["percentiles"][p],
+        )
+        for name in ("ttft", "itl", "latency")
+        for p in ("p50", "p99")
+    ]
+    for label, before, after in rows:
+        change = (after - before) / before if before else 0.0
+        # 延迟变大为退化
+        style = "red" if change > 0.1 else "green" if change < -0.1 else ""
+        table.add_row(
+            label, _ms(before), _ms(after), Text(f"{change:+.1%}", style=style)
+        )
+    before = baseline["throughput_tokens_per_sec"]
+    after = summary["throughput_tokens_per_sec"]
+    change = (after - before) / before if before else 0.0
+    style = "red" if change < -0.1 else "green" if change > 0.1 else ""
+    # 旧版本的结果文件没有 output_unit 字段，按分块计数处理
+    before_unit = baseline.get("output_unit", "chunks")
+    unit = summary["output_unit"]
+    table.add_row(
+        f"吞吐 {unit}/s" if unit == before_unit else f"吞吐 {before_unit}/s → {unit}/s",
+        f"{before:.1f}",
+        f"{after:.1f}",
+        Text(f"{change:+.1%}", style=style),
+    )
+    console.print(table)
+    if unit != before_unit:
+        console.print(
+            f"[yellow]⚠️ 两次结果的输出量单位不同（{before_unit} / {unit}），吞吐对比仅供参考[/yellow]"
+        )
+
+
+def write_report(path, summary, settings):
+    """写出 JSON 结果，便于跨次对比"""
+    payload = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "settings": settings,
+        "summary": {
+            key: value for key, value in summary.items() if not key.startswith("_")
+        },
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2, ensure_ascii=False)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="ag bench", description="对 OpenAI 兼容接口进行压测"
+    )
+    parser.add_argument(
+        "--prompts", type=str, default=None, help="提示词语料（.jsonl 或每行一个）"
+    )
+    parser.add_argument(
+        "--mode",
+        choices=BENCH_MODES,
+        default="closed",
+        help="closed(固定并发) 或 open(固定速率)",
+    )
+    parser.add_argument(
+        "--concurrency", "-c", type=int, default=4, help="closed 模式的并发数"
+    )
+    parser.add_argument(
+        "--rate", "-r", type=float, default=2.0, help="open 模式每秒请求数"
+    )
+    parser.add_argument(
+        "--poisson", action="store_true", help="open 模式按泊松过程发送"
+    )
+    parser.add_argument(
+        "--max-inflight", type=int, default=256, help="open 模式最大同时请求数"
+    )
+    parser.add_argument(
+        "--requests",
+        "-n",
+        type=int,
+        default=None,
+        help="请求总数（默认 50，与 --duration 二选一）",
+    )
+    parser.add_argument(
+        "--duration", "-d", type=float, default=None, help="压测时长（秒）"
+    )
+    parser.add_argument(
+        "--warmup", type=int, default=0, help="预热请求数（不计入结果）"
+    )
+    parser.add_argument("--model", "-m", type=str, default=None, help="模型名称或代称")
+    parser.add_argument("--base-url", type=str, default=None, help="覆盖接口地址")
+    parser.add_argument("--output", "-o", type=str, default=None, help="写出 JSON 结果")
+    parser.add_argument(
+        "--compare", type=str, default=None, help="与之前的 JSON 结果对比"
+    )
+    parser.add_argument("--no-histogram", action="store_true", help="不显示直方图")
+
+    stub_group = parser.add_argument_group("本地桩服务")
+    stub_group.add_argument(
+        "--stub", action="store_true", help="启动本地桩服务并对其压测（无需网络和密钥）"
+    )
+    stub_group.add_argument(
+        "--stub-ttft", type=float, default=0.05, help="桩服务首 token 延迟（秒）"
+    )
+    stub_group.add_argument(
+        "--stub-itl", type=float, default=0.005, help="桩服务 token 间隔（秒）"
+    )
+    stub_group.add_argument(
+        "--stub-tokens", type=int, default=64, help="桩服务每次输出的 token 数"
+    )
+    stub_group.add_argument(
+        "--stub-error-rate", type=float, default=0.0, help="桩服务返回 429/5xx 的比例"
+    )
+    return parser
+
+
+def _client_config(args, stub=None):
+    """压测使用的客户端配置：关闭 SDK 自动重试，密钥状态不写入统计文件"""
+    from ag_cli.config import load_config
+    from ag_cli.utils.stub_server import STUB_API_KEY, STUB_MODEL
+
+    if stub is not None:
+        config = {
+            "api_key": STUB_API_KEY,
+            "api_keys": [STUB_API_KEY],
+            "key_strategy": "round-robin",
+            "base_url": stub.base_url,
+            "default_model": STUB_MODEL,
+            "model_mapping": {},
+        }
+    else:
+        config = load_config()
+    if args.base_url:
+        config["base_url"] = args.base_url
+    # 压测中大量 429/401 不应让日常使用的密钥进入冷却或被移出池
+    config["key_stats_file"] = None
+    return config
+
+
+def _progress(runner, started, target):
+    done = len(runner.results)
+    errors = sum(1 for result in runner.results if not result.ok)
+    elapsed = time.perf_counter() - started
+    total = f"/{target}" if target else ""
+    return Text(
+        f"⏳ 已完成 {done}{total} · 进行中 {runner.in_flight} · 错误 {errors} · {elapsed:.1f}s"
+    )
+
+
+def bench_main(argv):
+    """ag bench 入口"""
+    args = build_parser().parse_args(argv)
+    console = Console()
+    if args.requests is None and args.duration is None:
+        args.requests = 50
+
+    stub = None
+    if args.stub:
+        from ag_cli.utils.stub_server import StubServer, StubSettings
+
+        stub = StubServer(
+            StubSettings(
+                ttft=args.stub_ttft,
+                itl=args.stub_itl,
+                tokens=args.stub_tokens,
+                error_rate=args.stub_error_rate,
+            )
+        ).start()
+        console.print(f"[cyan]🧪 本地桩服务: {stub.base_url}[/cyan]")
+
+    try:
+        try:
+            corpus = load_corpus(args.prompts)
+            client = DeepSeekClient(use_pretty=False, config=_client_config(args, stub))
+        except (OSError, ValueError) as e:
+            console.print(f"[red]✖️ {str(e)}[/red]")
+            return 1
+
+        runner = BenchRunner(client, corpus, args.model)
+        for i in range(args.warmup):
+            runner.request(corpus[i % len(corpus)])
+        runner.results.clear()
+
+        load = (
+            f"并发 {args.concurrency}"
+            if args.mode == "closed"
+            else f"{args.rate} req/s{'（泊松）' if args.poisson else ''}"
+        )
+        console.print(
+            f"[bold]🚀 {args.mode} 模式 · {load} · "
+            f"{f'{args.requests} 个请求' if args.requests else f'{args.duration}s'} · "
+            f"{client.config['base_url']}[/bold]"
+        )
+
+        started = time.perf_counter()
+        if args.mode == "closed":
+            threads = runner.run_closed(args.concurrency, args.requests, args.duration)
+        else:
+            threads = runner.run_open(
+                args.rate, args.requests, args.duration, args.max_inflight, args.poisson
+            )
+
+        try:
+            with Live(
+                _progress(runner, started, args.requests),
+                console=console,
+                refresh_per_second=4,
+                transient=True,
+            ) as live:
+                while any(thread.is_alive() for thread in threads):
+                    for thread in threads:
+                        thread.join(0.25)
+                    live.update(_progress(runner, started, args.requests))
+        except KeyboardInterrupt:
+            console.print(
+                "[yellow]🛑 已停止发送新请求，等待进行中的请求结束...[/yellow]"
+            )
+            runner.stop()
+            for thread in threads:
+                thread.join()
+        wall = time.perf_counter() - started
+
+        if not runner.results:
+            console.print("[yellow]⚠️ 没有完成任何请求[/yellow]")
+            return 1
+
+        summary = summarize(runner.results, wall)
+        render_report(console, summary, not args.no_histogram)
+        if args.compare:
+            compare_report(console, summary, args.compare)
+        if args.output:
+            settings = {
+                key: value
+                for key, value in vars(args).items()
+                if key not in ("output", "compare")
+            }
+            settings["base_url"] = client.config["base_url"]
+            write_report(args.output, summary, settings)
+            console.print(f"[cyan]💾 结果已写出: {args.output}[/cyan]")
+        return 0
+    finally:
+        if stub is not None:
+            stub.stop()
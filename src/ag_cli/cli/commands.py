@@ -1,33 +1,102 @@
 # cli/commands.py
+import sys
+import time
+
+from ag_cli.api_client import abort_stream
+from ag_cli.chat.compaction import compact_text
 from ag_cli.chat.interface import ChatInterface
 from ag_cli.chat.history_manager import HistoryManager
 from ag_cli.chat.input_handler import get_user_input
+from ag_cli.config import get_history_limit
+
+
+def _compact(console, message, use_pretty=True):
+    """压缩用户消息并显示节省的 token，返回发送给模型的内容"""
+    result = compact_text(message)
+    if result.saved_tokens > 0:
+        if use_pretty:
+            console.print(f"[dim]🗜️ 已压缩: {result.summary()}[/dim]")
+        else:
+            print(f"[compact] {result.summary()}", file=sys.stderr)
+    return result.text
+
+
+def _recall(console, question, k, use_pretty=True):
+    """在问题前注入最相关的 k 条历史对话片段"""
+    from ag_cli.search import recall_context, search_index_enabled
+
+    if not search_index_enabled():
+        console.print(
+            "[yellow]⚠️ 搜索索引未开启，--recall 无效（在配置文件中设置 "
+            '"search_index": true 或环境变量 AG_SEARCH_INDEX=1）[/yellow]'
+        )
+        return question
+    augmented, hits = recall_context(question, k)
+    if hits:
+        if use_pretty:
+            console.print(f"[dim]🧠 已注入 {len(hits)} 条相关历史对话[/dim]")
+        else:
+            print(f"[recall] {len(hits)} snippets", file=sys.stderr)
+    return augmented
+
+
+def _add_user_message(console, history_manager, message, compact, recall, use_pretty):
+    """
+    把用户消息加入对话历史，返回记录用的问题（未注入历史片段时为 None）
+
+    compact 为 True 时压缩消息；recall 大于 0 时在新对话的第一条消息前注入历史片段。
+    历史中保留原文用于显示
+    """
+    sent = _compact(console, message, use_pretty) if compact else message
+    prompt = None
+    if recall and len(history_manager.store) == 1:
+        augmented = _recall(console, sent, recall, use_pretty)
+        if augmented != sent:
+            prompt, sent = sent, augmented
+    history_manager.add_user_message(sent, message)
+    return prompt
 
 
 def continuous_chat(
-    client, console, model=None, initial_question=None, use_pretty=True
+    client,
+    console,
+    model=None,
+    initial_question=None,
+    use_pretty=True,
+    reasoning_mode="show",
+    compact=False,
+    recall=0,
 ):
-    """连续对话模式"""
-    chat_interface = ChatInterface(client, console, use_pretty)
-    history_manager = HistoryManager(chat_interface.system_prompt)
+    """
+    连续对话模式，compact 为 True 时发送前压缩用户消息，
+    recall 大于 0 时在新对话开始时注入相关历史片段
+    """
+    chat_interface = ChatInterface(client, console, use_pretty, reasoning_mode)
+    history_manager = HistoryManager(chat_interface.system_prompt, get_history_limit())
 
     console.print("[bold]输入 '.' 单独一行结束多行输入[/bold]")
     console.print("[bold]输入 '.exit' 结束对话[/bold]")
+    console.print("[bold]输入 '.edit' 在 $EDITOR 中编辑较长的消息[/bold]")
     console.print("[bold]输入 '.clear' 清空对话历史[/bold]")
-    console.print("[bold]输入 '.history' 查看对话历史[/bold]\n")
+    console.print(
+        "[bold]输入 '.history [轮次 | /关键词]' 分页查看、跳转或搜索对话历史[/bold]"
+    )
+    console.print("[bold]输入 '.search 关键词' 搜索以往所有对话[/bold]\n")
 
     # 如果有初始问题，先处理
     if initial_question:
         # 显示问题
         chat_interface.display_question(initial_question)
 
-        # 添加到对话历史
-        history_manager.add_user_message(initial_question)
+        # 添加到对话历史（压缩或注入历史片段时保留原文用于显示）
+        prompt = _add_user_message(
+            console, history_manager, initial_question, compact, recall, use_pretty
+        )
 
         try:
             # 调用API并动态显示结果
             response = chat_interface.call_api_continuous(
-                history_manager.get_managed_history(), model
+                history_manager.get_managed_history(), model, prompt
             )
 
             # 显示回答
@@ -38,11 +107,7 @@ def continuous_chat(
         except Exception as e:
             console.print(f"[red]✖️ API调用错误: {str(e)}[/red]")
             # 移除最后一条用户消息，因为处理失败了
-            if (
-                history_manager.conversation_history
-                and history_manager.conversation_history[-1]["role"] == "user"
-            ):
-                history_manager.conversation_history.pop()
+            history_manager.pop_last_user_message()
 
     while True:
         try:
@@ -60,13 +125,15 @@ def continuous_chat(
             # 显示问题
             chat_interface.display_question(user_input)
 
-            # 添加到对话历史
-            history_manager.add_user_message(user_input)
+            # 添加到对话历史（压缩或注入历史片段时保留原文用于显示）
+            prompt = _add_user_message(
+                console, history_manager, user_input, compact, recall, use_pretty
+            )
 
             try:
                 # 调用API并动态显示结果
                 response = chat_interface.call_api_continuous(
-                    history_manager.get_managed_history(), model
+                    history_manager.get_managed_history(), model, prompt
                 )
 
                 if response:
@@ -76,64 +143,266 @@ def continuous_chat(
             except Exception as e:
                 console.print(f"[red]✖️ API调用错误: {str(e)}[/red]")
                 # 移除最后一条用户消息，因为处理失败了
-                if (
-                    history_manager.conversation_history
-                    and history_manager.conversation_history[-1]["role"] == "user"
-                ):
-                    history_manager.conversation_history.pop()
+                history_manager.pop_last_user_message()
 
         except KeyboardInterrupt:
             console.print("\n[yellow]🛑 结束对话。[/yellow]")
             break
 
 
-def single_chat(client, console, question, model=None, use_pretty=True):
-    """单次对话模式"""
-    chat_interface = ChatInterface(client, console, use_pretty)
+def single_chat(
+    client,
+    console,
+    question,
+    model=None,
+    use_pretty=True,
+    reasoning_mode="show",
+    compact=False,
+    recall=0,
+):
+    """
+    单次对话模式，compact 为 True 时发送前压缩问题，
+    recall 大于 0 时在问题前注入相关历史片段
+    """
+    chat_interface = ChatInterface(client, console, use_pretty, reasoning_mode)
 
     try:
         # 显示问题(美化模式下才显示)
         if use_pretty:
             chat_interface.display_question(question)
 
+        if compact:
+            question = _compact(console, question, use_pretty)
+
+        prompt = None
+        if recall:
+            augmented = _recall(console, question, recall, use_pretty)
+            if augmented != question:
+                prompt, question = question, augmented
+
         # 调用API并显示结果
-        chat_interface.call_api_single(question, model)
+        chat_interface.call_api_single(question, model, prompt)
 
     except Exception as e:
         console.print(f"[red]✖️ 错误: {str(e)}[/red]")
 
 
+# 取消后等待旧请求线程结束的最长时间（秒），超时则放弃该线程
+CANCEL_JOIN_TIMEOUT = 2.0
+
+
+def _cancellable(stream, cancel):
+    """取消事件被设置后停止迭代并关闭底层流，取消引起的读取错误不再抛出"""
+    try:
+        if cancel.is_set():
+            return
+        for chunk in stream:
+            if cancel.is_set():
+                return
+            yield chunk
+    except Exception:
+        if not cancel.is_set():
+            raise
+    finally:
+        close = getattr(stream, "close", None)
+        if close:
+            close()
+
+
+def watch_chat(
+    client,
+    console,
+    path,
+    instruction,
+    model=None,
+    use_pretty=True,
+    reasoning_mode="show",
+    poll_interval=0.3,
+    debounce=0.5,
+):
+    """
+    监视模式：文件每次保存后重新回答同一指令
+
+    首轮发送完整文件，之后在同一会话中只发送相对上一版本的差异；
+    旧版本的请求尚未完成时文件再次变化，会取消旧请求
+    """
+    import os
+    import threading
+
+    from ag_cli.chat.history_manager import RECENT_MESSAGES
+    from ag_cli.chat.watcher import (
+        FileWatcher,
+        diff_message,
+        full_file_message,
+        read_text,
+    )
+
+    if not os.path.isfile(path):
+        console.print(f"[red]✖️ 文件不存在: {path}[/red]")
+        return
+
+    chat_interface = ChatInterface(client, console, use_pretty, reasoning_mode)
+    history_manager = HistoryManager(chat_interface.system_prompt, get_history_limit())
+    watcher = FileWatcher(path, poll_interval, debounce)
+    # 最早的完整文件超出上下文窗口前重新发送完整文件
+    resync_turns = RECENT_MESSAGES // 2 - 1
+
+    # 模型已基于其给出完整回答的版本
+    acknowledged = None
+    diff_turns = 0
+
+    console.print(
+        f"[bold]👀 正在监视 {path}，保存文件后自动重新回答（Ctrl+C 退出）[/bold]\n"
+    )
+
+    try:
+        while True:
+            content = read_text(path)
+            is_diff = False
+            if acknowledged is None or diff_turns >= resync_turns:
+                message = full_file_message(path, content, instruction)
+            else:
+                message, is_diff = diff_message(
+                    path, acknowledged, content, instruction
+                )
+
+            if message is None:
+                # 内容未变（例如仅修改了时间戳）
+                watcher.wait()
+                continue
+
+            if is_diff:
+                console.print(
+                    f"[cyan]📝 {path} 已修改，发送差异（{len(message)} 字符）[/cyan]"
+                )
+            else:
+                chat_interface.display_question(f"{instruction}\n📄 {path}")
+            history_manager.add_user_message(message)
+
+            cancel = threading.Event()
+            result = {}
+
+            # cancel/result 作为参数传入：被放弃的旧线程不会写入下一轮的结果
+            def request(cancel, result):
+                try:
+                    chat_interface._request_start = time.perf_counter()
+                    stream = client.get_chat_completion_stream(
+                        history_manager.get_managed_history(), model
+                    )
+                    result["stream"] = stream
+                    if cancel.is_set():
+                        # 建立连接期间已被取消，不再显示
+                        stream.close()
+                        return
+                    result["response"] = chat_interface.display_streaming_response(
+                        _cancellable(stream, cancel)
+                    )
+                except Exception as e:
+                    result["error"] = e
+
+            worker = threading.Thread(
+                target=request, args=(cancel, result), name="ag-watch", daemon=True
+            )
+            worker.start()
+
+            # 请求进行中继续监视文件
+            changed = False
+            while worker.is_alive():
+                if watcher.poll():
+                    changed = True
+                    cancel.set()
+                    # 立即关闭连接，不等下一个分块到达
+                    abort_stream(result.get("stream"))
+                    break
+                worker.join(poll_interval)
+            # 仍在建立连接的旧请求无法中止，超时后放弃（守护线程）
+            worker.join(CANCEL_JOIN_TIMEOUT)
+
+            if changed:
+                console.print("[yellow]🔄 文件已再次修改，已取消旧版本的请求[/yellow]")
+                history_manager.pop_last_user_message()
+                continue
+
+            chat_interface.record_turn(
+                "watch",
+                model,
+                history_manager.get_managed_history(),
+                result.get("response"),
+                error="error" in result,
+            )
+            if "error" in result:
+                console.print(f"[red]✖️ API调用错误: {str(result['error'])}[/red]")
+                history_manager.pop_last_user_message()
+            elif result.get("response"):
+                history_manager.add_assistant_message(result["response"])
+                diff_turns = diff_turns + 1 if is_diff else 0
+                acknowledged = content
+            else:
+                history_manager.pop_last_user_message()
+
+            watcher.wait()
+
+    except KeyboardInterrupt:
+        console.print("\n[yellow]🛑 结束监视。[/yellow]")
+
+
 def config_command(args):
     """配置管理命令"""
     from ag_cli.config import (
         set_api_key,
-        get_api_key,
+        get_api_keys,
+        add_api_key,
+        remove_api_key,
+        set_key_strategy,
+        get_key_strategy,
+        mask_key,
         clear_api_key,
         get_config_file_path,
         get_config_dir_path,
         config_exists,
     )
+    from ag_cli.key_pool import reset_key_state
     from rich.console import Console
 
     console = Console()
 
     if args.action == "set":
-        if not args.api_key:
+        if not args.api_key and not args.key_strategy:
             console.print("[red]✖️ 请使用 --api-key 参数指定API密钥[/red]")
             return
-        result = set_api_key(args.api_key)
-        console.print(f"[green]✅ {result}[/green]")
+        if args.api_key:
+            result = set_api_key(args.api_key)
+            reset_key_state(args.api_key)
+            console.print(f"[green]✅ {result}[/green]")
+        if args.key_strategy:
+            result = set_key_strategy(args.key_strategy)
+            console.print(f"[green]✅ {result}[/green]")
 
         # 显示配置文件信息
         console.print(f"[cyan]📁 配置目录: {get_config_dir_path()}[/cyan]")
         console.print(f"[cyan]📄 配置文件: {get_config_file_path()}[/cyan]")
 
+    elif args.action in ("add", "remove"):
+        if not args.api_key:
+            console.print("[red]✖️ 请使用 --api-key 参数指定API密钥[/red]")
+            return
+        if args.action == "add":
+            result = add_api_key(args.api_key)
+            reset_key_state(args.api_key)
+        else:
+            result = remove_api_key(args.api_key)
+        console.print(f"[green]✅ {result}[/green]")
+
     elif args.action == "get":
-        api_key = get_api_key()  # 替换为get_api_key
-        if api_key:
+        api_keys = get_api_keys()
+        if api_keys:
             # 显示部分密钥，保护敏感信息
-            masked_key = api_key[:8] + "*" * (len(api_key) - 12) + api_key[-4:]
-            console.print(f"[yellow]🔑 当前API密钥: {masked_key}[/yellow]")
+            console.print(f"[yellow]🔑 当前API密钥: {mask_key(api_keys[0])}[/yellow]")
+            if len(api_keys) > 1:
+                console.print(
+                    f"[yellow]🔑 密钥池: {len(api_keys)} 个，策略: {get_key_strategy()}[/yellow]"
+                )
+            display_key_stats(console, api_keys)
 
             # 显示配置文件信息
             if config_exists():
@@ -149,6 +418,10 @@ def config_command(args):
             console.print(f"[cyan]📁 配置目录: {get_config_dir_path()}[/cyan]")
             console.print(f"[cyan]📄 配置文件: {get_config_file_path()}[/cyan]")
 
+    elif args.action == "reset":
+        count = reset_key_state()
+        console.print(f"[green]✅ 已清除 {count} 个密钥的冷却/失效状态[/green]")
+
     elif args.action == "clear":
         result = clear_api_key()
         console.print(f"[green]✅ {result}[/green]")
@@ -156,3 +429,42 @@ def config_command(args):
         # 显示配置文件信息
         console.print(f"[cyan]📁 配置目录: {get_config_dir_path()}[/cyan]")
         console.print(f"[cyan]📄 配置文件: {get_config_file_path()}[/cyan]")
+
+
+def display_key_stats(console, api_keys):
+    """显示每个密钥的使用次数与限流统计"""
+    import time
+    from rich.table import Table
+    from ag_cli.config import mask_key
+    from ag_cli.key_pool import key_fingerprint, load_key_stats
+
+    stats = load_key_stats()
+    if not any(key_fingerprint(key) in stats for key in api_keys):
+        return
+
+    now = time.time()
+    table = Table(show_header=True, header_style="bold magenta")
+    table.add_column("密钥", style="cyan", no_wrap=True)
+    table.add_column("状态")
+    table.add_column("请求数", justify="right")
+    table.add_column("限流(429)", justify="right")
+    table.add_column("失效(401)", justify="right")
+    table.add_column("最近限流")
+    for key in api_keys:
+        record = stats.get(key_fingerprint(key), {})
+        if record.get("evicted_until", 0) > now:
+            status = f"[red]已失效({record['evicted_until'] - now:.0f}s后重试)[/red]"
+        elif record.get("cooldown_until", 0) > now:
+            status = f"[yellow]冷却中({record['cooldown_until'] - now:.0f}s)[/yellow]"
+        else:
+            status = "[green]正常[/green]"
+        last = record.get("last_throttled")
+        table.add_row(
+            mask_key(key),
+            status,
+            str(record.get("requests", 0)),
+            str(record.get("throttles", 0)),
+            str(record.get("failures", 0)),
+            time.strftime("%m-%d %H:%M", time.localtime(last)) if last else "-",
+        )
+    console.print(table)
@@ -0,0 +1,229 @@
+# cli/stats.py
+"""
+ag stats：汇总对话统计归档
+
+按列读取 ~/.ag-cli/analytics 下的归档，输出延迟百分位和按模型/模式/日期的用量分布；
+读取前会合并小段数量较多的归档文件
+"""
+import argparse
+import json
+import math
+import re
+import time
+from datetime import datetime, timedelta
+
+from rich.console import Console
+from rich.table import Table
+
+from ag_cli.analytics import STATUS_OK, compact_archives, scan
+
+GROUP_KEYS = ("model", "mode", "day", "month")
+
+SCAN_COLUMNS = (
+    "model",
+    "mode",
+    "prompt_tokens",
+    "completion_tokens",
+    "cached_tokens",
+    "ttft",
+    "total",
+    "retries",
+    "status",
+)
+
+
+def parse_since(value):
+    """'30d' / '12h' / '2026-01' / '2026-01-15' -> 时间戳，'all' 或空时返回 None"""
+    if not value or value == "all":
+        return None
+    match = re.fullmatch(r"(\d+)([dhw])", value)
+    if match:
+        amount, unit = int(match.group(1)), match.group(2)
+        hours = {"h": 1, "d": 24, "w": 24 * 7}[unit] * amount
+        return (datetime.now() - timedelta(hours=hours)).timestamp()
+    for fmt in ("%Y-%m-%d", "%Y-%m"):
+        try:
+            return datetime.strptime(value, fmt).timestamp()
+        except ValueError:
+            continue
+    raise ValueError(
+        f"无法解析时间范围: {value}（示例: 30d, 12h, 2026-01, 2026-01-15）"
+    )
+
+
+def percentile(values, p):
+    """已排序列表的第 p 百分位（最近秩）"""
+    if not values:
+        return None
+    return values[max(0, math.ceil(len(values) * p / 100) - 1)]
+
+
+def _positive_sum(values):
+    return sum(value for value in values if value > 0)
+
+
+def _latency(values):
+    ordered = sorted(value for value in values if value >= 0)
+    return {
+        "count": len(ordered),
+        "p50": percentile(ordered, 50),
+        "p90": percentile(ordered, 90),
+        "p99": percentile(ordered, 99),
+    }
+
+
+def _group_keys(data, by):
+    if by in ("model", "mode"):
+        return data[by]
+    fmt = "%Y-%m-%d" if by == "day" else "%Y-%m"
+    # 同一天的时间戳只格式化一次
+    cache = {}
+    keys = []
+    for ts in data["ts"]:
+        bucket = int(ts // 3600)
+        key = cache.get(bucket)
+        if key is None:
+            key = cache[bucket] = datetime.fromtimestamp(ts).strftime(fmt)
+        keys.append(key)
+    return keys
+
+
+def _summarize(data, indices=None):
+    """汇总一组行（indices 为 None 时为全部）"""
+
+    def column(name):
+        values = data[name]
+        return values if indices is None else [values[i] for i in indices]
+
+    status = column("status")
+    ok = [s == STATUS_OK for s in status]
+    prompt_tokens = _positive_sum(column("prompt_tokens"))
+    cached_tokens = _positive_sum(column("cached_tokens"))
+    return {
+        "turns": len(status),
+        "errors": len(status) - sum(ok),
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": _positive_sum(column("completion_tokens")),
+        "cached_tokens": cached_tokens,
+        "cache_hit_ratio": cached_tokens / prompt_tokens if prompt_tokens else 0.0,
+        "retries": sum(column("retries")),
+        "ttft": _latency(t for t, good in zip(column("ttft"), ok) if good),
+        "total": _latency(t for t, good in zip(column("total"), ok) if good),
+    }
+
+
+def compute_stats(since=None, by="model", model=None):
+    """扫描归档并汇总，返回可序列化的字典"""
+    started = time.perf_counter()
+    data, rows = scan(SCAN_COLUMNS, since)
+
+    if model and rows:
+        selected = [i for i, name in enumerate(data["model"]) if name == model]
+        data = {name: [values[i] for i in selected] for name, values in data.items()}
+        rows = len(selected)
+
+    groups = {}
+    for i, key in enumerate(_group_keys(data, by)):
+        groups.setdefault(key or "-", []).append(i)
+
+    return {
+        "rows": rows,
+        "overall": _summarize(data),
+        "by": by,
+        "groups": {
+            key: _summarize(data, indices) for key, indices in sorted(groups.items())
+        },
+        "scan_ms": (time.perf_counter() - started) * 1000,
+    }
+
+
+def _seconds(value):
+    return "-" if value is None else f"{value:.2f}s"
+
+
+def render_stats(console, stats):
+    """在终端显示统计结果"""
+    overall = stats["overall"]
+    console.print(
+        f"[bold]📈 共 {overall['turns']:,} 轮 · 错误 {overall['errors']:,} · "
+        f"输入 {overall['prompt_tokens']:,} tokens（缓存命中 {overall['cache_hit_ratio']:.0%}） · "
+        f"输出 {overall['completion_tokens']:,} tokens · 重试 {overall['retries']:,} 次[/bold]"
+    )
+
+    latency = Table(title="⏱️ 延迟", header_style="bold magenta")
+    latency.add_column("指标")
+    for column in ("样本", "p50", "p90", "p99"):
+        latency.add_column(column, justify="right")
+    for label, name in (("首token", "ttft"), ("总耗时", "total")):
+        values = overall[name]
+        latency.add_row(
+            label,
+            f"{values['count']:,}",
+            *(_seconds(values[p]) for p in ("p50", "p90", "p99")),
+        )
+    console.print(latency)
+
+    labels = {"model": "模型", "mode": "模式", "day": "日期", "month": "月份"}
+    table = Table(title=f"📊 按{labels[stats['by']]}统计", header_style="bold magenta")
+    table.add_column(labels[stats["by"]], style="cyan")
+    for column in (
+        "轮数",
+        "错误",
+        "输入tokens",
+        "输出tokens",
+        "缓存命中",
+        "首token p50",
+        "总耗时 p50",
+        "总耗时 p90",
+    ):
+        table.add_column(column, justify="right")
+    for key, group in stats["groups"].items():
+        table.add_row(
+            key,
+            f"{group['turns']:,}",
+            f"{group['errors']:,}",
+            f"{group['prompt_tokens']:,}",
+            f"{group['completion_tokens']:,}",
+            f"{group['cache_hit_ratio']:.0%}",
+            _seconds(group["ttft"]["p50"]),
+            _seconds(group["total"]["p50"]),
+            _seconds(group["total"]["p90"]),
+        )
+    console.print(table)
+    console.print(
+        f"[dim]扫描 {stats['rows']:,} 条记录，用时 {stats['scan_ms']:.0f} ms[/dim]"
+    )
+
+
+def stats_main(argv):
+    """ag stats 入口"""
+    parser = argparse.ArgumentParser(prog="ag stats", description="汇总对话统计归档")
+    parser.add_argument(
+        "--since",
+        type=str,
+        default=None,
+        help="时间范围，如 30d、12h、2026-01、2026-01-15（默认全部）",
+    )
+    parser.add_argument("--by", choices=GROUP_KEYS, default="model", help="分组方式")
+    parser.add_argument("--model", "-m", type=str, default=None, help="只统计指定模型")
+    parser.add_argument("--json", action="store_true", help="输出 JSON")
+    args = parser.parse_args(argv)
+
+    console = Console()
+    try:
+        since = parse_since(args.since)
+    except ValueError as e:
+        console.print(f"[red]✖️ {str(e)}[/red]")
+        return 1
+
+    # 顺便合并每次退出时追加的小段，减少之后读取时的段数
+    compact_archives()
+    stats = compute_stats(since, args.by, args.model)
+    if args.json:
+        print(json.dumps(stats, indent=2, ensure_ascii=False))
+        return 0
+    if not stats["rows"]:
+        console.print("[yellow]📭 暂无统计记录（对话完成后自动记录）[/yellow]")
+        return 0
+    render_stats(console, stats)
+    return 0
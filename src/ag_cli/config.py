@@ -2,6 +2,8 @@ import os
 import json
 from pathlib import Path
 from rich.console import Console
+from .chat.history_store import MAX_STORED_MESSAGES
+from .utils.tracing import span
 
 console = Console()
 
@@ -9,6 +11,16 @@ console = Console()
 CONFIG_DIR = Path.home() / ".ag-cli"
 CONFIG_FILE = CONFIG_DIR / "config.json"
 
+DEFAULT_BASE_URL = "https://dashscope.aliyuncs.com/compatible-mode/v1"
+DEFAULT_MODEL = "deepseek-v3.1"
+
+# 内置模型代称，可在配置文件的 model_aliases 中追加或覆盖
+DEFAULT_MODEL_MAPPING = {
+    "v3.1": "deepseek-v3.1",
+    "r1": "deepseek-r1",
+    "q3m": "qwen3-max",
+}
+
 
 def ensure_config_dir():
     """确保配置目录存在"""
@@ -31,52 +43,64 @@ def validate_config(config):
 # 修改load_config函数，将exit(1)改为抛出异常
 def load_config():
     """加载配置文件和环境变量"""
-    # 优先级：1. 系统环境变量 2. 配置文件
+    with span("load_config"):
+        return _load_config()
 
-    # 1. 检查系统环境变量
-    dashscope_api_key = os.getenv("DASHSCOPE_API_KEY")
 
-    # 2. 检查配置文件
-    if not dashscope_api_key and CONFIG_FILE.exists():
-        try:
-            with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-                config_data = json.load(f)
-                dashscope_api_key = config_data.get("api_key", "")
-        except Exception as e:
-            console.print(f"[yellow]⚠️ 读取配置文件失败: {str(e)}[/yellow]")
+def _load_config():
+    # 优先级：1. 系统环境变量 2. 配置文件
+    api_keys = get_api_keys()
 
-    if not dashscope_api_key:
+    if not api_keys:
         # 抛出异常而不是直接退出
         raise ValueError(
             "未找到API密钥，请使用 'ag --config set --api-key <your-key>' 设置"
         )
 
-    # 模型名称映射
-    model_mapping = {
-        "v3.1": "deepseek-v3.1",
-        "r1": "deepseek-r1",
-        "q3m": "qwen3-max",
-    }
-
     config = {
-        "api_key": dashscope_api_key,
-        "base_url": "https://dashscope.aliyuncs.com/compatible-mode/v1",
-        "default_model": "deepseek-v3.1",
-        "model_mapping": model_mapping,
+        "api_key": api_keys[0],
+        "api_keys": api_keys,
+        "key_strategy": get_key_strategy(),
+        "base_url": DEFAULT_BASE_URL,
+        "default_model": DEFAULT_MODEL,
+        "model_mapping": get_model_aliases(),
     }
 
     return validate_config(config)
 
 
+def read_config_file():
+    """读取配置文件内容，不存在或读取失败时返回空字典"""
+    if not CONFIG_FILE.exists():
+        return {}
+    try:
+        with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        console.print(f"[yellow]⚠️ 读取配置文件失败: {str(e)}[/yellow]")
+        return {}
+
+
+def get_model_aliases():
+    """获取模型代称映射（内置代称 + 配置文件中的 model_aliases），不需要API密钥"""
+    aliases = dict(DEFAULT_MODEL_MAPPING)
+    aliases.update(read_config_file().get("model_aliases", {}))
+    return aliases
+
+
 def set_api_key(api_key: str):
     """设置API密钥到配置文件"""
     ensure_config_dir()
 
-    config_data = {
-        "api_key": api_key,
-        "base_url": "https://dashscope.aliyuncs.com/compatible-mode/v1",
-        "default_model": "deepseek-v3.1",
-    }
+    # 保留配置文件中的其他设置（如 model_aliases）
+    config_data = read_config_file()
+    config_data.update(
+        {
+            "api_key": api_key,
+            "base_url": DEFAULT_BASE_URL,
+            "default_model": DEFAULT_MODEL,
+        }
+    )
 
     try:
         with open(CONFIG_FILE, "w", encoding="utf-8") as f:
@@ -87,26 +111,117 @@ def set_api_key(api_key: str):
 
 
 def get_api_key() -> str:
-    """获取当前API密钥"""
-    # 优先级：1. 系统环境变量 2. 配置文件
-    api_key = os.getenv("DASHSCOPE_API_KEY", "")
+    """获取当前API密钥（密钥池中的第一个）"""
+    api_keys = get_api_keys()
+    return api_keys[0] if api_keys else ""
+
+
+def get_api_keys() -> list:
+    """
+    获取API密钥池
+
+    优先级：1. 系统环境变量（DASHSCOPE_API_KEY，DASHSCOPE_API_KEYS 逗号分隔）
+           2. 配置文件（api_key，api_keys）
+    """
+    env_keys = [os.getenv("DASHSCOPE_API_KEY", "")]
+    env_keys += os.getenv("DASHSCOPE_API_KEYS", "").split(",")
+    keys = [key.strip() for key in env_keys if key.strip()]
+
+    if not keys:
+        config_data = read_config_file()
+        keys = [config_data.get("api_key", "")] + config_data.get("api_keys", [])
+        keys = [key for key in keys if key]
+
+    # 去重并保持顺序
+    return list(dict.fromkeys(keys))
+
+
+def get_key_strategy() -> str:
+    """获取密钥选择策略（环境变量 AG_KEY_STRATEGY 优先）"""
+    return os.getenv("AG_KEY_STRATEGY") or read_config_file().get(
+        "key_strategy", "round-robin"
+    )
 
-    if not api_key and CONFIG_FILE.exists():
-        try:
-            with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-                config_data = json.load(f)
-                api_key = config_data.get("api_key", "")
-        except Exception as e:
-            console.print(f"[yellow]⚠️ 读取配置文件失败: {str(e)}[/yellow]")
 
-    return api_key
+def get_history_limit() -> int:
+    """获取会话中最多保存的消息数（环境变量 AG_HISTORY_LIMIT 优先）"""
+    value = os.getenv("AG_HISTORY_LIMIT") or read_config_file().get("history_limit")
+    if value is None:
+        return MAX_STORED_MESSAGES
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        console.print(
+            f"[yellow]⚠️ 无效的 history_limit: {value}，"
+            f"使用默认值 {MAX_STORED_MESSAGES}[/yellow]"
+        )
+        return MAX_STORED_MESSAGES
+
+
+def mask_key(api_key: str) -> str:
+    """显示部分密钥，保护敏感信息"""
+    return api_key[:8] + "*" * (len(api_key) - 12) + api_key[-4:]
+
+
+def _write_config_file(config_data):
+    ensure_config_dir()
+    with open(CONFIG_FILE, "w", encoding="utf-8") as f:
+        json.dump(config_data, f, indent=2, ensure_ascii=False)
+
+
+def add_api_key(api_key: str):
+    """添加API密钥到密钥池"""
+    config_data = read_config_file()
+    if not config_data.get("api_key"):
+        return set_api_key(api_key)
+
+    pool = config_data.setdefault("api_keys", [])
+    if api_key == config_data["api_key"] or api_key in pool:
+        return f"API密钥已在密钥池中: {mask_key(api_key)}"
+    pool.append(api_key)
+
+    try:
+        _write_config_file(config_data)
+        return f"API密钥已添加到密钥池（共 {len(pool) + 1} 个）: {CONFIG_FILE}"
+    except Exception as e:
+        return f"保存配置失败: {str(e)}"
+
+
+def remove_api_key(api_key: str):
+    """从密钥池中移除API密钥"""
+    config_data = read_config_file()
+    existing = [config_data.get("api_key", "")] + config_data.get("api_keys", [])
+    existing = [key for key in existing if key]
+    if api_key not in existing:
+        return f"密钥池中没有该密钥: {mask_key(api_key)}"
+    keys = [key for key in existing if key != api_key]
+
+    config_data["api_key"] = keys[0] if keys else ""
+    config_data["api_keys"] = keys[1:]
+    try:
+        _write_config_file(config_data)
+        return f"API密钥已从密钥池移除（剩余 {len(keys)} 个）: {CONFIG_FILE}"
+    except Exception as e:
+        return f"保存配置失败: {str(e)}"
+
+
+def set_key_strategy(strategy: str):
+    """设置密钥选择策略"""
+    config_data = read_config_file()
+    config_data["key_strategy"] = strategy
+    try:
+        _write_config_file(config_data)
+        return f"密钥选择策略已设置为: {strategy}"
+    except Exception as e:
+        return f"保存配置失败: {str(e)}"
 
 
 def clear_api_key():
     """清除API密钥"""
     # 清除系统环境变量
-    if "DASHSCOPE_API_KEY" in os.environ:
-        del os.environ["DASHSCOPE_API_KEY"]
+    for name in ("DASHSCOPE_API_KEY", "DASHSCOPE_API_KEYS"):
+        if name in os.environ:
+            del os.environ[name]
 
     # 删除配置文件
     if CONFIG_FILE.exists():
@@ -0,0 +1,307 @@
+# key_pool.py
+"""
+API密钥池
+
+多个密钥共同分担限流额度：
+- 选择策略: round-robin / least-throttled / weighted
+- 429 后进入冷却期，401 后暂时移出池（EVICTION_TTL 后自动恢复，
+  `ag --config reset` 可立即恢复）
+- 使用统计和冷却状态保存在 ~/.ag-cli/key_stats.json（以密钥指纹为键，不保存明文），
+  多个进程可以共享冷却信息；stats_file 为 None 时只在进程内记录
+"""
+import atexit
+import hashlib
+import itertools
+import json
+import math
+import random
+import threading
+import time
+import weakref
+
+from .config import CONFIG_DIR, ensure_config_dir, mask_key
+
+KEY_STATS_FILE = CONFIG_DIR / "key_stats.json"
+
+KEY_STRATEGIES = ("round-robin", "least-throttled", "weighted")
+DEFAULT_KEY_STRATEGY = "round-robin"
+
+# 429 未返回 Retry-After 时的默认冷却时间（秒）
+DEFAULT_COOLDOWN = 30.0
+# 401 后移出池的时间（秒），避免一次偶发的 401 让密钥永久失效
+EVICTION_TTL = 3600.0
+
+# 响应头中表示剩余请求额度的字段
+REMAINING_HEADERS = ("x-ratelimit-remaining-requests", "x-ratelimit-remaining")
+
+
+def key_fingerprint(key):
+    """密钥指纹（用于统计文件，不保存明文）"""
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+class KeyState:
+    """单个密钥的健康状态与使用统计"""
+
+    __slots__ = (
+        "key",
+        "requests",
+        "throttles",
+        "failures",
+        "cooldown_until",
+        "last_throttled",
+        "remaining",
+        "evicted_until",
+    )
+
+    def __init__(self, key):
+        self.key = key
+        self.requests = 0
+        self.throttles = 0
+        self.failures = 0
+        self.cooldown_until = 0.0
+        self.last_throttled = 0.0
+        self.remaining = None
+        self.evicted_until = 0.0
+
+    @property
+    def masked(self):
+        return mask_key(self.key)
+
+    @property
+    def fingerprint(self):
+        return key_fingerprint(self.key)
+
+    def is_evicted(self, now=None):
+        now = now if now is not None else time.time()
+        return self.evicted_until > now
+
+    def is_available(self, now=None):
+        now = now if now is not None else time.time()
+        return not self.is_evicted(now) and self.cooldown_until <= now
+
+    def status(self, now=None):
+        """状态描述"""
+        now = now if now is not None else time.time()
+        if self.is_evicted(now):
+            return f"已失效({self.evicted_until - now:.0f}s后重试)"
+        if self.cooldown_until > now:
+            return f"冷却中({self.cooldown_until - now:.0f}s)"
+        return "正常"
+
+
+# 退出时统一写出所有密钥池的统计（只注册一次 atexit）
+_live_pools = weakref.WeakSet()
+
+
+def _flush_all():
+    for pool in list(_live_pools):
+        pool.flush()
+
+
+atexit.register(_flush_all)
+
+
+class KeyPool:
+    """API密钥池"""
+
+    def __init__(self, keys, strategy=DEFAULT_KEY_STRATEGY, stats_file=KEY_STATS_FILE):
+        if not keys:
+            raise ValueError("API key pool cannot be empty")
+        if strategy not in KEY_STRATEGIES:
+            raise ValueError(f"Unknown key strategy: {strategy}")
+        self.strategy = strategy
+        self.stats_file = stats_file
+        self.states = [KeyState(key) for key in keys]
+        self._lock = threading.Lock()
+        # 随机起点，避免多个进程同时从第一个密钥开始轮询
+        start = random.randrange(len(self.states))
+        order = list(range(start, len(self.states))) + list(range(start))
+        self._cycle = itertools.cycle(order)
+        # 本进程内的计数增量，退出时合并写入统计文件
+        self._deltas = {}
+        self._load_shared_state()
+        _live_pools.add(self)
+
+    def _load_shared_state(self):
+        """读取其他进程记录的冷却/失效状态"""
+        if self.stats_file is None:
+            return
+        stats = load_key_stats(self.stats_file)
+        for state in self.states:
+            record = stats.get(state.fingerprint)
+            if record:
+                state.cooldown_until = record.get("cooldown_until", 0.0)
+                state.last_throttled = record.get("last_throttled", 0.0)
+                # 旧版本的永久失效标记（evicted: true）不再沿用
+                state.evicted_until = record.get("evicted_until", 0.0)
+
+    def _delta(self, state):
+        return self._deltas.setdefault(
+            state.fingerprint, {"requests": 0, "throttles": 0, "failures": 0}
+        )
+
+    def select(self):
+        """按策略选择一个可用的密钥"""
+        with self._lock:
+            now = time.time()
+            available = [state for state in self.states if state.is_available(now)]
+            if not available:
+                alive = [state for state in self.states if not state.is_evicted(now)]
+                if not alive:
+                    retry = min(state.evicted_until for state in self.states) - now
+                    raise ValueError(
+                        f"所有API密钥均已失效（401），{math.ceil(retry / 60)} 分钟后自动重试；"
+                        "确认密钥有效后可运行 'ag --config reset' 立即恢复"
+                    )
+                # 全部冷却中时选择最早结束冷却的密钥
+                return min(alive, key=lambda state: state.cooldown_until)
+
+            if self.strategy == "round-robin":
+                while True:
+                    state = self.states[next(self._cycle)]
+                    if state.is_available(now):
+                        return state
+
+            if self.strategy == "least-throttled":
+                return min(
+                    available, key=lambda state: (state.last_throttled, state.requests)
+                )
+
+            # weighted: 按响应头中的剩余额度加权，尚未得知额度的密钥权重为 1
+            weights = [
+                max(state.remaining, 0.01) if state.remaining is not None else 1.0
+                for state in available
+            ]
+            return random.choices(available, weights=weights)[0]
+
+    def report_success(self, state, headers=None):
+        """记录一次成功请求，并读取剩余额度"""
+        with self._lock:
+            state.requests += 1
+            self._delta(state)["requests"] += 1
+            if headers:
+                for name in REMAINING_HEADERS:
+                    value = headers.get(name)
+                    if value is not None:
+                        try:
+                            state.remaining = float(value)
+                        except ValueError:
+                            pass
+                        break
+
+    def report_throttle(self, state, retry_after=None):
+        """429：进入冷却期"""
+        try:
+            cooldown = float(retry_after) if retry_after else DEFAULT_COOLDOWN
+        except ValueError:
+            cooldown = DEFAULT_COOLDOWN
+        with self._lock:
+            now = time.time()
+            state.requests += 1
+            state.throttles += 1
+            state.last_throttled = now
+            state.cooldown_until = now + cooldown
+            delta = self._delta(state)
+            delta["requests"] += 1
+            delta["throttles"] += 1
+        # 立即写出，让其他进程尽快看到冷却状态
+        self.flush()
+
+    def report_unauthorized(self, state):
+        """401：在 EVICTION_TTL 内移出池"""
+        with self._lock:
+            state.requests += 1
+            state.failures += 1
+            state.evicted_until = time.time() + EVICTION_TTL
+            delta = self._delta(state)
+            delta["requests"] += 1
+            delta["failures"] += 1
+        self.flush()
+
+    def flush(self):
+        """把计数增量和健康状态合并写入统计文件"""
+        with self._lock:
+            deltas, self._deltas = self._deltas, {}
+            if not deltas or self.stats_file is None:
+                return
+            snapshot = [
+                (
+                    state.fingerprint,
+                    state.masked,
+                    state.cooldown_until,
+                    state.last_throttled,
+                    state.evicted_until,
+                )
+                for state in self.states
+            ]
+        try:
+            stats = load_key_stats(self.stats_file)
+            for (
+                fingerprint,
+                masked,
+                cooldown_until,
+                last_throttled,
+                evicted_until,
+            ) in snapshot:
+                record = stats.setdefault(
+                    fingerprint, {"requests": 0, "throttles": 0, "failures": 0}
+                )
+                for name, value in deltas.get(fingerprint, {}).items():
+                    record[name] = record.get(name, 0) + value
+                record["masked"] = masked
+                record["cooldown_until"] = max(
+                    cooldown_until, record.get("cooldown_until", 0.0)
+                )
+                record["last_throttled"] = max(
+                    last_throttled, record.get("last_throttled", 0.0)
+                )
+                record["evicted_until"] = max(
+                    evicted_until, record.get("evicted_until", 0.0)
+                )
+                record.pop("evicted", None)
+            _write_key_stats(stats, self.stats_file)
+        except OSError:
+            # 统计信息写入失败不影响请求
+            pass
+
+
+def _write_key_stats(stats, stats_file):
+    if stats_file == KEY_STATS_FILE:
+        ensure_config_dir()
+    tmp = stats_file.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(stats, f, indent=2, ensure_ascii=False)
+    tmp.replace(stats_file)
+
+
+def reset_key_state(key=None, stats_file=KEY_STATS_FILE):
+    """
+    清除冷却/失效状态，返回清除的密钥数
+
+    key 为 None 时清除所有密钥（ag --config reset），否则只清除该密钥（重新添加时）
+    """
+    stats = load_key_stats(stats_file)
+    if key is None:
+        records = list(stats.values())
+    else:
+        records = [stats[key_fingerprint(key)]] if key_fingerprint(key) in stats else []
+    for record in records:
+        record["cooldown_until"] = 0.0
+        record["evicted_until"] = 0.0
+        record.pop("evicted", None)
+    if records:
+        try:
+            _write_key_stats(stats, stats_file)
+        except OSError:
+            pass
+    return len(records)
+
+
+def load_key_stats(stats_file=KEY_STATS_FILE):
+    """读取密钥使用统计 {fingerprint: {...}}"""
+    try:
+        with open(stats_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
@@ -1,10 +1,47 @@
 # 修改main.py，处理load_config抛出的异常
 import argparse
+import importlib
+import sys
+import time
+from .utils.tracing import PROCESS_START, tracer, span
 from .api_client import DeepSeekClient
+from .key_pool import KEY_STRATEGIES
 from rich.console import Console
 from .utils.models import list_models
 from .cli.commands import continuous_chat, single_chat
-from .config import get_config_dir_path, get_config_file_path
+from .chat.reasoning import REASONING_MODES
+from .chat.sampling import SAMPLE_MODES
+from .utils.catalog import complete_model, refresh_in_background, validate_model
+from .utils.completion import COMPLETION_SHELLS
+from .config import get_config_dir_path, get_config_file_path, get_model_aliases
+
+# 子命令: 名称 -> (模块, 入口函数)
+SUBCOMMANDS = {
+    "bench": (".cli.bench", "bench_main"),
+    "stats": (".cli.stats", "stats_main"),
+}
+
+# 模块导入完成时间（用于 --profile 的导入阶段统计）
+_MAIN_IMPORTED = time.perf_counter()
+
+
+class VersionAction(argparse.Action):
+    """--version：执行时才读取已安装包的版本，不影响正常启动时间"""
+
+    def __init__(self, option_strings, dest=argparse.SUPPRESS, help=None):
+        super().__init__(
+            option_strings, dest=dest, default=argparse.SUPPRESS, nargs=0, help=help
+        )
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        from importlib.metadata import PackageNotFoundError, version
+
+        try:
+            current = version("ag-cli")
+        except PackageNotFoundError:
+            current = "(未安装，从源码运行)"
+        print(f"ag {current}")
+        parser.exit()
 
 
 def config_handler(args):
@@ -13,22 +50,30 @@ def config_handler(args):
 
     # 创建一个简单的命名空间对象来模拟原来的args
     class ConfigArgs:
-        def __init__(self, action, api_key=None):
+        def __init__(self, action, api_key=None, key_strategy=None):
             self.action = action
             self.api_key = api_key
+            self.key_strategy = key_strategy
 
-    config_args = ConfigArgs(args.config_action, args.api_key)
+    config_args = ConfigArgs(args.config_action, args.api_key, args.key_strategy)
     config_command(config_args)
 
 
 def main():
     """主函数"""
+    # 子命令：ag bench ... / ag stats ...
+    if len(sys.argv) > 1 and sys.argv[1] in SUBCOMMANDS:
+        module_name, function = SUBCOMMANDS[sys.argv[1]]
+        module = importlib.import_module(module_name, __package__)
+        return getattr(module, function)(sys.argv[2:])
+
     parser = argparse.ArgumentParser(
         description="Multi LLM Chat In Console.(Using DashScope API)"
     )
 
     # 主要参数：问题
     parser.add_argument("question", nargs="*", help="Input question for AI")
+    parser.add_argument("--version", action=VersionAction, help="显示版本号并退出")
 
     # 模型选项
     parser.add_argument(
@@ -58,16 +103,130 @@ def main():
         help="禁用美化输出（纯文本模式，适合重定向到文件）",
     )
 
+    # Best-of-N 采样选项
+    sampling_group = parser.add_argument_group("Best-of-N采样")
+    sampling_group.add_argument(
+        "-n",
+        "--samples",
+        type=int,
+        default=1,
+        help="并发生成N个候选并由本地评分器选出一个（仅单次对话）",
+    )
+    sampling_group.add_argument(
+        "--scorer",
+        type=str,
+        default="vote",
+        help="评分器: vote(最终答案多数投票), code(代码块可编译), json(合法JSON), "
+        "longest(最长回答), 或 '模块:属性' 自定义评分器",
+    )
+    sampling_group.add_argument(
+        "--sample-mode",
+        choices=SAMPLE_MODES,
+        default="parallel",
+        help="parallel(并行请求) 或 n(单次请求带n参数，需接口支持)",
+    )
+    sampling_group.add_argument(
+        "--early-exit",
+        action="store_true",
+        help="结果已确定（候选通过评分或投票过半数）后取消其余候选",
+    )
+    sampling_group.add_argument(
+        "--diff", action="store_true", help="显示其余候选与选中结果的差异"
+    )
+
+    # 发送前压缩大段粘贴内容
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="发送前压缩用户消息（去除ANSI转义、折叠重复日志行、多余空白），"
+        "历史中保留原文",
+    )
+
+    # 历史对话检索选项
+    search_group = parser.add_argument_group("历史检索")
+    search_group.add_argument(
+        "--search",
+        type=str,
+        metavar="QUERY",
+        default=None,
+        help="全文搜索以往的对话（按相关度排序并高亮命中）",
+    )
+    search_group.add_argument(
+        "--recall",
+        type=int,
+        metavar="K",
+        default=0,
+        help="新对话开始时把最相关的K条历史对话片段注入上下文",
+    )
+    search_group.add_argument(
+        "--search-purge",
+        action="store_true",
+        help="删除全文搜索索引（~/.ag-cli/search.db）",
+    )
+
+    # 推理内容显示选项（r1 等推理模型）
+    parser.add_argument(
+        "--reasoning",
+        choices=REASONING_MODES,
+        default="show",
+        help="推理模型思考过程的显示方式: show(实时显示), summary(仅摘要), hide(隐藏)",
+    )
+
+    # Agent 模式选项
+    agent_group = parser.add_argument_group("Agent模式")
+    agent_group.add_argument(
+        "--agent",
+        action="store_true",
+        help="启用Agent模式（模型可调用读取文件、grep等工具）",
+    )
+    agent_group.add_argument(
+        "--allow-shell",
+        action="store_true",
+        help="允许Agent执行shell命令（在 bwrap/unshare 隔离环境中运行，都不可用时逐条确认）",
+    )
+    agent_group.add_argument(
+        "--tool-workers", type=int, default=4, help="并发执行工具的最大线程数"
+    )
+    agent_group.add_argument(
+        "--tool-timeout", type=int, default=30, help="单个工具调用超时（秒）"
+    )
+
+    # 监视模式选项
+    watch_group = parser.add_argument_group("监视模式")
+    watch_group.add_argument(
+        "--watch",
+        "-w",
+        type=str,
+        metavar="PATH",
+        default=None,
+        help="监视文件，每次保存后针对问题重新回答（后续轮次只发送差异）",
+    )
+    watch_group.add_argument(
+        "--poll-interval", type=float, default=0.3, help="监视文件的轮询间隔（秒）"
+    )
+    watch_group.add_argument(
+        "--debounce",
+        type=float,
+        default=0.5,
+        help="文件停止变化多久后才发送请求（秒）",
+    )
+
     # 配置管理选项
     config_group = parser.add_argument_group("配置管理")
     config_group.add_argument(
         "--config",
-        choices=["set", "get", "clear"],
+        choices=["set", "get", "clear", "add", "remove", "reset"],
         dest="config_action",
-        help="配置操作: set(设置), get(查看), clear(清除)",
+        help="配置操作: set(设置), get(查看), clear(清除), add/remove(密钥池增删), "
+        "reset(清除密钥的冷却/失效状态)",
     )
     config_group.add_argument(
-        "--api-key", type=str, help="API密钥（仅--config set时使用）"
+        "--api-key", type=str, help="API密钥（--config set/add/remove时使用）"
+    )
+    config_group.add_argument(
+        "--key-strategy",
+        choices=KEY_STRATEGIES,
+        help="密钥池选择策略（--config set时使用）",
     )
 
     # 模型列表选项
@@ -77,8 +236,76 @@ def main():
         action="store_true",
         help="List all supported model aliases",
     )
+    parser.add_argument(
+        "--refresh-models",
+        action="store_true",
+        help="强制从接口刷新模型目录缓存（与--list-models一起使用）",
+    )
+    parser.add_argument(
+        "--completion",
+        choices=COMPLETION_SHELLS,
+        help='输出 shell 补全脚本，如 eval "$(ag --completion bash)"',
+    )
+    # shell 补全使用：输出匹配前缀的模型名
+    parser.add_argument(
+        "--complete-model", type=str, metavar="PREFIX", help=argparse.SUPPRESS
+    )
+
+    # 性能分析选项
+    profile_group = parser.add_argument_group("性能分析")
+    profile_group.add_argument(
+        "--profile",
+        type=str,
+        metavar="TRACE_JSON",
+        default=None,
+        help="记录各阶段耗时并写出 Chrome/Perfetto trace JSON",
+    )
+    profile_group.add_argument(
+        "--profile-cprofile",
+        type=str,
+        metavar="PROF_FILE",
+        default=None,
+        help="同时写出 cProfile 统计文件（需与--profile一起使用）",
+    )
 
     args = parser.parse_args()
+    if args.profile_cprofile and not args.profile:
+        parser.error("--profile-cprofile 需要与 --profile 一起使用")
+
+    if args.completion:
+        from .utils.completion import completion_script
+
+        print(completion_script(args.completion, parser, SUBCOMMANDS), end="")
+        return
+
+    if not args.profile:
+        run(args)
+        return
+
+    # 启用追踪：导入阶段在解析参数前已完成，补记为区间
+    tracer.enable()
+    tracer.complete("imports", PROCESS_START, _MAIN_IMPORTED)
+
+    profiler = None
+    if args.profile_cprofile:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    try:
+        with span("main"):
+            run(args)
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(args.profile_cprofile)
+        tracer.write(args.profile)
+        Console(stderr=True).print(f"[cyan]📊 追踪文件已写出: {args.profile}[/cyan]")
+
+
+def run(args):
+    """根据解析后的参数执行命令"""
     console = Console()
 
     # 处理配置命令（优先级最高）
@@ -87,10 +314,40 @@ def main():
         return
 
     # 如果请求列出模型，则显示模型列表并退出
-    if args.list_models:
-        list_models()
+    if args.list_models or args.refresh_models:
+        list_models(refresh=args.refresh_models)
+        return
+
+    if args.complete_model is not None:
+        for name in complete_model(args.complete_model, get_model_aliases()):
+            print(name)
+        return
+
+    if args.search_purge:
+        from .search import INDEX_FILE, purge_index
+
+        if purge_index():
+            console.print(f"[green]🗑️ 已删除搜索索引: {INDEX_FILE}[/green]")
+        else:
+            console.print("[yellow]📭 没有搜索索引[/yellow]")
         return
 
+    # 搜索历史对话（无需API密钥）
+    if args.search is not None:
+        from .search import show_search
+
+        show_search(console, args.search, use_pretty=not args.no_pretty)
+        return
+
+    # 使用本地缓存的模型目录校验模型名称，避免无效请求
+    if args.model:
+        try:
+            validate_model(args.model, get_model_aliases())
+        except ValueError as e:
+            console.print(f"[red]✖️ {str(e)}[/red]")
+            console.print("[cyan]💡 使用 'ag -l' 查看可用模型[/cyan]")
+            return
+
     # 确定美化模式
     if args.no_pretty:
         use_pretty = False
@@ -98,12 +355,15 @@ def main():
         use_pretty = True
     else:
         # 默认行为：连续对话启用美化，单次对话禁用美化
-        use_pretty = args.continuous or not args.question
+        use_pretty = (
+            args.continuous or args.agent or bool(args.watch) or not args.question
+        )
 
     # 主聊天功能
     try:
         # 创建API客户端时传递美化模式参数
-        client = DeepSeekClient(use_pretty=use_pretty)
+        with span("client.init"):
+            client = DeepSeekClient(use_pretty=use_pretty)
     except ValueError as e:
         # 处理缺少API密钥的情况
         console.print(f"[red]✖️ {str(e)}[/red]")
@@ -111,16 +371,108 @@ def main():
         console.print(f"[cyan]📄 配置文件: {get_config_file_path()}[/cyan]")
         return
 
+    # 模型目录缓存为空或过期时在后台刷新，供之后的 -m 校验和补全使用
+    refresh_in_background(client.config["api_key"], client.config["base_url"])
+
+    if args.samples > 1 and (args.agent or args.watch):
+        console.print("[yellow]⚠️ -n 不支持Agent/监视模式，已忽略[/yellow]")
+
+    if args.agent:
+        from .agent.session import agent_chat
+
+        agent_chat(
+            client,
+            console,
+            " ".join(args.question) if args.question else None,
+            args.model,
+            use_pretty,
+            allow_shell=args.allow_shell,
+            max_workers=args.tool_workers,
+            tool_timeout=args.tool_timeout,
+        )
+        return
+
+    if args.watch:
+        from .cli.commands import watch_chat
+
+        if not args.question:
+            console.print("[red]✖️ 监视模式需要提供问题/指令[/red]")
+            return
+        watch_chat(
+            client,
+            console,
+            args.watch,
+            " ".join(args.question),
+            args.model,
+            use_pretty,
+            reasoning_mode=args.reasoning,
+            poll_interval=args.poll_interval,
+            debounce=args.debounce,
+        )
+        return
+
+    if args.samples > 1:
+        if args.continuous or not args.question:
+            console.print("[yellow]⚠️ -n 仅支持单次对话，已忽略[/yellow]")
+        else:
+            from .chat.scorers import get_scorer
+            from .chat.sampling import best_of_n_chat
+            from .chat.interface import ChatInterface
+
+            try:
+                scorer = get_scorer(args.scorer)
+            except (ValueError, ImportError, AttributeError) as e:
+                console.print(f"[red]✖️ {str(e)}[/red]")
+                return
+            if args.early_exit and not getattr(scorer, "supports_early_exit", True):
+                console.print(
+                    f"[red]✖️ 评分器 {args.scorer} 需要比较全部候选，"
+                    "不能与 --early-exit 一起使用[/red]"
+                )
+                return
+            best_of_n_chat(
+                client,
+                console,
+                " ".join(args.question),
+                scorer,
+                args.samples,
+                model=args.model,
+                use_pretty=use_pretty,
+                mode=args.sample_mode,
+                early_exit=args.early_exit,
+                show_diff=args.diff,
+                system_prompt=ChatInterface.system_prompt,
+            )
+            return
+
     # 判断是否启用连续对话
     if args.continuous or not args.question:
         # 连续对话模式
         initial_question = " ".join(args.question) if args.question else None
-        continuous_chat(client, console, args.model, initial_question, use_pretty)
+        continuous_chat(
+            client,
+            console,
+            args.model,
+            initial_question,
+            use_pretty,
+            reasoning_mode=args.reasoning,
+            compact=args.compact,
+            recall=args.recall,
+        )
     else:
         # 单次对话模式
         question = " ".join(args.question)
-        single_chat(client, console, question, args.model, use_pretty)
+        single_chat(
+            client,
+            console,
+            question,
+            args.model,
+            use_pretty,
+            reasoning_mode=args.reasoning,
+            compact=args.compact,
+            recall=args.recall,
+        )
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,365 @@
+# search.py
+"""
+历史对话全文检索
+
+开启后每轮对话完成后把问题和回答写入 ~/.ag-cli/search.db（SQLite FTS5）：
+- 中日文按字切分（字之间插入零宽空格，unicode61 分词器将其视为分隔符），
+  英文使用 porter 词干，查询时按 bm25 排序，问题列权重更高
+- SQLite 不支持 FTS5 时退化为普通表 + LIKE 查询，在 Python 中计分
+- 支持 `ag --search`、连续对话中的 `.search` 命令，以及 `--recall K`
+  在新对话开始时注入最相关的 K 条历史片段
+索引保存对话正文，与 analytics_bodies 一样默认关闭：配置 search_index: true
+或环境变量 AG_SEARCH_INDEX=1 开启（AG_SEARCH_INDEX=0 优先关闭），
+`ag --search-purge` 删除已有索引
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from rich.text import Text
+
+from .config import CONFIG_DIR, ensure_config_dir, read_config_file
+
+INDEX_FILE = CONFIG_DIR / "search.db"
+
+# 单个字段最多索引的字符数（超大粘贴只索引开头部分）
+MAX_INDEX_CHARS = 100_000
+# 搜索结果默认条数
+DEFAULT_LIMIT = 10
+# 注入上下文时每条历史片段的最大字符数
+RECALL_PROMPT_CHARS = 300
+RECALL_RESPONSE_CHARS = 1200
+# 注入上下文时最多使用的查询词数
+RECALL_TERMS = 32
+
+CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+CJK_RE = re.compile(f"([{CJK}])")
+TERM_RE = re.compile(f"[{CJK}]+|[^\\W_{CJK}]+")
+SEPARATOR = "\u200b"
+
+# snippet() 的高亮标记
+MARK_START = "\x02"
+MARK_END = "\x03"
+MARK_RE = re.compile(f"{MARK_START}(.*?){MARK_END}", re.S)
+
+FTS_SCHEMA = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS turns USING fts5("
+    "prompt, response, ts UNINDEXED, model UNINDEXED, mode UNINDEXED, "
+    "session UNINDEXED, tokenize='porter unicode61 remove_diacritics 2')"
+)
+PLAIN_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS turns_plain("
+    "prompt TEXT, response TEXT, ts REAL, model TEXT, mode TEXT, session TEXT)"
+)
+
+
+def segment(text):
+    """在中日文字符两侧插入零宽空格，使每个字成为一个词"""
+    return CJK_RE.sub(f"{SEPARATOR}\\1{SEPARATOR}", text)
+
+
+def unsegment(text):
+    return text.replace(SEPARATOR, "")
+
+
+def _phrase(term):
+    """把一个词转成 FTS5 短语（中日文按字组成短语）"""
+    return '"' + segment(term).replace('"', '""') + '"'
+
+
+def query_terms(text):
+    """提取查询词：英文单词和连续的中日文片段"""
+    return TERM_RE.findall(text.lower())
+
+
+def build_query(text, any_term=False):
+    """
+    把普通文本转成 FTS5 查询
+
+    默认所有词都需要出现；any_term 为 True 时任一词出现即可（用于召回），
+    此时中日文片段拆成二元组，避免整句作为短语无法命中
+    """
+    terms = query_terms(text)
+    if not any_term:
+        return " ".join(_phrase(term) for term in terms)
+
+    phrases = []
+    for term in terms:
+        if CJK_RE.match(term) and len(term) > 2:
+            phrases.extend(term[i : i + 2] for i in range(len(term) - 1))
+        elif len(term) > 1 or CJK_RE.match(term):
+            phrases.append(term)
+    phrases = list(dict.fromkeys(phrases))[:RECALL_TERMS]
+    return " OR ".join(_phrase(phrase) for phrase in phrases)
+
+
+class SearchHit:
+    """一条搜索结果"""
+
+    __slots__ = ("ts", "model", "mode", "prompt", "response", "score")
+
+    def __init__(self, ts, model, mode, prompt, response, score):
+        self.ts = ts
+        self.model = model
+        self.mode = mode
+        # 已插入高亮标记的片段（recall 时为完整正文）
+        self.prompt = prompt
+        self.response = response
+        self.score = score
+
+
+class SearchIndex:
+    """对话全文索引"""
+
+    def __init__(self, path=None):
+        self.path = path or INDEX_FILE
+        self.session = uuid.uuid4().hex[:12]
+        self._lock = threading.Lock()
+        self._conn = None
+        self.fts = True
+
+    def _connect(self):
+        if self._conn is None:
+            if self.path == INDEX_FILE:
+                ensure_config_dir()
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            try:
+                conn.execute(FTS_SCHEMA)
+            except sqlite3.OperationalError:
+                # 当前 SQLite 未编译 FTS5
+                self.fts = False
+                conn.execute(PLAIN_SCHEMA)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def add(self, prompt, response, model=None, mode=None, ts=None):
+        """索引一轮对话"""
+        prompt = (prompt or "")[:MAX_INDEX_CHARS]
+        response = (response or "")[:MAX_INDEX_CHARS]
+        row = (ts or time.time(), model or "", mode or "", self.session)
+        with self._lock:
+            conn = self._connect()
+            if self.fts:
+                conn.execute(
+                    "INSERT INTO turns(prompt, response, ts, model, mode, session) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (segment(prompt), segment(response), *row),
+                )
+            else:
+                conn.execute(
+                    "INSERT INTO turns_plain VALUES (?, ?, ?, ?, ?, ?)",
+                    (prompt, response, *row),
+                )
+            conn.commit()
+
+    def search(self, query, limit=DEFAULT_LIMIT, any_term=False, full=False):
+        """
+        按相关度返回 SearchHit 列表
+
+        full 为 False 时返回带高亮标记的片段，为 True 时返回完整正文
+        """
+        match = build_query(query, any_term)
+        if not match:
+            return []
+        with self._lock:
+            conn = self._connect()
+            if not self.fts:
+                return _search_plain(conn, query, limit, any_term, full)
+            if full:
+                columns = "prompt, response"
+            else:
+                columns = (
+                    f"snippet(turns, 0, '{MARK_START}', '{MARK_END}', '…', 16), "
+                    f"snippet(turns, 1, '{MARK_START}', '{MARK_END}', '…', 32)"
+                )
+            rows = conn.execute(
+                f"SELECT ts, model, mode, {columns}, bm25(turns, 2.0, 1.0) AS rank "
+                "FROM turns WHERE turns MATCH ? ORDER BY rank LIMIT ?",
+                (match, limit),
+            ).fetchall()
+        return [
+            SearchHit(ts, model, mode, unsegment(prompt), unsegment(response), -rank)
+            for ts, model, mode, prompt, response, rank in rows
+        ]
+
+    def __len__(self):
+        with self._lock:
+            conn = self._connect()
+            table = "turns" if self.fts else "turns_plain"
+            return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def _plain_snippet(text, terms, width):
+    """在普通文本中截取第一个命中附近的片段并插入高亮标记"""
+    lower = text.lower()
+    positions = [lower.find(term) for term in terms]
+    positions = [p for p in positions if p >= 0]
+    start = max(0, min(positions) - width // 3) if positions else 0
+    piece = text[start : start + width]
+    pattern = re.compile("|".join(re.escape(term) for term in terms), re.I)
+    piece = pattern.sub(lambda m: f"{MARK_START}{m.group(0)}{MARK_END}", piece)
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if start + width < len(text) else ""
+    return prefix + piece.replace("\n", " ") + suffix
+
+
+def _search_plain(conn, query, limit, any_term, full):
+    """不支持 FTS5 时的退化实现：LIKE 过滤，按命中次数计分"""
+    terms = list(dict.fromkeys(query_terms(query)))
+    clause = " OR " if any_term else " AND "
+    where = clause.join("(prompt LIKE ? OR response LIKE ?)" for _ in terms)
+    params = [f"%{term}%" for term in terms for _ in range(2)]
+    rows = conn.execute(
+        f"SELECT ts, model, mode, prompt, response FROM turns_plain WHERE {where}",
+        params,
+    ).fetchall()
+
+    scored = []
+    for ts, model, mode, prompt, response in rows:
+        lower_prompt, lower_response = prompt.lower(), response.lower()
+        score = sum(
+            2 * lower_prompt.count(term) + lower_response.count(term) for term in terms
+        )
+        scored.append((score, ts, model, mode, prompt, response))
+    scored.sort(key=lambda row: (-row[0], -row[1]))
+
+    hits = []
+    for score, ts, model, mode, prompt, response in scored[:limit]:
+        if not full:
+            prompt = _plain_snippet(prompt, terms, 60)
+            response = _plain_snippet(response, terms, 120)
+        hits.append(SearchHit(ts, model, mode, prompt, response, score))
+    return hits
+
+
+def highlight(snippet, style="bold yellow"):
+    """把带高亮标记的片段转成 Rich Text"""
+    text = Text()
+    position = 0
+    for match in MARK_RE.finditer(snippet):
+        text.append(snippet[position : match.start()])
+        text.append(match.group(1), style=style)
+        position = match.end()
+    text.append(snippet[position:])
+    return text
+
+
+def _one_line(snippet):
+    return re.sub(r"\s+", " ", snippet).strip()
+
+
+def show_search(console, query, limit=DEFAULT_LIMIT, use_pretty=True):
+    """搜索历史对话并显示结果"""
+    index = get_index()
+    if index is None:
+        console.print(
+            '[yellow]⚠️ 搜索索引未开启（在配置文件中设置 "search_index": true '
+            "或环境变量 AG_SEARCH_INDEX=1）[/yellow]"
+        )
+        return []
+    started = time.perf_counter()
+    try:
+        hits = index.search(query, limit)
+    except sqlite3.Error as e:
+        console.print(f"[red]✖️ 搜索失败: {str(e)}[/red]")
+        return []
+    elapsed = (time.perf_counter() - started) * 1000
+
+    if not hits:
+        console.print(f"[yellow]📭 没有找到与 '{query}' 相关的历史对话[/yellow]")
+        return hits
+
+    for i, hit in enumerate(hits, 1):
+        when = datetime.fromtimestamp(hit.ts).strftime("%Y-%m-%d %H:%M")
+        header = Text(f"[{i}] {when} · {hit.model or '-'}", style="bold cyan")
+        if use_pretty:
+            header.append(f" · 相关度 {hit.score:.2f}", style="dim")
+        console.print(header)
+        console.print(Text("  问: ").append_text(highlight(_one_line(hit.prompt))))
+        console.print(Text("  答: ").append_text(highlight(_one_line(hit.response))))
+    console.print(
+        f"[dim]🔍 {len(hits)} 条结果，用时 {elapsed:.1f} ms[/dim]", highlight=False
+    )
+    return hits
+
+
+def _truncate(text, limit):
+    text = text.strip()
+    return text if len(text) <= limit else text[:limit] + "…"
+
+
+def recall_context(question, k):
+    """
+    检索与问题最相关的 k 条历史对话，返回 (注入后的问题, 命中列表)
+
+    没有命中或索引不可用时原样返回问题
+    """
+    index = get_index()
+    if index is None or k <= 0:
+        return question, []
+    try:
+        hits = index.search(question, k, any_term=True, full=True)
+    except sqlite3.Error:
+        return question, []
+    if not hits:
+        return question, []
+
+    parts = ["以下是之前对话中可能相关的内容，仅供参考，如不相关请忽略：\n"]
+    for i, hit in enumerate(hits, 1):
+        when = datetime.fromtimestamp(hit.ts).strftime("%Y-%m-%d")
+        parts.append(
+            f"[{i}] ({when}) 问: {_truncate(hit.prompt, RECALL_PROMPT_CHARS)}\n"
+            f"答: {_truncate(hit.response, RECALL_RESPONSE_CHARS)}\n"
+        )
+    parts.append(f"---\n当前问题: {question}")
+    return "\n".join(parts), hits
+
+
+_index = None
+
+
+def search_index_enabled():
+    """索引保存对话正文，只在显式开启时启用"""
+    env = os.environ.get("AG_SEARCH_INDEX")
+    if env is not None:
+        return env == "1"
+    return read_config_file().get("search_index", False) is True
+
+
+def get_index():
+    """返回进程内共享的索引对象，关闭索引时返回 None"""
+    global _index
+    if _index is None:
+        if not search_index_enabled():
+            return None
+        _index = SearchIndex()
+    return _index
+
+
+def purge_index(path=None):
+    """删除索引文件（含 WAL/SHM），返回删除的文件数"""
+    global _index
+    path = path or INDEX_FILE
+    if _index is not None and _index.path == path:
+        _index.close()
+        _index = None
+    removed = 0
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            path.with_name(path.name + suffix).unlink()
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
@@ -0,0 +1,208 @@
+# utils/catalog.py
+"""
+远程模型目录缓存
+
+从接口的 /models 获取模型列表并缓存到 ~/.ag-cli/models_cache.json，
+按 base_url 分别缓存，通过 ETag + TTL 重新验证。本地校验和补全 -m 参数时只读
+当前接口的缓存，不访问网络；对话时缓存过期会在后台线程中刷新。
+"""
+import difflib
+import json
+import threading
+import time
+
+from ag_cli.config import CONFIG_DIR, DEFAULT_BASE_URL, ensure_config_dir
+from ag_cli.utils.tracing import span
+
+CATALOG_FILE = CONFIG_DIR / "models_cache.json"
+
+# 缓存有效期（秒）
+CATALOG_TTL = 24 * 60 * 60
+
+# 接口未返回元数据时使用的已知模型信息
+KNOWN_MODEL_METADATA = {
+    "deepseek-v3.1": {"context_length": 131072, "reasoning": False},
+    "deepseek-v3": {"context_length": 65536, "reasoning": False},
+    "deepseek-r1": {"context_length": 65536, "reasoning": True},
+    "qwen3-max": {"context_length": 262144, "reasoning": False},
+    "qwq-plus": {"context_length": 131072, "reasoning": True},
+}
+
+# 根据模型名判断是否为推理模型的关键字
+REASONING_HINTS = ("-r1", "reasoner", "thinking", "qwq")
+
+# /models 返回中可能表示上下文长度的字段
+CONTEXT_LENGTH_FIELDS = ("context_length", "context_window", "max_context_length")
+
+# 进程内缓存，避免重复读取文件
+_catalog_cache = None
+# 后台刷新线程（每个进程最多一个）
+_refresh_thread = None
+
+
+def _model_metadata(entry):
+    """从 /models 的单个条目提取元数据"""
+    model_id = entry["id"]
+    metadata = dict(KNOWN_MODEL_METADATA.get(model_id, {}))
+    for field in CONTEXT_LENGTH_FIELDS:
+        if isinstance(entry.get(field), int):
+            metadata["context_length"] = entry[field]
+            break
+    metadata.setdefault("context_length", None)
+    metadata.setdefault(
+        "reasoning", any(hint in model_id.lower() for hint in REASONING_HINTS)
+    )
+    if entry.get("owned_by"):
+        metadata["owned_by"] = entry["owned_by"]
+    return metadata
+
+
+def _empty_entry():
+    return {"etag": None, "fetched_at": 0, "models": {}}
+
+
+def _load_file():
+    """读取缓存文件 {"endpoints": {base_url: 目录}}，兼容只缓存一个接口的旧格式"""
+    global _catalog_cache
+    if _catalog_cache is not None:
+        return _catalog_cache
+    try:
+        with open(CATALOG_FILE, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        data = {}
+    if "endpoints" not in data:
+        endpoints = {}
+        if data.get("base_url"):
+            endpoints[data.pop("base_url")] = data
+        data = {"endpoints": endpoints}
+    _catalog_cache = data
+    return _catalog_cache
+
+
+def load_catalog(base_url=DEFAULT_BASE_URL):
+    """读取 base_url 对应的本地模型目录，不存在时返回空目录"""
+    return _load_file()["endpoints"].get(base_url) or _empty_entry()
+
+
+def _save_catalog(base_url, catalog):
+    global _catalog_cache
+    ensure_config_dir()
+    data = _load_file()
+    data = {"endpoints": {**data["endpoints"], base_url: catalog}}
+    tmp = CATALOG_FILE.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    tmp.replace(CATALOG_FILE)
+    _catalog_cache = data
+
+
+def is_stale(catalog=None, ttl=CATALOG_TTL, base_url=DEFAULT_BASE_URL):
+    """缓存是否超过有效期"""
+    catalog = catalog or load_catalog(base_url)
+    return time.time() - catalog.get("fetched_at", 0) > ttl
+
+
+def refresh_catalog(api_key, base_url, force=False, timeout=10):
+    """
+    从 {base_url}/models 获取模型目录
+
+    缓存未过期时直接返回；过期时带 If-None-Match 重新验证，
+    服务端返回 304 只更新时间戳
+    """
+    import httpx
+
+    catalog = load_catalog(base_url)
+    if not force and not is_stale(catalog):
+        return catalog
+
+    headers = {"Authorization": f"Bearer {api_key}"}
+    if catalog.get("etag"):
+        headers["If-None-Match"] = catalog["etag"]
+
+    with span("catalog.refresh"):
+        response = httpx.get(
+            f"{base_url.rstrip('/')}/models", headers=headers, timeout=timeout
+        )
+
+    if response.status_code == 304:
+        catalog = {**catalog, "fetched_at": time.time()}
+        _save_catalog(base_url, catalog)
+        return catalog
+
+    response.raise_for_status()
+    entries = response.json().get("data", [])
+    catalog = {
+        "etag": response.headers.get("etag"),
+        "fetched_at": time.time(),
+        "models": {
+            entry["id"]: _model_metadata(entry) for entry in entries if "id" in entry
+        },
+    }
+    _save_catalog(base_url, catalog)
+    return catalog
+
+
+def refresh_in_background(api_key, base_url):
+    """
+    缓存为空或过期时在后台守护线程中刷新目录，不阻塞当前对话
+
+    失败时静默忽略，下次启动再试；进程退出时未完成的刷新直接放弃
+    """
+    global _refresh_thread
+    if _refresh_thread is not None or not is_stale(base_url=base_url):
+        return None
+
+    def refresh():
+        try:
+            refresh_catalog(api_key, base_url)
+        except Exception:
+            pass
+
+    _refresh_thread = threading.Thread(target=refresh, name="ag-catalog", daemon=True)
+    _refresh_thread.start()
+    return _refresh_thread
+
+
+def get_model_info(model_name, base_url=DEFAULT_BASE_URL):
+    """获取模型元数据（上下文长度、是否推理模型），只读本地缓存"""
+    info = load_catalog(base_url)["models"].get(model_name)
+    if info is not None:
+        return info
+    return _model_metadata({"id": model_name})
+
+
+def known_model_names(aliases, base_url=DEFAULT_BASE_URL):
+    """代称 + 代称指向的模型 + 当前接口缓存目录中的模型"""
+    names = set(aliases) | set(aliases.values())
+    names.update(load_catalog(base_url)["models"])
+    return sorted(names)
+
+
+def complete_model(prefix, aliases, base_url=DEFAULT_BASE_URL):
+    """返回以 prefix 开头的候选模型名（用于 shell 补全）"""
+    return [
+        name for name in known_model_names(aliases, base_url) if name.startswith(prefix)
+    ]
+
+
+def validate_model(model, aliases, base_url=DEFAULT_BASE_URL):
+    """
+    本地校验模型名称，返回实际模型名
+
+    只使用 base_url 对应接口的目录缓存；缓存为空时无法判断，直接放行；
+    名称未知时抛出 ValueError 并给出相近候选
+    """
+    actual = aliases.get(model, model)
+    models = load_catalog(base_url)["models"]
+    # 用户显式配置的代称视为有效
+    if not models or actual in models or model in aliases:
+        return actual
+
+    suggestions = difflib.get_close_matches(
+        model, known_model_names(aliases, base_url), n=3
+    )
+    message = f"未知模型: {model}"
+    if suggestions:
+        message += f"，你是否想使用: {', '.join(suggestions)}"
+    raise ValueError(message)
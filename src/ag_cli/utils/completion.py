@@ -0,0 +1,80 @@
+# utils/completion.py
+"""
+shell 补全脚本
+
+`ag --completion bash|zsh` 输出补全脚本，选项和可选值从 argparse 解析器生成，
+-m/--model 的候选通过 `ag --complete-model 前缀` 读取代称和本地模型目录缓存
+"""
+import argparse
+
+COMPLETION_SHELLS = ("bash", "zsh")
+
+BASH_TEMPLATE = """\
+# ag 命令补全，在 ~/.bashrc 中加入: eval "$(ag --completion bash)"
+_ag_complete() {{
+    local cur="${{COMP_WORDS[COMP_CWORD]}}"
+    local prev="${{COMP_WORDS[COMP_CWORD-1]}}"
+    case "$prev" in
+        -m|--model)
+            COMPREPLY=($(compgen -W "$(ag --complete-model "$cur" 2>/dev/null)" -- "$cur"))
+            return 0
+            ;;
+{choices}
+    esac
+    if [[ "$cur" == -* ]]; then
+        COMPREPLY=($(compgen -W "{options}" -- "$cur"))
+        return 0
+    fi
+    if [[ $COMP_CWORD -eq 1 ]]; then
+        COMPREPLY=($(compgen -W "{subcommands}" -- "$cur"))
+    fi
+}}
+complete -o default -F _ag_complete ag
+"""
+
+# zsh 通过 bashcompinit 复用 bash 补全函数
+ZSH_PREAMBLE = """\
+# ag 命令补全，在 ~/.zshrc 中加入: eval "$(ag --completion zsh)"
+autoload -U +X compinit && compinit
+autoload -U +X bashcompinit && bashcompinit
+"""
+
+
+def _choice_cases(parser):
+    """带 choices 的选项生成 case 分支"""
+    cases = []
+    for action in parser._actions:
+        if not action.option_strings or not action.choices:
+            continue
+        if action.help == argparse.SUPPRESS:
+            continue
+        words = " ".join(str(choice) for choice in action.choices)
+        cases.append(
+            f"        {'|'.join(action.option_strings)})\n"
+            f'            COMPREPLY=($(compgen -W "{words}" -- "$cur"))\n'
+            "            return 0\n"
+            "            ;;"
+        )
+    return "\n".join(cases)
+
+
+def completion_script(shell, parser, subcommands=()):
+    """生成指定 shell 的补全脚本"""
+    if shell not in COMPLETION_SHELLS:
+        raise ValueError(
+            f"不支持的 shell: {shell}（可选: {', '.join(COMPLETION_SHELLS)}）"
+        )
+    options = [
+        option
+        for action in parser._actions
+        if action.help != argparse.SUPPRESS
+        for option in action.option_strings
+    ]
+    script = BASH_TEMPLATE.format(
+        choices=_choice_cases(parser),
+        options=" ".join(options),
+        subcommands=" ".join(subcommands),
+    )
+    if shell == "zsh":
+        script = ZSH_PREAMBLE + script
+    return script
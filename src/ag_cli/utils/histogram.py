@@ -0,0 +1,108 @@
+# utils/histogram.py
+"""
+HDR 风格的对数-线性直方图
+
+数值按 scale 放大取整后（默认微秒）按 2 的幂分段，每段再线性细分为 SUB_BUCKETS/2 个桶，
+相对误差不超过 2/SUB_BUCKETS；内存与样本数量无关，可合并、可序列化
+"""
+import math
+
+# 每个 2 的幂区间细分的桶数（决定精度：128 -> 约 1.6%）
+SUB_BUCKET_BITS = 7
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+HALF_BUCKETS = SUB_BUCKETS >> 1
+
+
+def _index(value):
+    shift = max(0, value.bit_length() - SUB_BUCKET_BITS)
+    return shift * HALF_BUCKETS + (value >> shift)
+
+
+def _bounds(index):
+    """桶的 [下界, 上界) 微秒"""
+    if index < SUB_BUCKETS:
+        return index, index + 1
+    shift = index // HALF_BUCKETS - 1
+    mantissa = index - shift * HALF_BUCKETS
+    return mantissa << shift, (mantissa + 1) << shift
+
+
+class LogHistogram:
+    """
+    对数-线性直方图
+
+    scale: 记录值乘以 scale 后取整分桶，默认把秒级耗时按微秒记录
+    """
+
+    def __init__(self, scale=1_000_000):
+        self.scale = scale
+        self.counts = {}
+        self.total = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, value):
+        index = _index(max(0, int(value * self.scale)))
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def mean(self):
+        return self.sum / self.total if self.total else 0.0
+
+    def percentile(self, p):
+        """第 p 百分位，取桶中点并限制在实际最小/最大值之间"""
+        if not self.total:
+            return 0.0
+        rank = max(1, math.ceil(self.total * p / 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                low, high = _bounds(index)
+                value = (low + high) / 2 / self.scale
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def coarse_buckets(self, per_octave=4):
+        """
+        合并为每个 2 的幂区间 per_octave 个桶的 [(下界, 上界, 计数), ...]，用于终端显示
+        """
+        merged = {}
+        for index, count in self.counts.items():
+            low, _ = _bounds(index)
+            power = max(0, low.bit_length() - 1)
+            step = max(1, (1 << power) // per_octave)
+            bucket_low = low - (low - (1 << power)) % step if low else 0
+            key = (bucket_low, bucket_low + step if low else 1)
+            merged[key] = merged.get(key, 0) + count
+        return [
+            (low / self.scale, high / self.scale, count)
+            for (low, high), count in sorted(merged.items())
+        ]
+
+    def to_dict(self):
+        return {
+            "scale": self.scale,
+            "count": self.total,
+            "min": self.min if self.total else 0.0,
+            "max": self.max,
+            "mean": self.mean,
+            "percentiles": {f"p{p}": self.percentile(p) for p in (50, 90, 99, 99.9)},
+            # 精确桶：[下界, 上界, 计数]，数值为原始值乘以 scale
+            "buckets": [
+                [*_bounds(index), count] for index, count in sorted(self.counts.items())
+            ],
+        }
@@ -1,20 +1,67 @@
 # utils/models.py
+import time
 from rich.console import Console
 from rich.table import Table
-from ag_cli.config import load_config
+from ag_cli.config import DEFAULT_BASE_URL, get_api_key, get_model_aliases
+from ag_cli.utils.catalog import get_model_info, is_stale, load_catalog, refresh_catalog
 
 
-def list_models():
-    """列出所有支持的模型代称和实际名称"""
-    config = load_config()
-    model_mapping = config["model_mapping"]
+def _format_context(info):
+    length = info.get("context_length")
+    return f"{length // 1024}K" if length else "-"
 
+
+def _format_reasoning(info):
+    return "✅" if info.get("reasoning") else ""
+
+
+def list_models(refresh=False):
+    """列出所有支持的模型代称和实际名称（优先使用本地缓存的模型目录）"""
     console = Console()
+    model_mapping = get_model_aliases()
+
+    catalog = load_catalog()
+    if refresh or is_stale(catalog):
+        api_key = get_api_key()
+        if api_key:
+            try:
+                catalog = refresh_catalog(api_key, DEFAULT_BASE_URL, force=refresh)
+            except Exception as e:
+                console.print(f"[yellow]⚠️ 获取模型目录失败，使用本地缓存: {str(e)}[/yellow]")
+        elif refresh:
+            console.print("[yellow]⚠️ 未设置API密钥，无法刷新模型目录[/yellow]")
+
     table = Table(title="支持的模型代称", show_header=True, header_style="bold magenta")
     table.add_column("代称", style="cyan", width=10)
     table.add_column("实际模型名称", style="green")
+    table.add_column("上下文", justify="right")
+    table.add_column("推理", justify="center")
 
     for alias, actual_name in model_mapping.items():
-        table.add_row(alias, actual_name)
+        info = get_model_info(actual_name)
+        table.add_row(alias, actual_name, _format_context(info), _format_reasoning(info))
 
     console.print(table)
+
+    models = catalog["models"]
+    if not models:
+        console.print("[dim]💡 使用 'ag -l --refresh-models' 获取远程模型目录[/dim]")
+        return
+
+    remote = Table(
+        title=f"远程模型目录（{len(models)} 个）",
+        show_header=True,
+        header_style="bold magenta",
+    )
+    remote.add_column("模型", style="green")
+    remote.add_column("上下文", justify="right")
+    remote.add_column("推理", justify="center")
+    for name in sorted(models):
+        info = models[name]
+        remote.add_row(name, _format_context(info), _format_reasoning(info))
+    console.print(remote)
+
+    fetched_at = time.strftime(
+        "%Y-%m-%d %H:%M:%S", time.localtime(catalog.get("fetched_at", 0))
+    )
+    console.print(f"[dim]📦 模型目录缓存于 {fetched_at}[/dim]")
@@ -0,0 +1,172 @@
+# utils/stub_server.py
+"""
+本地 OpenAI 兼容桩服务（仅标准库）
+
+用于 ag bench --stub：在本机端口上模拟 /chat/completions 的 SSE 流式响应，
+首 token 延迟、token 间隔、输出长度和错误率均可配置，无需网络即可压测
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STUB_MODEL = "ag-stub"
+STUB_API_KEY = "sk-ag-bench-stub"
+
+
+class StubSettings:
+    """桩服务的延迟与错误配置"""
+
+    __slots__ = ("ttft", "itl", "tokens", "error_rate", "jitter")
+
+    def __init__(self, ttft=0.05, itl=0.005, tokens=64, error_rate=0.0, jitter=0.2):
+        self.ttft = ttft
+        self.itl = itl
+        self.tokens = tokens
+        self.error_rate = error_rate
+        # 延迟的随机抖动比例
+        self.jitter = jitter
+
+    def delay(self, base):
+        return max(0.0, base * (1 + random.uniform(-self.jitter, self.jitter)))
+
+
+def _chunk(created, delta=None, finish_reason=None, usage=None):
+    payload = {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion.chunk",
+        "created": created,
+        "model": STUB_MODEL,
+        "choices": (
+            []
+            if delta is None
+            else [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        ),
+    }
+    if usage is not None:
+        payload["usage"] = usage
+    return f"data: {json.dumps(payload)}\n\n".encode("utf-8")
+
+
+def _make_handler(settings):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, payload, headers=None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/models"):
+                self._send_json(
+                    200,
+                    {"object": "list", "data": [{"id": STUB_MODEL, "object": "model"}]},
+                )
+            else:
+                self._send_json(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "not found"}})
+                return
+
+            if settings.error_rate and random.random() < settings.error_rate:
+                status = random.choice((429, 500, 503))
+                headers = {"Retry-After": "0"} if status == 429 else None
+                self._send_json(
+                    status,
+                    {"error": {"message": f"stub error {status}", "code": status}},
+                    headers,
+                )
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            created = int(time.time())
+            prompt_tokens = sum(
+                len(str(message.get("content", ""))) // 4 + 1
+                for message in request.get("messages", [])
+            )
+            try:
+                time.sleep(settings.delay(settings.ttft))
+                self._write(_chunk(created, {"role": "assistant", "content": ""}))
+                for i in range(settings.tokens):
+                    if i:
+                        time.sleep(settings.delay(settings.itl))
+                    self._write(_chunk(created, {"content": f"tok{i} "}))
+                self._write(_chunk(created, {}, finish_reason="stop"))
+                if request.get("stream_options", {}).get("include_usage"):
+                    usage = {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": settings.tokens,
+                        "total_tokens": prompt_tokens + settings.tokens,
+                    }
+                    self._write(_chunk(created, usage=usage))
+                self._write(b"data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                # 客户端取消了请求
+                pass
+
+        def _write(self, data):
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+    return StubHandler
+
+
+class _StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # 高并发压测时避免 listen 队列溢出
+    request_queue_size = 512
+
+    def handle_error(self, request, client_address):
+        # 客户端关闭 keep-alive 连接属于正常情况，不打印堆栈
+        pass
+
+
+class StubServer:
+    """在后台线程运行的桩服务，可用作上下文管理器"""
+
+    def __init__(self, settings=None, host="127.0.0.1", port=0):
+        self.settings = settings or StubSettings()
+        self.httpd = _StubHTTPServer((host, port), _make_handler(self.settings))
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self.httpd.serve_forever, name="ag-stub", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
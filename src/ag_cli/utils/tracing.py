@@ -0,0 +1,114 @@
+# utils/tracing.py
+"""
+轻量级阶段追踪
+
+以 Chrome Trace Event 格式记录各阶段耗时，可直接在 chrome://tracing
+或 https://ui.perfetto.dev 中打开。未启用时 span() 返回共享的空上下文，
+几乎没有额外开销。
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# 进程内的时间零点（模块尽早导入，用于估算导入阶段耗时）
+PROCESS_START = time.perf_counter()
+
+_NULL_SPAN = nullcontext()
+
+
+class Tracer:
+    """追踪事件收集器"""
+
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def enable(self):
+        """启用追踪"""
+        self.enabled = True
+
+    def _ts(self, t):
+        """perf_counter 秒数转换为相对进程起点的微秒"""
+        return (t - PROCESS_START) * 1_000_000
+
+    def _append(self, event):
+        with self._lock:
+            self.events.append(event)
+
+    def complete(self, name, start, end, cat="ag", **args):
+        """记录一个已完成的区间事件（ph=X）"""
+        if not self.enabled:
+            return
+        self._append(
+            {
+                "name": name,
+                "cat": cat,
+                "ph": "X",
+                "ts": self._ts(start),
+                "dur": (end - start) * 1_000_000,
+                "pid": self._pid,
+                "tid": threading.get_ident(),
+                "args": args,
+            }
+        )
+
+    def instant(self, name, cat="ag", **args):
+        """记录一个瞬时事件（ph=i），例如首字节到达"""
+        if not self.enabled:
+            return
+        self._append(
+            {
+                "name": name,
+                "cat": cat,
+                "ph": "i",
+                "s": "t",
+                "ts": self._ts(time.perf_counter()),
+                "pid": self._pid,
+                "tid": threading.get_ident(),
+                "args": args,
+            }
+        )
+
+    @contextmanager
+    def _span(self, name, cat, args):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.complete(name, start, time.perf_counter(), cat, **args)
+
+    def span(self, name, cat="ag", **args):
+        """区间上下文管理器，未启用时返回空上下文"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._span(name, cat, args)
+
+    def write(self, path):
+        """写出 Chrome/Perfetto 可读取的 trace JSON"""
+        with self._lock:
+            events = list(self.events)
+        data = {"traceEvents": events, "displayTimeUnit": "ms"}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        return path
+
+
+# 全局追踪器
+tracer = Tracer()
+
+
+def span(name, cat="ag", **args):
+    """使用全局追踪器创建区间"""
+    if not tracer.enabled:
+        return _NULL_SPAN
+    return tracer._span(name, cat, args)
+
+
+def instant(name, cat="ag", **args):
+    """使用全局追踪器记录瞬时事件"""
+    if tracer.enabled:
+        tracer.instant(name, cat, **args)
@@ -0,0 +1,148 @@
+# tests/test_agent_tools.py
+import json
+import time
+
+import pytest
+
+from ag_cli.agent import tools
+from ag_cli.agent.executor import ToolExecutor
+from ag_cli.agent.tools import ToolError, Workspace, grep, read_file, shell
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    (tmp_path / "a.py").write_text("import os\nprint('hello')\n", encoding="utf-8")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "b.py").write_text("hello = 1\n", encoding="utf-8")
+    return Workspace(tmp_path)
+
+
+def test_paths_outside_workspace_are_rejected(workspace):
+    with pytest.raises(ToolError):
+        read_file(workspace, "../outside.txt")
+    with pytest.raises(ToolError):
+        grep(workspace, "x", "/etc")
+
+
+def test_read_file_numbers_lines_and_pages(workspace, tmp_path):
+    (tmp_path / "long.txt").write_text(
+        "".join(f"{i}\n" for i in range(1, 11)), encoding="utf-8"
+    )
+    output = read_file(workspace, "long.txt", offset=3, limit=2)
+    assert output.splitlines()[:2] == ["     3\t3", "     4\t4"]
+    assert "offset=5" in output
+
+
+def test_grep_finds_matches_across_files(workspace):
+    output = grep(workspace, "hello")
+    assert "a.py:2: print('hello')" in output
+    assert "sub/b.py:1: hello = 1" in output
+
+
+def test_grep_stops_at_deadline(workspace):
+    output = grep(workspace, "hello", deadline=time.monotonic() - 1)
+    assert "搜索超时" in output
+
+
+def test_read_file_stops_at_deadline(workspace, tmp_path, monkeypatch):
+    monkeypatch.setattr(tools, "DEADLINE_CHECK_LINES", 10)
+    (tmp_path / "big.txt").write_text("x\n" * 1000, encoding="utf-8")
+    output = read_file(workspace, "big.txt", limit=5, deadline=time.monotonic() - 1)
+    assert "读取超时" in output
+    with pytest.raises(ToolError):
+        read_file(workspace, "big.txt", offset=500, deadline=time.monotonic() - 1)
+
+
+@pytest.mark.skipif(tools.os.name != "posix", reason="POSIX shell")
+def test_shell_uses_remaining_time_before_deadline(workspace):
+    started = time.monotonic()
+    with pytest.raises(ToolError, match="命令超时"):
+        shell(workspace, "sleep 5", timeout=30, deadline=time.monotonic() + 0.3)
+    assert time.monotonic() - started < 3
+
+
+def test_executor_returns_results_in_call_order(workspace):
+    executor = ToolExecutor(workspace, max_workers=2, timeout=5)
+    calls = [
+        {
+            "id": str(i),
+            "function": {"name": "grep", "arguments": json.dumps({"pattern": p})},
+        }
+        for i, p in enumerate(["import", "nothing-matches", "("])
+    ]
+    try:
+        results = executor.run(calls)
+    finally:
+        executor.shutdown()
+    assert [r.call_id for r in results] == ["0", "1", "2"]
+    assert results[0].ok and "a.py:1" in results[0].output
+    assert results[1].output == "(无匹配)"
+    assert not results[2].ok
+
+
+def test_executor_rejects_shell_unless_enabled(workspace):
+    executor = ToolExecutor(workspace, timeout=5)
+    call = {"id": "1", "function": {"name": "shell", "arguments": '{"command": "ls"}'}}
+    try:
+        (result,) = executor.run([call])
+    finally:
+        executor.shutdown()
+    assert not result.ok and "--allow-shell" in result.output
+
+
+def test_grep_skips_symlinks_outside_workspace(workspace, tmp_path_factory):
+    outside = tmp_path_factory.mktemp("outside") / "secret.txt"
+    outside.write_text("hello secret\n", encoding="utf-8")
+    (workspace.root / "link.txt").symlink_to(outside)
+    (workspace.root / "inner.txt").symlink_to(workspace.root / "a.py")
+    output = grep(workspace, "hello")
+    assert "secret" not in output
+    assert "inner.txt:2: print('hello')" in output
+
+
+@pytest.mark.skipif(tools.os.name != "posix", reason="POSIX shell")
+def test_shell_applies_limits_through_ulimit(workspace):
+    output = shell(workspace, "ulimit -t; ulimit -f")
+    assert output.startswith("[exit 0]")
+    assert str(tools.SHELL_CPU_SECONDS) in output.splitlines()[1]
+
+
+@pytest.mark.skipif(tools.detect_sandbox() is None, reason="没有可用的隔离环境")
+def test_sandboxed_shell_has_read_only_workspace(workspace):
+    output = shell(workspace, "touch new.txt", sandbox=tools.detect_sandbox())
+    assert not output.startswith("[exit 0]")
+    assert not (workspace.root / "new.txt").exists()
+
+
+def test_executor_confirms_unsandboxed_shell_commands(workspace):
+    asked = []
+
+    def confirm(command):
+        asked.append(command)
+        return command == "echo ok"
+
+    executor = ToolExecutor(workspace, timeout=5, allow_shell=True, confirm=confirm)
+    calls = [
+        {
+            "id": str(i),
+            "function": {"name": "shell", "arguments": json.dumps({"command": c})},
+        }
+        for i, c in enumerate(["echo ok", "rm -rf ~"])
+    ]
+    try:
+        allowed, refused = executor.run(calls)
+    finally:
+        executor.shutdown()
+    assert asked == ["echo ok", "rm -rf ~"]
+    assert allowed.ok and "ok" in allowed.output
+    assert not refused.ok and "拒绝" in refused.output
+
+
+def test_executor_refuses_unsandboxed_shell_without_confirm(workspace):
+    executor = ToolExecutor(workspace, timeout=5, allow_shell=True)
+    call = {"id": "1", "function": {"name": "shell", "arguments": '{"command": "ls"}'}}
+    try:
+        (result,) = executor.run([call])
+    finally:
+        executor.shutdown()
+    assert not result.ok and "拒绝" in result.output
@@ -0,0 +1,190 @@
+# tests/test_analytics.py
+import io
+from types import SimpleNamespace
+
+import pytest
+from rich.console import Console
+
+from ag_cli import analytics
+from ag_cli.analytics import (
+    STATUS_ERROR,
+    STATUS_OK,
+    Archive,
+    _decode_column,
+    _decode_rows,
+    _encode_segment,
+    compact_file,
+    iter_segments,
+)
+
+
+def _row(i, model="deepseek-chat", **fields):
+    row = {
+        "ts": 1_760_000_000.0 + i,
+        "model": model,
+        "mode": "single",
+        "prompt_chars": 10 + i,
+        "completion_tokens": i,
+        "ttft": 0.25,
+        "status": STATUS_OK,
+    }
+    row.update(fields)
+    return row
+
+
+def _segments(data):
+    return list(iter_segments(data))
+
+
+def test_encode_decode_round_trip():
+    rows = [_row(0), _row(1, model="deepseek-reasoner"), _row(2, ttft=None)]
+    data = _encode_segment(rows)
+    [(header, start)] = _segments(data)
+    assert header["rows"] == 3
+    assert _decode_column(data, header, start, "model") == [
+        "deepseek-chat",
+        "deepseek-reasoner",
+        "deepseek-chat",
+    ]
+    assert list(_decode_column(data, header, start, "prompt_chars")) == [10, 11, 12]
+    # 缺失的数值记为 -1
+    assert list(_decode_column(data, header, start, "ttft")) == [0.25, 0.25, -1]
+    assert list(_decode_column(data, header, start, "prompt_tokens")) == [-1] * 3
+
+
+def test_missing_columns_are_typed():
+    data = _encode_segment([_row(0), _row(1)])
+    [(header, start)] = _segments(data)
+    # 模拟旧版本文件：只有第一列 ts
+    header["columns"] = header["columns"][:1]
+    header["dictionaries"] = {}
+    assert list(_decode_column(data, header, start, "ts")) == [
+        1_760_000_000.0,
+        1_760_000_001.0,
+    ]
+    assert _decode_column(data, header, start, "model") == ["", ""]
+    column = _decode_column(data, header, start, "cached_tokens")
+    assert column.typecode == "i"
+    assert list(column) == [-1, -1]
+    assert list(_decode_column(data, header, start, "retries")) == [0, 0]
+
+
+def test_truncated_segment_is_ignored():
+    data = _encode_segment([_row(0)]) + _encode_segment([_row(1)])[:20]
+    assert len(_segments(data)) == 1
+
+
+def _write_segments(path, count, bodies=False):
+    with open(path, "ab") as f:
+        for i in range(count):
+            f.write(
+                _encode_segment([_row(i)], [[f"q{i}", f"a{i}"]] if bodies else None)
+            )
+
+
+@pytest.mark.skipif(analytics.fcntl is None, reason="需要 flock")
+def test_compact_merges_small_segments(tmp_path):
+    path = tmp_path / "2025-10.agc"
+    _write_segments(path, 10)
+    _write_segments(path, 10, bodies=True)
+    before = path.read_bytes()
+    rows_before = [
+        row
+        for header, start in _segments(before)
+        for row in _decode_rows(before, header, start)
+    ]
+
+    assert compact_file(path, min_segments=30) == 0
+    assert compact_file(path, min_segments=16) == 20
+
+    after = path.read_bytes()
+    segments = _segments(after)
+    # 保存正文和未保存正文的段分别合并
+    assert len(segments) == 2
+    assert [bool(header.get("bodies")) for header, _ in segments] == [False, True]
+    rows_after = [
+        row for header, start in segments for row in _decode_rows(after, header, start)
+    ]
+    assert rows_after == rows_before
+    assert len(after) < len(before)
+    assert not path.with_suffix(".tmp").exists()
+
+
+@pytest.mark.skipif(analytics.fcntl is None, reason="需要 flock")
+def test_compact_splits_into_bounded_segments(tmp_path, monkeypatch):
+    monkeypatch.setattr(analytics, "COMPACT_ROWS", 4)
+    path = tmp_path / "2025-10.agc"
+    _write_segments(path, 10)
+    assert compact_file(path, min_segments=2) == 10
+    segments = _segments(path.read_bytes())
+    assert [header["rows"] for header, _ in segments] == [4, 4, 2]
+
+
+def test_archive_flush_and_scan(tmp_path, monkeypatch):
+    monkeypatch.setattr(analytics, "ANALYTICS_DIR", tmp_path)
+    archive = Archive(directory=tmp_path, keep_bodies=True)
+    for i in range(3):
+        archive.record(prompt=f"q{i}", response=f"a{i}", **_row(i))
+    archive.flush()
+    data, rows = analytics.scan(["model", "status"])
+    assert rows == 3
+    assert data["model"] == ["deepseek-chat"] * 3
+    assert [prompt for _, prompt, _ in analytics.read_bodies()] == ["q0", "q1", "q2"]
+
+
+class FakeArchive:
+    def __init__(self):
+        self.records = []
+
+    def record(self, **fields):
+        self.records.append(fields)
+
+
+def _chat_interface(monkeypatch, use_pretty):
+    from ag_cli.chat.interface import ChatInterface
+
+    monkeypatch.setenv("AG_ANALYTICS", "0")
+    monkeypatch.setenv("AG_SEARCH_INDEX", "0")
+    client = SimpleNamespace(
+        config={"default_model": "deepseek-chat"},
+        resolve_model_name=lambda model: model,
+        attempts=1,
+    )
+    console = Console(file=io.StringIO(), width=80)
+    interface = ChatInterface(client, console, use_pretty)
+    interface.archive = FakeArchive()
+    return interface
+
+
+def _chunk(content):
+    delta = SimpleNamespace(content=content, reasoning_content=None)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+
+
+def _broken_stream():
+    yield _chunk("部分回答")
+    raise RuntimeError("connection reset")
+
+
+@pytest.mark.parametrize("use_pretty", [True, False])
+def test_interrupted_stream_is_archived_as_error(monkeypatch, use_pretty):
+    interface = _chat_interface(monkeypatch, use_pretty)
+    messages = [{"role": "user", "content": "hi"}]
+    try:
+        interface._call_api("single", _broken_stream, messages, None)
+    except RuntimeError:
+        # 纯文本模式下异常继续抛出
+        assert not use_pretty
+    [record] = interface.archive.records
+    assert record["status"] == STATUS_ERROR
+
+
+def test_completed_stream_is_archived_as_ok(monkeypatch):
+    interface = _chat_interface(monkeypatch, True)
+    messages = [{"role": "user", "content": "hi"}]
+    response = interface._call_api(
+        "single", lambda: iter([_chunk("完整回答")]), messages, None
+    )
+    assert response == "完整回答"
+    [record] = interface.archive.records
+    assert record["status"] == STATUS_OK
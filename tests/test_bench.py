@@ -0,0 +1,33 @@
+# tests/test_bench.py
+from types import SimpleNamespace
+
+from ag_cli.cli.bench import RequestResult, _client_config, summarize
+
+
+def _result(tokens, usage):
+    result = RequestResult(0.0)
+    result.start = 0.0
+    result.first_token = 0.1
+    result.end = 1.1
+    result.tokens = tokens
+    result.usage = usage
+    return result
+
+
+def test_summarize_counts_tokens_from_usage():
+    summary = summarize([_result(10, True), _result(20, True)], 2.0)
+    assert summary["output_unit"] == "tokens"
+    assert summary["output_tokens"] == 30
+    assert summary["throughput_tokens_per_sec"] == 15.0
+
+
+def test_summarize_labels_chunks_without_usage():
+    summary = summarize([_result(10, True), _result(20, False)], 2.0)
+    assert summary["output_unit"] == "chunks"
+
+
+def test_client_config_never_persists_key_state():
+    args = SimpleNamespace(base_url=None)
+    stub = SimpleNamespace(base_url="http://127.0.0.1:1/v1")
+    config = _client_config(args, stub)
+    assert config["key_stats_file"] is None
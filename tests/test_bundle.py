@@ -0,0 +1,46 @@
+# tests/test_bundle.py
+import importlib.util
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+BUNDLE_SCRIPT = Path(__file__).resolve().parent.parent / "scripts" / "bundle.py"
+
+
+def _load_bundle():
+    spec = importlib.util.spec_from_file_location("bundle", BUNDLE_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _project_version():
+    import tomllib
+
+    with open(BUNDLE_SCRIPT.parent.parent / "pyproject.toml", "rb") as f:
+        return tomllib.load(f)["project"]["version"]
+
+
+@pytest.mark.skipif(sys.version_info < (3, 12), reason="项目要求 Python 3.12+")
+def test_zipapp_builds_and_reports_version(tmp_path):
+    bundle = _load_bundle()
+    output = bundle.build_zipapp(
+        tmp_path / "ag.pyz",
+        build_dir=tmp_path / "build",
+        cache_dir=tmp_path / "cache",
+    )
+    assert output is not None and output.exists()
+
+    env = dict(os.environ, AG_CLI_CACHE=str(tmp_path / "cache" / "run"))
+    result = subprocess.run(
+        [sys.executable, str(output), "--version"],
+        capture_output=True,
+        text=True,
+        env=env,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == f"ag {_project_version()}"
@@ -0,0 +1,144 @@
+# tests/test_catalog.py
+import argparse
+import json
+import shutil
+import subprocess
+
+import pytest
+
+from ag_cli.utils import catalog
+from ag_cli.utils.catalog import (
+    complete_model,
+    load_catalog,
+    refresh_catalog,
+    refresh_in_background,
+    validate_model,
+)
+from ag_cli.utils.completion import completion_script
+from ag_cli.utils.stub_server import STUB_API_KEY, STUB_MODEL, StubServer
+
+BASE_A = "https://a.example/v1"
+BASE_B = "https://b.example/v1"
+
+
+@pytest.fixture
+def catalog_file(tmp_path, monkeypatch):
+    path = tmp_path / "models_cache.json"
+    monkeypatch.setattr(catalog, "CATALOG_FILE", path)
+    monkeypatch.setattr(catalog, "_catalog_cache", None)
+    monkeypatch.setattr(catalog, "_refresh_thread", None)
+    monkeypatch.setattr(catalog, "ensure_config_dir", lambda: None)
+    return path
+
+
+def _write(path, data):
+    path.write_text(json.dumps(data), encoding="utf-8")
+    catalog._catalog_cache = None
+
+
+def test_catalog_is_keyed_by_base_url(catalog_file):
+    _write(
+        catalog_file,
+        {
+            "endpoints": {
+                BASE_A: {"etag": None, "fetched_at": 1, "models": {"model-a": {}}},
+                BASE_B: {"etag": None, "fetched_at": 1, "models": {"model-b": {}}},
+            }
+        },
+    )
+    assert validate_model("model-a", {}, BASE_A) == "model-a"
+    with pytest.raises(ValueError, match="model-a"):
+        validate_model("model-a", {}, BASE_B)
+    assert complete_model("model", {}, BASE_B) == ["model-b"]
+    # 没有缓存的接口无法判断，直接放行
+    assert validate_model("anything", {}, "https://c.example/v1") == "anything"
+
+
+def test_aliases_always_valid(catalog_file):
+    _write(
+        catalog_file,
+        {"endpoints": {BASE_A: {"etag": None, "fetched_at": 1, "models": {"m": {}}}}},
+    )
+    assert validate_model("v3", {"v3": "deepseek-v3"}, BASE_A) == "deepseek-v3"
+    assert complete_model("v", {"v3": "deepseek-v3"}, BASE_A) == ["v3"]
+
+
+def test_legacy_single_endpoint_file(catalog_file):
+    _write(
+        catalog_file,
+        {"etag": "x", "fetched_at": 5, "base_url": BASE_A, "models": {"old": {}}},
+    )
+    assert list(load_catalog(BASE_A)["models"]) == ["old"]
+    assert load_catalog(BASE_B)["models"] == {}
+
+
+def test_refresh_keeps_other_endpoints(catalog_file):
+    stub = StubServer().start()
+    try:
+        _write(
+            catalog_file,
+            {
+                "endpoints": {
+                    BASE_A: {"etag": None, "fetched_at": 1, "models": {"a": {}}}
+                }
+            },
+        )
+        refresh_catalog(STUB_API_KEY, stub.base_url)
+    finally:
+        stub.stop()
+    data = json.loads(catalog_file.read_text(encoding="utf-8"))
+    assert set(data["endpoints"]) == {BASE_A, stub.base_url}
+    assert list(data["endpoints"][stub.base_url]["models"]) == [STUB_MODEL]
+
+
+def test_background_refresh_fills_empty_catalog(catalog_file):
+    stub = StubServer().start()
+    try:
+        thread = refresh_in_background(STUB_API_KEY, stub.base_url)
+        assert thread is not None
+        thread.join(10)
+        # 每个进程只刷新一次
+        assert refresh_in_background(STUB_API_KEY, stub.base_url) is None
+    finally:
+        stub.stop()
+    assert STUB_MODEL in load_catalog(stub.base_url)["models"]
+
+
+def _parser():
+    parser = argparse.ArgumentParser(prog="ag")
+    parser.add_argument("--model", "-m")
+    parser.add_argument("--reasoning", choices=("show", "hide"))
+    parser.add_argument("--secret", help=argparse.SUPPRESS)
+    return parser
+
+
+def test_completion_script_lists_options_and_choices():
+    script = completion_script("bash", _parser(), ("bench", "stats"))
+    assert "--model -m" in script
+    assert "--secret" not in script
+    assert 'compgen -W "show hide"' in script
+    assert "ag --complete-model" in script
+    assert "complete -o default -F _ag_complete ag" in script
+    assert "bashcompinit" in completion_script("zsh", _parser())
+    with pytest.raises(ValueError):
+        completion_script("fish", _parser())
+
+
+@pytest.mark.skipif(shutil.which("bash") is None, reason="需要 bash")
+def test_bash_completion_calls_complete_model(tmp_path):
+    # 用假的 ag 命令代替 --complete-model 的输出
+    fake = tmp_path / "ag"
+    fake.write_text("#!/bin/sh\necho deepseek-v3\necho deepseek-r1\n")
+    fake.chmod(0o755)
+    script = completion_script("bash", _parser())
+    test = (
+        f'PATH="{tmp_path}:$PATH"\n{script}\n'
+        "COMP_WORDS=(ag -m deepseek-r); COMP_CWORD=2; _ag_complete\n"
+        'echo "${COMPREPLY[@]}"\n'
+        "COMP_WORDS=(ag --reas); COMP_CWORD=1; _ag_complete\n"
+        'echo "${COMPREPLY[@]}"\n'
+    )
+    result = subprocess.run(
+        ["bash", "-c", test], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.splitlines() == ["deepseek-r1", "--reasoning"]
@@ -0,0 +1,80 @@
+# tests/test_compaction.py
+from ag_cli.chat.compaction import compact_lines, compact_text, estimate_tokens
+
+
+def compact(text):
+    return compact_text(text).text
+
+
+def test_similar_log_lines_are_folded():
+    lines = [
+        f"2024-05-01 12:00:{i:02d},123 INFO worker-{i} processed job {1000 + i}"
+        for i in range(10)
+    ]
+    result = compact("\n".join(lines))
+    assert result.splitlines() == [
+        lines[0],
+        "[… 省略 8 行相似内容 …]",
+        lines[-1],
+    ]
+
+
+def test_level_prefixed_lines_are_folded():
+    lines = [f"[ERROR] request {i} failed after {i * 10} ms" for i in range(5)]
+    assert "省略 3 行" in compact("\n".join(lines))
+
+
+def test_csv_rows_are_kept():
+    text = "\n".join(f"2024-01-0{i},user_{i},{i * 3},active" for i in range(1, 8))
+    assert compact(text) == text
+
+
+def test_matrix_literal_rows_are_kept():
+    text = "m = [\n    [1, 0, 0, 0],\n    [0, 1, 0, 0],\n    [0, 0, 1, 0],\n]"
+    assert compact(text) == text
+
+
+def test_similar_prose_lines_are_not_folded():
+    text = "\n".join(f"Step {i}: move the slider to position {i * 7}" for i in range(6))
+    assert compact(text) == text
+
+
+def test_fenced_code_is_kept_verbatim():
+    body = ["```python", "x = 1", "x = 1", "x = 1", "", "", "y = 2", "```"]
+    text = "\n".join(["说明", *body, "INFO done", "INFO done"])
+    assert compact(text).splitlines() == ["说明", *body, "INFO done [×2]"]
+
+
+def test_markdown_table_rows_are_kept():
+    text = "| a | b |\n|---|---|\n| 1 | 2 |\n| 1 | 2 |"
+    assert compact(text) == text
+
+
+def test_identical_log_lines_and_blank_runs_are_collapsed():
+    text = "\n\nWARN retry\nWARN retry\nWARN retry\n\n\n\nworld   \n"
+    assert compact(text) == "WARN retry [×3]\n\nworld"
+
+
+def test_repeated_unfenced_code_is_kept():
+    text = "x = 1\nx = 1\nprint(f())\nprint(f())\nprint(f())"
+    assert compact(text) == text
+
+
+def test_log_lines_around_a_table_row_are_not_merged():
+    text = "INFO ready\n| a | b |\nINFO ready"
+    assert compact(text) == text
+
+
+def test_ansi_sequences_are_removed():
+    assert list(compact_lines(["\x1b[31mred\x1b[0m\n"])) == ["red"]
+
+
+def test_unchanged_text_reports_no_savings():
+    result = compact_text("nothing to do")
+    assert result.text == "nothing to do"
+    assert result.saved_tokens == 0
+
+
+def test_estimate_tokens_counts_cjk_per_character():
+    assert estimate_tokens("你好") == 2
+    assert estimate_tokens("abcdefgh") == 2
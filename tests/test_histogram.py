@@ -0,0 +1,76 @@
+# tests/test_histogram.py
+import pytest
+
+from ag_cli.utils.histogram import SUB_BUCKETS, LogHistogram
+
+
+def test_empty_histogram():
+    histogram = LogHistogram()
+    assert histogram.percentile(50) == 0.0
+    assert histogram.mean == 0.0
+    assert histogram.coarse_buckets() == []
+    assert histogram.to_dict()["min"] == 0.0
+
+
+def test_percentiles_within_relative_error():
+    histogram = LogHistogram()
+    values = [i / 1000 for i in range(1, 1001)]
+    for value in values:
+        histogram.record(value)
+    assert histogram.total == 1000
+    assert histogram.mean == pytest.approx(sum(values) / 1000)
+    for p, expected in ((50, 0.5), (90, 0.9), (99, 0.99)):
+        assert histogram.percentile(p) == pytest.approx(expected, rel=2 / SUB_BUCKETS)
+    assert histogram.percentile(100) == pytest.approx(1.0, rel=2 / SUB_BUCKETS)
+
+
+def test_percentile_clamped_to_observed_range():
+    histogram = LogHistogram()
+    histogram.record(0.123456)
+    assert histogram.percentile(50) == 0.123456
+    assert histogram.percentile(99.9) == 0.123456
+
+
+def test_merge_matches_single_histogram():
+    combined, left, right = LogHistogram(), LogHistogram(), LogHistogram()
+    for i in range(1, 500):
+        value = i * 0.0007
+        combined.record(value)
+        (left if i % 2 else right).record(value)
+    left.merge(right)
+    assert left.counts == combined.counts
+    assert left.total == combined.total
+    assert left.min == combined.min and left.max == combined.max
+    assert left.percentile(90) == combined.percentile(90)
+
+
+def test_scale_controls_precision():
+    rate = LogHistogram(scale=100)
+    for value in (12.34, 56.78, 90.12):
+        rate.record(value)
+    assert rate.percentile(50) == pytest.approx(56.78, rel=2 / SUB_BUCKETS)
+    assert rate.to_dict()["scale"] == 100
+
+
+def test_coarse_buckets_cover_all_samples():
+    histogram = LogHistogram()
+    for i in range(1, 2000):
+        histogram.record(i * 0.00037)
+    buckets = histogram.coarse_buckets()
+    assert sum(count for _, _, count in buckets) == histogram.total
+    for low, high, _ in buckets:
+        assert low < high
+    lows = [low for low, _, _ in buckets]
+    assert lows == sorted(lows)
+
+
+def test_to_dict_buckets_are_exact():
+    histogram = LogHistogram()
+    for value in (0.001, 0.001, 0.5, 2.0):
+        histogram.record(value)
+    data = histogram.to_dict()
+    assert data["count"] == 4
+    assert sum(count for _, _, count in data["buckets"]) == 4
+    for low, high, _ in data["buckets"]:
+        assert low < high
+    assert set(data["percentiles"]) == {"p50", "p90", "p99", "p99.9"}
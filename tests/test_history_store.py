@@ -0,0 +1,103 @@
+# tests/test_history_store.py
+import pytest
+
+from ag_cli.chat.history_manager import HistoryManager, RECENT_MESSAGES
+from ag_cli.chat.history_store import HistoryStore, HistoryView
+from ag_cli.utils.tracing import tracer
+
+
+@pytest.fixture
+def tracing(monkeypatch):
+    monkeypatch.setattr(tracer, "enabled", True)
+    monkeypatch.setattr(tracer, "events", [])
+    return tracer
+
+
+def _manager(turns):
+    manager = HistoryManager("system")
+    for i in range(turns):
+        manager.add_user_message(f"q{i}")
+        manager.add_assistant_message(f"a{i}")
+    return manager
+
+
+def test_managed_history_keeps_system_and_recent():
+    manager = _manager(30)
+    view = manager.get_managed_history()
+    messages = list(view)
+    assert len(view) == len(messages) == 1 + RECENT_MESSAGES
+    assert messages[0] == {"role": "system", "content": "system"}
+    assert messages[-1] == {"role": "assistant", "content": "a29"}
+    assert view[-1] == messages[-1]
+    assert view[1:3] == messages[1:3]
+
+
+def test_materialize_span_recorded_on_iteration(tracing):
+    manager = _manager(3)
+    view = manager.get_managed_history()
+    # 创建视图时尚未读取任何消息
+    assert [e["name"] for e in tracing.events] == []
+    list(view)
+    [event] = tracing.events
+    assert event["name"] == "history.materialize"
+    assert event["args"]["messages"] == 7
+
+
+def test_large_messages_go_to_blobs_and_are_released():
+    store = HistoryStore(inline_limit=16)
+    store.append("system", "s")
+    big = "x" * 100
+    store.append("user", big)
+    store.append("user", big, original="原文" * 50)
+    assert len(store.blobs) == 2
+    assert store.inline_size() == 1
+    assert list(HistoryView(store))[1]["content"] == big
+    assert store.display_content(store.records[2]) == "原文" * 50
+    store.pop()
+    assert len(store.blobs) == 1
+    store.clear()
+    assert len(store.blobs) == 0
+    assert list(HistoryView(store)) == []
+
+
+def test_oldest_turns_are_evicted_and_blobs_released():
+    store = HistoryStore(inline_limit=16, max_records=4)
+    store.append("system", "s")
+    for i in range(4):
+        store.append("user", f"q{i}" + "x" * 100)
+        store.append("assistant", f"a{i}")
+    assert len(store) == 1 + 4
+    assert store.dropped == 4
+    assert [store.content(r)[:2] for r in store.records[1:]] == ["q2", "a2", "q3", "a3"]
+    # 被丢弃轮次的 blob 已释放
+    assert len(store.blobs) == 2
+    store.clear()
+    assert store.dropped == 0 and len(store.blobs) == 0
+
+
+def test_viewer_keeps_turn_numbers_after_eviction():
+    from rich.console import Console
+
+    from ag_cli.chat.history_viewer import HistoryViewer
+
+    manager = HistoryManager("system", max_records=20)
+    for i in range(15):
+        manager.add_user_message(f"q{i}")
+        manager.add_assistant_message(f"a{i}")
+    viewer = HistoryViewer(manager.store, Console(width=80))
+    assert viewer.turn_count == 15
+    assert viewer.first_turn == 6
+    assert viewer._turn_records(5) == []
+    assert [manager.store.content(r) for _, r in viewer._turn_records(6)] == [
+        "q5",
+        "a5",
+    ]
+    assert viewer.search("q14")[0][0] == 15
+
+
+def test_char_count_does_not_read_blobs(monkeypatch):
+    store = HistoryStore(inline_limit=16)
+    store.append("system", "系统")
+    store.append("user", "好" * 100)
+    monkeypatch.setattr(store.blobs, "get", None)
+    assert HistoryView(store).char_count() == 102
@@ -0,0 +1,69 @@
+# tests/test_history_viewer.py
+import io
+
+import pytest
+from rich.console import Console
+
+from ag_cli.chat import history_viewer
+from ag_cli.chat.history_store import HistoryStore
+from ag_cli.chat.history_viewer import HistoryViewer
+
+
+@pytest.fixture(autouse=True)
+def clear_render_cache():
+    history_viewer._render_cache.clear()
+    yield
+    history_viewer._render_cache.clear()
+
+
+def make_store(turns):
+    store = HistoryStore()
+    store.append("system", "system prompt")
+    for question, answer in turns:
+        store.append("user", question)
+        store.append("assistant", answer)
+    return store
+
+
+def render(store, first, last, use_pretty=True):
+    console = Console(file=io.StringIO(), width=80, color_system=None)
+    HistoryViewer(store, console, use_pretty).show_turns(first, last)
+    return console.file.getvalue()
+
+
+def test_repeated_messages_keep_their_own_turn_labels():
+    store = make_store([("继续", "好的")] * 3)
+    output = render(store, 1, 3)
+    for turn in (1, 2, 3):
+        assert f"第{turn}轮 - 用户问题" in output
+        assert f"第{turn}轮回复" in output
+
+
+def test_render_is_cached_per_turn():
+    store = make_store([("继续", "好的")] * 2)
+    render(store, 1, 2)
+    cached = len(history_viewer._render_cache)
+    assert cached == 4
+    render(store, 1, 2)
+    assert len(history_viewer._render_cache) == cached
+
+
+def test_long_message_is_folded_unless_full():
+    long_answer = "\n".join(f"line {i}" for i in range(200))
+    store = make_store([("q", long_answer)])
+    console = Console(file=io.StringIO(), width=80, color_system=None)
+    viewer = HistoryViewer(store, console, use_pretty=False)
+    viewer.show_turns(1, 1)
+    assert "已折叠 120 行" in console.file.getvalue()
+    assert "line 199" not in console.file.getvalue()
+
+    viewer.full = True
+    viewer.show_turns(1, 1)
+    assert "line 199" in console.file.getvalue()
+
+
+def test_search_reports_turn_of_match():
+    store = make_store([("alpha", "one"), ("beta", "two"), ("gamma", "Beta again")])
+    viewer = HistoryViewer(store, Console(file=io.StringIO()))
+    hits = viewer.search("beta")
+    assert [(turn, role) for turn, role, _ in hits] == [(2, "user"), (3, "assistant")]
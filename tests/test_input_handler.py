@@ -0,0 +1,144 @@
+# tests/test_input_handler.py
+import io
+import os
+import threading
+
+import pytest
+from rich.console import Console
+
+from ag_cli.chat import input_handler
+from ag_cli.chat.input_handler import (
+    PASTE_END,
+    PASTE_START,
+    InputBuffer,
+    InputReader,
+    read_message,
+)
+
+pty = pytest.importorskip("pty")
+pytestmark = pytest.mark.skipif(input_handler.termios is None, reason="需要 termios")
+
+
+class Terminal:
+    """伪终端：reader 使用 slave 端，测试从 master 端输入并读取回显"""
+
+    def __init__(self):
+        self.master, self.slave = pty.openpty()
+        self.input = os.fdopen(self.slave, "rb", buffering=0, closefd=False)
+        self.output = os.fdopen(self.slave, "w", closefd=False)
+        self.echo = bytearray()
+        self._drain = threading.Thread(target=self._read_echo, daemon=True)
+        self._drain.start()
+
+    def _read_echo(self):
+        while True:
+            try:
+                data = os.read(self.master, 65536)
+            except OSError:
+                return
+            if not data:
+                return
+            self.echo += data
+
+    def type(self, data):
+        # 分块写入，避免填满 pty 缓冲区时阻塞
+        def write():
+            view = memoryview(data)
+            while view:
+                written = os.write(self.master, view[:4096])
+                view = view[written:]
+
+        writer = threading.Thread(target=write, daemon=True)
+        writer.start()
+        return writer
+
+    def close(self):
+        os.close(self.slave)
+        os.close(self.master)
+
+
+@pytest.fixture
+def terminal():
+    term = Terminal()
+    yield term
+    term.close()
+
+
+def read(terminal, data):
+    buffer = InputBuffer()
+    console = Console(file=io.StringIO())
+    with InputReader(terminal.input, terminal.output) as reader:
+        assert reader.tty
+        writer = terminal.type(data)
+        command = read_message(reader, buffer, console)
+        writer.join(5)
+    text = buffer.text()
+    buffer.close()
+    return command, text
+
+
+def test_typed_lines_end_with_dot(terminal):
+    command, text = read(terminal, b"hello\rworld\r.\r")
+    assert command == "."
+    assert text == "hello\nworld"
+
+
+def test_backspace_and_ctrl_u_edit_the_line(terminal):
+    command, text = read(
+        terminal, "abx\x7fc\r错字\x7f\x7f对\r junk\x15ok\r.\r".encode()
+    )
+    assert text == "abc\n对\nok"
+
+
+def test_arrow_keys_are_ignored(terminal):
+    command, text = read(terminal, b"a\x1b[Db\x1b[A\r.\r")
+    assert text == "ab"
+
+
+def test_paste_is_not_echoed_and_commands_inside_are_text(terminal):
+    long_line = b"x" * 20000
+    paste = b"line one\n.exit\n.\n" + long_line
+    command, text = read(terminal, PASTE_START + paste + PASTE_END + b"\r.\r")
+    assert command == "."
+    assert text == paste.decode()
+    assert b".exit" not in terminal.echo
+    assert b"xxxxxxxxxx" not in terminal.echo
+
+
+def test_paste_marker_split_across_reads(terminal):
+    reader_input = PASTE_START[:3], PASTE_START[3:] + b"abc" + PASTE_END + b"\r.\r"
+    buffer = InputBuffer()
+    with InputReader(terminal.input, terminal.output) as reader:
+        terminal.type(reader_input[0]).join(5)
+        terminal.type(reader_input[1])
+        command = read_message(reader, buffer, Console(file=io.StringIO()))
+    assert command == "."
+    assert buffer.text() == "abc"
+
+
+def test_ctrl_d_on_empty_line_is_eof(terminal):
+    command, text = read(terminal, b"\x04")
+    assert command is None and text == ""
+
+
+def test_terminal_mode_is_restored(terminal):
+    before = input_handler.termios.tcgetattr(terminal.slave)
+    read(terminal, b".\r")
+    assert input_handler.termios.tcgetattr(terminal.slave) == before
+
+
+def test_pipe_input_reads_lines_and_commands():
+    stream = io.BytesIO(b"first\nsecond\n.history 2\n")
+    buffer = InputBuffer()
+    reader = InputReader(stream, io.StringIO())
+    assert not reader.tty
+    assert read_message(reader, buffer, Console(file=io.StringIO())) == ".history 2"
+    assert buffer.text() == "first\nsecond"
+
+
+def test_input_buffer_spools_large_input():
+    buffer = InputBuffer(spool_limit=10)
+    buffer.write(b"0123456789abcdef\n")
+    assert buffer.spooled and buffer.lines == 1
+    assert buffer.text() == "0123456789abcdef"
+    buffer.close()
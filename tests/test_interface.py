@@ -0,0 +1,137 @@
+# tests/test_interface.py
+import io
+from types import SimpleNamespace
+
+import pytest
+from rich.console import Console
+
+from ag_cli.chat import interface
+from ag_cli.chat.reasoning import StreamStats
+
+REASONING = "先分解问题\n再逐步计算"
+ANSWER = "答案是 **42**"
+
+
+def _chunk(reasoning=None, content=None, usage=None):
+    delta = SimpleNamespace(content=content, reasoning_content=reasoning)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=usage)
+
+
+def _usage(**details):
+    return SimpleNamespace(
+        prompt_tokens=10,
+        completion_tokens=20,
+        completion_tokens_details=SimpleNamespace(**details),
+        prompt_tokens_details=None,
+    )
+
+
+def _stream():
+    yield _chunk(reasoning="先分解问题\n")
+    yield _chunk(reasoning="再逐步计算")
+    yield _chunk(content="答案是 ")
+    yield _chunk(content="**42**")
+    # include_usage 时最后一个分块没有 choices
+    yield SimpleNamespace(choices=[], usage=_usage(reasoning_tokens=5))
+
+
+@pytest.fixture
+def make_chat(monkeypatch):
+    monkeypatch.setattr(interface, "get_archive", lambda: None)
+    monkeypatch.setattr(interface, "get_index", lambda: None)
+
+    def make(use_pretty, mode):
+        output = io.StringIO()
+        console = Console(file=output, width=100)
+        return interface.ChatInterface(None, console, use_pretty, mode), output
+
+    return make
+
+
+def test_pretty_show_displays_reasoning_panel(make_chat):
+    chat, output = make_chat(True, "show")
+    assert chat.display_streaming_response(_stream()) == ANSWER
+    text = output.getvalue()
+    assert "思考过程" in text and "再逐步计算" in text
+    assert "推理 5 tokens" in text
+
+
+def test_pretty_summary_shows_only_length(make_chat):
+    chat, output = make_chat(True, "summary")
+    assert chat.display_streaming_response(_stream()) == ANSWER
+    text = output.getvalue()
+    assert "已思考" in text and f"{len(REASONING)} 字" in text
+    assert "再逐步计算" not in text
+
+
+def test_pretty_hide_shows_no_reasoning(make_chat):
+    chat, output = make_chat(True, "hide")
+    assert chat.display_streaming_response(_stream()) == ANSWER
+    text = output.getvalue()
+    assert "再逐步计算" not in text and "已思考" not in text and "推理" not in text
+    assert "42" in text
+
+
+def test_pretty_interrupted_stream_keeps_partial_answer(make_chat):
+    def broken():
+        yield _chunk(content="部分")
+        raise ConnectionError("连接断开")
+
+    chat, output = make_chat(True, "show")
+    assert chat.display_streaming_response(broken()) == "部分"
+    assert isinstance(chat.last_stats.error, ConnectionError)
+    assert "流式响应中断" in output.getvalue()
+
+
+@pytest.mark.parametrize(
+    "mode, reasoning_shown, summary_shown",
+    [("show", True, True), ("summary", False, True), ("hide", False, False)],
+)
+def test_plain_mode_keeps_reasoning_on_stderr(
+    make_chat, capsys, mode, reasoning_shown, summary_shown
+):
+    chat, _ = make_chat(False, mode)
+    assert chat.display_streaming_response(_stream()) == ANSWER
+    captured = capsys.readouterr()
+    # 标准输出只有回答正文，重定向时不混入推理内容
+    assert captured.out == ANSWER + "\n"
+    assert (REASONING in captured.err) == reasoning_shown
+    assert ("[推理 5 tokens" in captured.err) == summary_shown
+
+
+def test_stream_stats_times_first_tokens(make_chat):
+    chat, _ = make_chat(False, "hide")
+    chat.display_streaming_response(_stream())
+    stats = chat.last_stats
+    assert stats.reasoning_chars == len(REASONING)
+    assert stats.answer_chars == len(ANSWER)
+    assert 0 <= stats.ttfr <= stats.ttfa
+
+
+def test_on_usage_reads_token_details():
+    stats = StreamStats()
+    usage = _usage(reasoning_tokens=7)
+    usage.prompt_tokens_details = SimpleNamespace(cached_tokens=4)
+    stats.on_usage(usage)
+    assert (stats.prompt_tokens, stats.completion_tokens) == (10, 20)
+    assert (stats.reasoning_tokens, stats.cached_tokens) == (7, 4)
+
+
+def test_on_usage_tolerates_missing_details():
+    stats = StreamStats()
+    stats.on_usage(None)
+    assert stats.completion_tokens is None
+    # 兼容接口可能不返回 details，或 details 中缺少字段
+    stats.on_usage(_usage())
+    assert stats.completion_tokens == 20
+    assert stats.reasoning_tokens is None and stats.cached_tokens is None
+    stats.on_usage(SimpleNamespace(prompt_tokens=1, completion_tokens=2))
+    assert stats.reasoning_tokens is None and stats.cached_tokens is None
+
+
+def test_summary_falls_back_to_chars_without_reasoning_tokens():
+    stats = StreamStats(start=0.0)
+    stats.on_reasoning("想一想")
+    assert "推理 3 字" in stats.summary()
+    stats.reasoning_tokens = 2
+    assert "推理 2 tokens" in stats.summary()
@@ -0,0 +1,130 @@
+# tests/test_key_pool.py
+import json
+import time
+
+import pytest
+
+from ag_cli import key_pool
+from ag_cli.key_pool import (
+    EVICTION_TTL,
+    KeyPool,
+    key_fingerprint,
+    load_key_stats,
+    reset_key_state,
+)
+
+KEYS = ["sk-aaaaaaaaaaaaaaaa", "sk-bbbbbbbbbbbbbbbb", "sk-cccccccccccccccc"]
+
+
+@pytest.fixture
+def stats_file(tmp_path):
+    return tmp_path / "key_stats.json"
+
+
+def test_round_robin_cycles_through_all_keys(stats_file):
+    pool = KeyPool(KEYS, "round-robin", stats_file)
+    assert {pool.select().key for _ in range(3)} == set(KEYS)
+
+
+def test_throttled_key_is_skipped_and_shared(stats_file):
+    pool = KeyPool(KEYS[:2], "round-robin", stats_file)
+    first = next(state for state in pool.states if state.key == KEYS[0])
+    pool.report_throttle(first, retry_after="60")
+    assert all(pool.select().key == KEYS[1] for _ in range(4))
+
+    # 其他进程读取到冷却状态
+    other = KeyPool(KEYS[:2], "round-robin", stats_file)
+    assert all(other.select().key == KEYS[1] for _ in range(4))
+
+
+def test_all_throttled_picks_earliest_cooldown(stats_file):
+    pool = KeyPool(KEYS[:2], "least-throttled", stats_file)
+    pool.report_throttle(pool.states[0], retry_after="100")
+    pool.report_throttle(pool.states[1], retry_after="10")
+    assert pool.select() is pool.states[1]
+
+
+def test_unauthorized_eviction_expires(stats_file, monkeypatch):
+    pool = KeyPool(KEYS[:1], "round-robin", stats_file)
+    pool.report_unauthorized(pool.states[0])
+    with pytest.raises(ValueError, match="ag --config reset"):
+        pool.select()
+
+    later = time.time() + EVICTION_TTL + 1
+    monkeypatch.setattr(key_pool.time, "time", lambda: later)
+    assert KeyPool(KEYS[:1], "round-robin", stats_file).select().key == KEYS[0]
+
+
+def test_reset_clears_evictions_for_all_keys(stats_file):
+    pool = KeyPool(KEYS, "round-robin", stats_file)
+    for state in pool.states:
+        pool.report_unauthorized(state)
+    assert reset_key_state(stats_file=stats_file) == len(KEYS)
+    assert KeyPool(KEYS, "round-robin", stats_file).select().key in KEYS
+
+
+def test_legacy_permanent_eviction_is_ignored(stats_file):
+    stats_file.write_text(
+        json.dumps({key_fingerprint(KEYS[0]): {"requests": 1, "evicted": True}})
+    )
+    assert KeyPool(KEYS[:1], "round-robin", stats_file).select().key == KEYS[0]
+
+
+def test_flush_merges_counts_without_storing_keys(stats_file):
+    for _ in range(2):
+        pool = KeyPool(KEYS[:1], "round-robin", stats_file)
+        pool.report_success(pool.select())
+        pool.flush()
+    record = load_key_stats(stats_file)[key_fingerprint(KEYS[0])]
+    assert record["requests"] == 2
+    assert KEYS[0] not in stats_file.read_text()
+
+
+def test_pool_without_stats_file_does_not_persist(tmp_path):
+    pool = KeyPool(KEYS[:1], "round-robin", None)
+    pool.report_throttle(pool.states[0])
+    pool.flush()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_weighted_prefers_remaining_quota(stats_file):
+    pool = KeyPool(KEYS[:2], "weighted", stats_file)
+    pool.report_success(pool.states[0], {"x-ratelimit-remaining-requests": "0"})
+    pool.report_success(pool.states[1], {"x-ratelimit-remaining-requests": "1000"})
+    picks = [pool.select().key for _ in range(200)]
+    assert picks.count(KEYS[1]) > 190
+
+
+def test_atexit_is_registered_once(stats_file, monkeypatch):
+    registered = []
+    monkeypatch.setattr(key_pool.atexit, "register", registered.append)
+    for _ in range(3):
+        KeyPool(KEYS, "round-robin", stats_file)
+    assert registered == []
+
+
+def test_failed_request_is_sent_once_and_counted(monkeypatch):
+    from ag_cli.api_client import DeepSeekClient
+    from ag_cli.utils import stub_server
+    from ag_cli.utils.stub_server import STUB_API_KEY, StubServer, StubSettings
+
+    # 桩服务器每收到一个请求抽一次随机数，借此统计实际请求数
+    hits = []
+    monkeypatch.setattr(stub_server.random, "random", lambda: hits.append(1) or 0.0)
+    monkeypatch.setattr(stub_server.random, "choice", lambda options: 500)
+    with StubServer(StubSettings(error_rate=1.0)) as stub:
+        config = {
+            "api_key": STUB_API_KEY,
+            "api_keys": [STUB_API_KEY],
+            "key_strategy": "round-robin",
+            "base_url": stub.base_url,
+            "default_model": "m",
+            "model_mapping": {},
+            "key_stats_file": None,
+        }
+        client = DeepSeekClient(use_pretty=False, config=config)
+        with pytest.raises(Exception):
+            client.get_raw_stream([{"role": "user", "content": "hi"}])
+    # SDK 不再自行重试，重试只经过 _create（换密钥并计入 attempts）
+    assert len(hits) == 1
+    assert client.attempts == 1
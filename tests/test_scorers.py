@@ -0,0 +1,167 @@
+# tests/test_scorers.py
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from ag_cli.chat.sampling import BestOfN, Sample
+from ag_cli.chat.scorers import SCORERS, final_answer, get_scorer
+
+
+def _sample(index, text, finished_at=None, score=0.0):
+    sample = Sample(index)
+    sample.text = text
+    sample.status = "完成"
+    sample.finished_at = finished_at if finished_at is not None else float(index)
+    sample.score = score
+    return sample
+
+
+def test_final_answer_sources():
+    assert final_answer("推导...\n\\boxed{25}") == "25"
+    assert final_answer("过程\n答案：25 个") == "25 个"
+    assert final_answer("第一行\n\n最后一行\n") == "最后一行"
+
+
+def test_vote_selects_majority_earliest():
+    scorer = get_scorer("vote")
+    samples = [
+        _sample(0, "答案：24", finished_at=1.0),
+        _sample(1, "答案：25", finished_at=3.0),
+        _sample(2, "答案: 25。", finished_at=2.0),
+    ]
+    assert scorer.select(samples) == 2
+    assert samples[2].score == pytest.approx(2 / 3)
+
+
+def test_vote_decided_only_with_majority_of_n():
+    scorer = get_scorer("vote")
+    two = [_sample(0, "答案：25"), _sample(1, "答案：25")]
+    assert not scorer.decided(two, 5)
+    assert scorer.decided(two + [_sample(2, "答案：25")], 5)
+    assert scorer.decided(two, 3)
+    assert not scorer.decided([_sample(0, "答案：1"), _sample(1, "答案：2")], 3)
+
+
+def test_code_and_json_scorers():
+    assert get_scorer("code").score("```python\nprint(1)\n```") == 1.0
+    assert get_scorer("code").score("```python\nprint(\n```") == 0.0
+    assert get_scorer("json").score('{"a": 1}') == 1.0
+    assert get_scorer("json").score("不是 JSON") == 0.0
+    assert get_scorer("code").decided([_sample(0, "", score=1.0)], 4)
+
+
+def test_early_exit_support():
+    assert not get_scorer("longest").supports_early_exit
+    for name in ("vote", "code", "json"):
+        assert get_scorer(name).supports_early_exit
+    assert set(SCORERS) >= {"vote", "code", "json", "longest"}
+
+
+def test_unknown_scorer():
+    with pytest.raises(ValueError):
+        get_scorer("nope")
+
+
+class FakeClient:
+    """每个候选按给定文本逐块返回"""
+
+    def __init__(self, answers):
+        self.answers = list(answers)
+        self.requests = 0
+
+    def get_sampling_stream(self, messages, model=None, n=1):
+        text = self.answers[self.requests]
+        self.requests += 1
+        return iter(
+            SimpleNamespace(
+                choices=[
+                    SimpleNamespace(
+                        delta=SimpleNamespace(content=piece, reasoning_content=None)
+                    )
+                ],
+                usage=None,
+            )
+            for piece in (text, "")
+        )
+
+
+def test_vote_early_exit_cancels_after_majority():
+    sampler = BestOfN(
+        FakeClient(["答案：7"] * 5), get_scorer("vote"), 5, early_exit=True
+    )
+    for sample in sampler.samples[:2]:
+        sampler._run_one(sample, [])
+    assert not sampler._cancel.is_set()
+    sampler._run_one(sampler.samples[2], [])
+    assert sampler._cancel.is_set()
+
+
+def _choice_chunk(index, content, finish_reason=None):
+    delta = SimpleNamespace(content=content, reasoning_content=None)
+    choice = SimpleNamespace(index=index, delta=delta, finish_reason=finish_reason)
+    return SimpleNamespace(choices=[choice], usage=None)
+
+
+class IgnoresNClient:
+    """接口忽略 n 参数，只返回 index 0"""
+
+    def get_sampling_stream(self, messages, model=None, n=1):
+        return iter([_choice_chunk(0, "答案：7"), _choice_chunk(0, "", "stop")])
+
+
+def test_single_request_marks_missing_choices_failed():
+    sampler = BestOfN(IgnoresNClient(), get_scorer("vote"), 3, mode="n")
+    selected = sampler.run([])
+    assert selected.index == 0 and selected.text == "答案：7"
+    assert [sample.status for sample in sampler.samples] == ["完成", "失败", "失败"]
+    assert "忽略了 n 参数" in sampler.samples[1].error
+
+
+class BlockingStream:
+    """一直阻塞到被关闭的响应流"""
+
+    def __init__(self):
+        self.closed = threading.Event()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        self.closed.wait(30)
+        raise ConnectionError("stream closed")
+
+    def close(self):
+        self.closed.set()
+
+
+class FirstAnswersClient:
+    """第一个请求立即返回可通过评分的代码，其余请求一直阻塞"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.blocked = []
+
+    def get_sampling_stream(self, messages, model=None, n=1):
+        with self.lock:
+            first = self.requests == 0
+            self.requests += 1
+        if first:
+            return iter([_choice_chunk(0, "```python\nprint(1)\n```")])
+        stream = BlockingStream()
+        self.blocked.append(stream)
+        return stream
+
+
+def test_parallel_early_exit_closes_pending_streams():
+    client = FirstAnswersClient()
+    sampler = BestOfN(client, get_scorer("code"), 4, early_exit=True)
+    started = time.monotonic()
+    selected = sampler.run([])
+    assert time.monotonic() - started < 5
+    assert selected.score == 1.0
+    assert client.blocked and all(stream.closed.is_set() for stream in client.blocked)
+    statuses = sorted(sample.status for sample in sampler.samples)
+    assert statuses == ["完成", "已取消", "已取消", "已取消"]
@@ -0,0 +1,108 @@
+# tests/test_search.py
+import pytest
+
+from ag_cli import search
+from ag_cli.search import (
+    SEPARATOR,
+    SearchIndex,
+    build_query,
+    purge_index,
+    query_terms,
+    segment,
+    unsegment,
+)
+
+
+def test_segment_round_trip():
+    text = "连接池 timeout 超时"
+    segmented = segment(text)
+    assert SEPARATOR in segmented
+    assert unsegment(segmented) == text
+    assert segment("plain english") == "plain english"
+
+
+def test_query_terms():
+    assert query_terms("SQLAlchemy 连接池超时, pool_size") == [
+        "sqlalchemy",
+        "连接池超时",
+        "pool",
+        "size",
+    ]
+
+
+def test_build_query_all_terms():
+    assert build_query("pool 超时") == f'"pool" "{segment("超时")}"'
+    assert build_query("  ,, ") == ""
+
+
+def test_build_query_any_term_uses_bigrams():
+    query = build_query("连接池 a pool", any_term=True)
+    phrases = query.split(" OR ")
+    assert f'"{segment("连接")}"' in phrases
+    assert f'"{segment("接池")}"' in phrases
+    # 单个英文字母不参与召回
+    assert '"a"' not in phrases
+    assert '"pool"' in phrases
+
+
+def _index(tmp_path):
+    index = SearchIndex(tmp_path / "search.db")
+    index.add("SQLAlchemy 连接池超时怎么配置", "设置 pool_timeout 参数", "m1", "single")
+    index.add("Python 快速排序", "def quicksort(items): ...", "m2", "single")
+    return index
+
+
+def test_fts_search_ranks_and_highlights(tmp_path):
+    index = _index(tmp_path)
+    assert len(index) == 2
+    hits = index.search("连接池")
+    assert [hit.model for hit in hits] == ["m1"]
+    assert search.MARK_START in hits[0].prompt
+    assert SEPARATOR not in hits[0].prompt
+    full = index.search("quicksort", full=True)
+    assert full[0].response == "def quicksort(items): ..."
+    assert index.search("不存在的词") == []
+    index.close()
+
+
+def test_plain_fallback(tmp_path, monkeypatch):
+    # 模拟 SQLite 未编译 FTS5
+    monkeypatch.setattr(
+        search, "FTS_SCHEMA", "CREATE VIRTUAL TABLE turns USING no_such_module(x)"
+    )
+    index = _index(tmp_path)
+    assert len(index) == 2
+    assert not index.fts
+    hits = index.search("连接池 超时")
+    assert [hit.model for hit in hits] == ["m1"]
+    assert search.MARK_START in hits[0].prompt
+    hits = index.search("连接池 quicksort", any_term=True)
+    assert {hit.model for hit in hits} == {"m1", "m2"}
+    index.close()
+
+
+@pytest.mark.parametrize(
+    "env, config, enabled",
+    [
+        (None, {}, False),
+        (None, {"search_index": True}, True),
+        ("1", {}, True),
+        ("0", {"search_index": True}, False),
+    ],
+)
+def test_index_is_opt_in(monkeypatch, env, config, enabled):
+    if env is None:
+        monkeypatch.delenv("AG_SEARCH_INDEX", raising=False)
+    else:
+        monkeypatch.setenv("AG_SEARCH_INDEX", env)
+    monkeypatch.setattr(search, "read_config_file", lambda: config)
+    assert search.search_index_enabled() is enabled
+
+
+def test_purge_index(tmp_path):
+    index = _index(tmp_path)
+    index.close()
+    path = tmp_path / "search.db"
+    assert purge_index(path) >= 1
+    assert not path.exists()
+    assert purge_index(path) == 0
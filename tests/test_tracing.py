@@ -0,0 +1,91 @@
+# tests/test_tracing.py
+import json
+import sys
+import time
+
+import pytest
+
+from ag_cli import main as main_module
+from ag_cli.utils import tracing
+from ag_cli.utils.tracing import Tracer, instant, span, tracer
+
+
+@pytest.fixture
+def enabled(monkeypatch):
+    monkeypatch.setattr(tracer, "enabled", True)
+    monkeypatch.setattr(tracer, "events", [])
+    return tracer
+
+
+def test_disabled_tracer_is_a_no_op(monkeypatch):
+    monkeypatch.setattr(tracer, "enabled", False)
+    monkeypatch.setattr(tracer, "events", [])
+    # 未启用时返回共享的空上下文，不创建生成器
+    assert span("a") is tracing._NULL_SPAN
+    with span("a", size=1):
+        instant("b")
+    tracer.complete("c", 0.0, 1.0)
+    assert tracer.events == []
+
+
+def test_nested_spans_use_chrome_complete_events(enabled):
+    with span("outer", cat="chat", turn=1):
+        with span("inner"):
+            time.sleep(0.01)
+        instant("first_byte")
+    inner, first_byte, outer = enabled.events
+    assert [e["name"] for e in (inner, first_byte, outer)] == [
+        "inner",
+        "first_byte",
+        "outer",
+    ]
+    assert outer["ph"] == inner["ph"] == "X"
+    assert outer["cat"] == "chat" and outer["args"] == {"turn": 1}
+    assert first_byte["ph"] == "i" and first_byte["s"] == "t"
+    # ts/dur 以微秒为单位，内层区间落在外层区间内
+    assert inner["dur"] >= 10_000
+    assert outer["ts"] <= inner["ts"]
+    assert inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+    assert inner["ts"] <= first_byte["ts"] <= outer["ts"] + outer["dur"]
+    assert {e["pid"] for e in enabled.events} == {tracer._pid}
+
+
+def test_span_is_recorded_when_body_raises(enabled):
+    with pytest.raises(ValueError):
+        with span("failing"):
+            raise ValueError("boom")
+    assert [e["name"] for e in enabled.events] == ["failing"]
+
+
+def test_write_produces_trace_json(tmp_path):
+    local = Tracer()
+    local.enable()
+    local.complete("step", tracing.PROCESS_START, tracing.PROCESS_START + 0.5)
+    path = local.write(tmp_path / "trace.json")
+    data = json.loads(path.read_text(encoding="utf-8"))
+    [event] = data["traceEvents"]
+    assert data["displayTimeUnit"] == "ms"
+    assert event["ts"] == 0 and event["dur"] == pytest.approx(500_000)
+
+
+def test_main_writes_trace_even_when_run_fails(monkeypatch, tmp_path, enabled):
+    trace = tmp_path / "trace.json"
+
+    def run(args):
+        with span("work"):
+            raise RuntimeError("失败")
+
+    monkeypatch.setattr(main_module, "run", run)
+    monkeypatch.setattr(sys, "argv", ["ag", "--profile", str(trace), "hi"])
+    with pytest.raises(RuntimeError):
+        main_module.main()
+    names = [e["name"] for e in json.loads(trace.read_text())["traceEvents"]]
+    assert names == ["imports", "work", "main"]
+
+
+def test_cprofile_requires_profile(monkeypatch, capsys):
+    monkeypatch.setattr(sys, "argv", ["ag", "--profile-cprofile", "out.prof", "hi"])
+    with pytest.raises(SystemExit) as exc:
+        main_module.main()
+    assert exc.value.code == 2
+    assert "--profile-cprofile" in capsys.readouterr().err
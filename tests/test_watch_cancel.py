@@ -0,0 +1,91 @@
+# tests/test_watch_cancel.py
+import threading
+import time
+
+import pytest
+
+from ag_cli.api_client import DeepSeekClient, abort_stream
+from ag_cli.cli.commands import _cancellable
+from ag_cli.utils.stub_server import STUB_API_KEY, STUB_MODEL, StubServer, StubSettings
+
+
+@pytest.fixture
+def slow_client():
+    # 每个分块间隔 30 秒：不中止连接的话读取线程会一直阻塞
+    stub = StubServer(StubSettings(ttft=0.0, itl=30.0, tokens=4, jitter=0.0)).start()
+    config = {
+        "api_key": STUB_API_KEY,
+        "api_keys": [STUB_API_KEY],
+        "key_strategy": "round-robin",
+        "base_url": stub.base_url,
+        "default_model": STUB_MODEL,
+        "model_mapping": {},
+        "key_stats_file": None,
+    }
+    yield DeepSeekClient(use_pretty=False, config=config)
+    stub.stop()
+
+
+def test_abort_wakes_blocked_reader(slow_client):
+    stream = slow_client.get_raw_stream([{"role": "user", "content": "hi"}])
+    cancel = threading.Event()
+    chunks, errors = [], []
+
+    def read():
+        try:
+            chunks.extend(_cancellable(stream, cancel))
+        except Exception as e:
+            errors.append(e)
+
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+    reader.join(0.5)
+    assert reader.is_alive()
+
+    started = time.monotonic()
+    cancel.set()
+    abort_stream(stream)
+    reader.join(5)
+    assert not reader.is_alive()
+    assert time.monotonic() - started < 5
+    # 取消引起的读取错误不会抛出
+    assert errors == []
+
+
+def test_cancel_before_iteration_yields_nothing():
+    cancel = threading.Event()
+    cancel.set()
+    closed = []
+
+    class Stream:
+        def __iter__(self):
+            yield "chunk"
+
+        def close(self):
+            closed.append(True)
+
+    assert list(_cancellable(Stream(), cancel)) == []
+    assert closed == [True]
+
+
+def test_errors_propagate_without_cancel():
+    def broken():
+        yield "a"
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        list(_cancellable(broken(), threading.Event()))
+
+
+def test_abort_without_socket_closes_stream():
+    closed = []
+
+    class Stream:
+        response = None
+
+        def close(self):
+            closed.append(True)
+
+    abort_stream(Stream())
+    abort_stream(None)
+    assert closed == [True]